@@ -0,0 +1,252 @@
+"""Micro-benchmarks for code which runs on every request.
+
+Each benchmark compares the previous implementation of something with the
+current one, so we can see what a change bought us:
+
+    python bin/benchmark.py clean_headers
+"""
+
+from argparse import ArgumentParser
+from collections import OrderedDict
+from itertools import cycle
+from random import Random
+from timeit import Timer
+from types import SimpleNamespace
+from urllib.parse import parse_qsl, urlencode, urlparse
+
+from pyramid.config import Configurator
+from pyramid.renderers import render
+from pyramid.request import Request
+from webob.multidict import MultiDict
+
+from via.configuration import Configuration
+from via.get_url import headers
+from via.views import add_routes, route_by_content, view_pdf
+
+# A typical set of headers as they arrive from Cloudflare and NGINX
+SAMPLE_HEADERS = {
+    "Host": "via.hypothes.is",
+    "Connection": "close",
+    "Cf-Ipcountry": "GB",
+    "X-Forwarded-For": "1.2.3.4",
+    "Cf-Ray": "5d0e3a7d8f2a1b3c-LHR",
+    "X-Forwarded-Proto": "https",
+    "Cf-Visitor": '{"scheme":"https"}',
+    "Upgrade-Insecure-Requests": "1",
+    "User-Agent": "Mozilla/5.0 (X11; Linux x86_64; rv:80.0) Gecko/20100101",
+    "Accept": "text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8",
+    "Sec-Fetch-Site": "none",
+    "Sec-Fetch-Mode": "navigate",
+    "Sec-Fetch-User": "?1",
+    "Sec-Fetch-Dest": "document",
+    "Referer": "https://example.com/",
+    "Accept-Encoding": "gzip",
+    "Accept-Language": "en-GB,en;q=0.5",
+    "Cookie": "session=abc123",
+    "Cf-Connecting-Ip": "1.2.3.4",
+    "Cdn-Loop": "cloudflare",
+    "Dnt": "1",
+}
+
+
+def _clean_headers_before(headers_):
+    # The implementation of `clean_headers()` before rules were compiled
+    clean = OrderedDict()
+
+    for header_name, value in headers_.items():
+        if header_name in headers.BANNED_HEADERS:
+            continue
+
+        header_name = headers.HEADER_MAP.get(header_name, header_name)
+        value = headers.HEADER_DEFAULTS.get(header_name, value)
+
+        clean[header_name] = value
+
+    return clean
+
+
+# A typical `/route` request from the LMS app for an article with a
+# tracking query
+SAMPLE_ROUTE_PARAMS = MultiDict(
+    [
+        (
+            "url",
+            "https://www.example.com/articles/2020/09/an-article-title"
+            "?utm_source=twitter&utm_medium=social&utm_campaign=launch&id=12345",
+        ),
+        ("via.open_sidebar", "1"),
+        ("via.request_config_from_frame", "https://lms.hypothes.is"),
+        ("via.config_frame_ancestor_level", "2"),
+    ]
+)
+
+# The shapes of URLs people annotate, from bare pages to ones with long
+# tracking queries, `;params` and fragments
+SAMPLE_URL_FORMATS = (
+    "https://www.example.com/articles/2020/09/article-{n}",
+    "https://www.example.com/articles/article-{n}?utm_source=twitter"
+    "&utm_medium=social&utm_campaign=launch&id={n}",
+    "https://news.example.org/story/{n}?ref=home&page=2#comments",
+    "https://blog.example.net/{n}/a-post-title/?amp=1&fbclid=IwAR{n}xyz",
+    "http://docs.example.com/manual;jsessionid={n}?section=intro#part-{n}",
+    "https://example.edu/~user/papers/{n}.html?download=",
+    "https://search.example.com/results?q=annotation+{n}&page=1&sort=date",
+)
+
+
+def _sample_route_params(count=10000, popular=50, miss_rate=0.2):
+    """Get a realistic mix of `/route` requests to rotate through.
+
+    Most requests are for a few popular URLs, which `_parse_url()` will have
+    cached, but `miss_rate` of them are for URLs seen only once. There are
+    more of those than `_parse_url()` caches, so they are always misses.
+    """
+    rand = Random(0)
+
+    def params_for(index):
+        params = MultiDict(SAMPLE_ROUTE_PARAMS)
+        params["url"] = rand.choice(SAMPLE_URL_FORMATS).format(n=index)
+        if rand.random() < 0.5:
+            # Not everyone comes from the LMS app
+            del params["via.request_config_from_frame"]
+            del params["via.config_frame_ancestor_level"]
+        return params
+
+    popular_params = [params_for(index) for index in range(popular)]
+
+    return [
+        params_for(popular + index)
+        if rand.random() < miss_rate
+        else rand.choice(popular_params)
+        for index in range(count)
+    ]
+
+
+SAMPLE_ROUTE_PARAMS_MIX = _sample_route_params()
+
+SAMPLE_REQUEST = SimpleNamespace(
+    registry=SimpleNamespace(settings={"legacy_via_url": "https://via.hypothes.is"})
+)
+
+
+def _get_legacy_via_url_before(request, params):
+    # The implementation of `_get_legacy_via_url()` before it was single pass
+    query = MultiDict(params)
+    raw_url = urlparse(query.pop("url"))
+
+    via_url = request.registry.settings["legacy_via_url"]
+    bare_url = raw_url._replace(query=None).geturl()
+    via_url = urlparse(f"{via_url}/{bare_url}")
+
+    query.update(parse_qsl(raw_url.query))
+    via_url = via_url._replace(query=urlencode(query))
+
+    return via_url.geturl()
+
+
+def _rotate_route_params(get_legacy_via_url):
+    # Each call routes the next of `SAMPLE_ROUTE_PARAMS_MIX`, so caches see
+    # the same mix of hits and misses as they would in production
+    params = cycle(SAMPLE_ROUTE_PARAMS_MIX)
+
+    return lambda: get_legacy_via_url(SAMPLE_REQUEST, next(params))
+
+
+def _pdf_viewer_request():
+    config = Configurator(
+        settings={
+            "client_embed_url": "https://hypothes.is/embed.js",
+            "nginx_server": "https://via3.hypothes.is",
+        }
+    )
+    config.include("pyramid_jinja2")
+    add_routes(config)
+    config.add_static_view(name="static", path="via:static")
+    config.add_cache_buster(
+        "via:static", cachebust=lambda _request, subpath, kw: (f"salt/{subpath}", kw)
+    )
+    config.commit()
+
+    request = Request.blank("/pdf", base_url="https://via3.hypothes.is")
+    request.registry = config.registry
+    return request
+
+
+PDF_VIEWER_REQUEST = _pdf_viewer_request()
+
+# pylint: disable=protected-access
+PDF_VIEWER_PDF_URL = view_pdf._string_literal(
+    "https://via3.hypothes.is/proxy/static/https://example.com/paper.pdf"
+)
+
+_, PDF_VIEWER_CONFIG = Configuration.extract_from_params(SAMPLE_ROUTE_PARAMS)
+
+
+def _view_pdf_before():
+    # How the page was rendered before the shell was pre-rendered
+    return render(
+        view_pdf.PDFViewerShell.TEMPLATE,
+        {
+            "pdf_url": PDF_VIEWER_PDF_URL,
+            "client_embed_url": view_pdf._string_literal(
+                "https://hypothes.is/embed.js"
+            ),
+            "static_url": PDF_VIEWER_REQUEST.static_url,
+            "hypothesis_config": PDF_VIEWER_CONFIG,
+        },
+        request=PDF_VIEWER_REQUEST,
+    ).encode("utf-8")
+
+
+BENCHMARKS = {
+    "clean_headers": (
+        ("before", lambda: _clean_headers_before(SAMPLE_HEADERS)),
+        ("after", lambda: headers.clean_headers(SAMPLE_HEADERS)),
+    ),
+    "legacy_via_url": (
+        ("before", _rotate_route_params(_get_legacy_via_url_before)),
+        ("after", _rotate_route_params(route_by_content._get_legacy_via_url)),
+    ),
+    "pdf_viewer": (
+        ("before", _view_pdf_before),
+        (
+            "after",
+            lambda: view_pdf.PDFViewerShell.for_request(PDF_VIEWER_REQUEST).fill(
+                PDF_VIEWER_PDF_URL, PDF_VIEWER_CONFIG
+            ),
+        ),
+    ),
+}
+
+PARSER = ArgumentParser(description=__doc__.splitlines()[0])
+PARSER.add_argument(
+    "names",
+    nargs="*",
+    help=f"The benchmarks to run from: {', '.join(BENCHMARKS)} (default: all)",
+)
+PARSER.add_argument("-n", "--number", type=int, default=100000, help="Calls per repeat")
+PARSER.add_argument("-r", "--repeat", type=int, default=5, help="Repeats to take")
+
+
+def run(names, number, repeat):
+    """Run some benchmarks and print the best time per call for each.
+
+    :param names: The names of the benchmarks to run
+    :param number: The number of calls to time in each repeat
+    :param repeat: The number of repeats to take the best of
+    """
+    for name in names:
+        print(f"{name}:")
+
+        for label, func in BENCHMARKS[name]:
+            best = min(Timer(func).repeat(repeat=repeat, number=number))
+            print(f"    {label:>8}: {best / number * 1e6:8.3f} us per call")
+
+
+if __name__ == "__main__":
+    ARGS = PARSER.parse_args()
+
+    for unknown in set(ARGS.names) - set(BENCHMARKS):
+        PARSER.error(f"Unknown benchmark: '{unknown}'")
+
+    run(ARGS.names or list(BENCHMARKS), ARGS.number, ARGS.repeat)
@@ -0,0 +1,226 @@
+"""Export cached routing decisions for NGINX to answer `/route` itself.
+
+This writes the `/route` redirect for URLs with fresh details in the URL
+details cache as NGINX `map` entries, which `conf/nginx/nginx.conf` reads
+from `/var/lib/hypothesis/route_map/`.
+
+A redirect can be served for as long as its `Cache-Control: max-age` (which
+we already let browsers and CDNs keep it for) after its details were last
+checked. Only redirects which can be served for at least `--min-fresh`
+seconds are exported: by default that's PDFs, which have a `max-age` of 5
+minutes, and not HTML pages with 1 minute. So the map doesn't change every
+time it's exported. In production supervisord runs it in a loop, which tells
+NGINX to reload whenever the map has changed:
+
+    python bin/export_route_map.py --interval 120 --reload
+
+Only requests for exactly `/route?url=<url>` are answered from the map,
+with the URL encoded as `urllib.parse.urlencode()` encodes it. Anything else
+goes to the app as usual. This uses the app's settings from the environment
+and needs the "disk" cache backend, so it can see what the app has cached.
+"""
+
+import os
+import re
+import subprocess
+import sys
+import time
+from argparse import ArgumentParser
+from collections import Counter
+from tempfile import NamedTemporaryFile
+from urllib.parse import urlencode
+
+from pyramid.config import Configurator
+from pyramid.request import Request
+from webob.multidict import MultiDict
+
+from via.app import load_settings
+from via.get_url.cache import max_age_for_status
+from via.views import add_routes
+from via.views.route_by_content import route_for_content
+
+# Characters which would need escaping in NGINX config (or which NGINX
+# would read as a variable). URLs with these are left for the app
+UNSAFE = re.compile(r"[\s\"'\\$;{}#]")
+
+# NGINX needs each key to fit in a `map_hash_bucket_size` bucket
+MAX_KEY_LENGTH = 200
+
+MAX_AGE = re.compile(r"\bmax-age=(\d+)")
+
+PARSER = ArgumentParser(description=__doc__.splitlines()[0])
+PARSER.add_argument(
+    "-b",
+    "--base-url",
+    help="The public URL of this service, for links to the PDF viewer "
+    "(default: the 'nginx_server' setting)",
+)
+PARSER.add_argument(
+    "-d",
+    "--directory",
+    default="/var/lib/hypothesis/route_map",
+    help="Where to write the map files",
+)
+PARSER.add_argument(
+    "-m",
+    "--min-fresh",
+    type=int,
+    default=120,
+    help="Only export redirects which can be served for at least this many "
+    "more seconds. This should be at least how often this is run, as NGINX "
+    "doesn't expire entries",
+)
+PARSER.add_argument(
+    "-i",
+    "--interval",
+    type=int,
+    help="Keep exporting, every this many seconds, instead of exporting once",
+)
+PARSER.add_argument(
+    "--reload",
+    action="store_true",
+    help="Run `nginx -s reload` after exporting, if the map has changed",
+)
+
+
+def route_map(request, entries, min_fresh):
+    """Get the `/route` redirect for each long lived cache entry.
+
+    :param request: A request to build URLs with
+    :param entries: (normalized URL, `CacheEntry`) tuples from the cache
+    :param min_fresh: The least number of seconds a redirect must be able to
+        be served for
+    :return: A list of (map key, target URL, Cache-Control value) tuples,
+        sorted by key
+    """
+    fresh_after = time.time() + min_fresh
+    rows = []
+
+    for url, entry in entries:
+        target, headers = route_for_content(request, MultiDict(url=url), *entry.details)
+        if served_until(entry, headers["Cache-Control"]) < fresh_after:
+            continue
+
+        key = "/route?" + urlencode({"url": url})
+
+        if len(key) <= MAX_KEY_LENGTH and not UNSAFE.search(key + target):
+            rows.append((key, target, headers["Cache-Control"]))
+
+    # NGINX won't load a map with keys which only differ in case, so leave
+    # URLs like that to the app
+    folded = Counter(key.lower() for key, _, _ in rows)
+    rows = [row for row in rows if folded[row[0].lower()] == 1]
+
+    # Sorted, so the files only change when the entries do
+    return sorted(rows)
+
+
+def served_until(entry, cache_control):
+    """Get the time until which the redirect for a cache entry can be served.
+
+    :param entry: A fresh `CacheEntry`
+    :param cache_control: The `Cache-Control` value `/route` gives for it
+    :return: The wall clock time, which is never before the entry goes stale
+    """
+    match = MAX_AGE.search(cache_control)
+    if not match:
+        return entry.fresh_until
+
+    checked_at = entry.fresh_until - max_age_for_status(entry.details[1])
+
+    return max(entry.fresh_until, checked_at + int(match.group(1)))
+
+
+def write_map(directory, name, pairs):
+    """Write the entries for an NGINX `map` atomically, if they've changed.
+
+    :param directory: The directory to write into
+    :param name: The file name to write
+    :param pairs: (key, value) tuples to write
+    :return: True if the file has changed
+    """
+    content = "".join(f'"{key}" "{value}";\n' for key, value in pairs)
+    path = os.path.join(directory, name)
+
+    if os.path.exists(path):
+        with open(path) as handle:
+            if handle.read() == content:
+                return False
+
+    os.makedirs(directory, exist_ok=True)
+
+    with NamedTemporaryFile(
+        "w", dir=directory, prefix=f".{name}.", delete=False
+    ) as handle:
+        handle.write(content)
+
+    os.chmod(handle.name, 0o644)
+    os.replace(handle.name, path)
+
+    return True
+
+
+def export(request, cache, args):
+    """Export the route map once, and reload NGINX if asked to.
+
+    :param request: A request to build URLs with
+    :param cache: The `URLDetailsCache` to export from
+    :param args: The parsed command line arguments
+    """
+    rows = route_map(request, cache.fresh_entries(), args.min_fresh)
+
+    # NGINX compares map keys ignoring case, so it also gets the exact key
+    # for each entry, which `nginx.conf` checks the request against
+    files = {
+        "keys.conf": ((key, key) for key, _, _ in rows),
+        "targets.conf": ((key, target) for key, target, _ in rows),
+        "cache_control.conf": ((key, cache_control) for key, _, cache_control in rows),
+    }
+    changed = [
+        name for name, pairs in files.items() if write_map(args.directory, name, pairs)
+    ]
+
+    print(
+        f"Exported {len(rows)} routes to {args.directory}"
+        f"{'' if changed else ' (unchanged)'}",
+        file=sys.stderr,
+    )
+
+    if changed and args.reload:
+        subprocess.run(["nginx", "-s", "reload"], check=True)
+
+
+def main():
+    """Script entry-point to export the route map."""
+    args = PARSER.parse_args()
+
+    settings = load_settings({})
+    if settings["url_details_cache_backend"] != "disk":
+        message = "Exporting needs the 'disk' URL details cache backend"
+        if args.interval:
+            # Exit cleanly, so supervisord doesn't keep restarting us
+            print(f"{message}, so there's nothing to do", file=sys.stderr)
+            return
+        PARSER.error(message)
+
+    config = Configurator(settings=settings)
+    config.include("via.get_url")
+    add_routes(config)
+    config.commit()
+
+    request = Request.blank(
+        "/route", base_url=args.base_url or settings["nginx_server"]
+    )
+    request.registry = config.registry
+
+    while True:
+        export(request, config.registry.url_details_cache, args)
+
+        if not args.interval:
+            return
+
+        time.sleep(args.interval)
+
+
+if __name__ == "__main__":
+    main()
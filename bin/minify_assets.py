@@ -1,14 +1,21 @@
-"""Minify resources."""
+"""Minify resources, and pre-compress them for WhiteNoise to serve."""
 
+import hashlib
 import json
 import os
 import re
+import sys
+import time
 from argparse import ArgumentParser
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
 from glob import glob
+from itertools import repeat
 
 from htmlmin import minify
 from rcssmin import cssmin
 from rjsmin import jsmin
+from whitenoise.compress import Compressor, brotli_installed
 
 # pylint: disable=too-few-public-methods
 
@@ -19,12 +26,147 @@ PARSER.add_argument(
     required=True,
     help="The JSON config file to specify which assets to compress",
 )
+PARSER.add_argument(
+    "--compress",
+    nargs="*",
+    default=[],
+    metavar="DIR",
+    help="Directories to write .gz and .br copies of compressible files in, "
+    "after minifying",
+)
+PARSER.add_argument(
+    "-j",
+    "--jobs",
+    type=int,
+    default=os.cpu_count(),
+    help="The number of processes to work in (default: one per CPU)",
+)
+PARSER.add_argument(
+    "-m",
+    "--manifest",
+    default=".assets_manifest.json",
+    help="Where to keep hashes of what was built, to skip unchanged files",
+)
+PARSER.add_argument(
+    "-f", "--force", action="store_true", help="Rebuild every file, changed or not"
+)
 
 
 def _htmlmin(content):
     return minify(content, remove_comments=True, remove_empty_space=True)
 
 
+def _hash(path):
+    with open(path, "rb") as handle:
+        return hashlib.md5(handle.read()).hexdigest()
+
+
+def _call(execute, path, kwargs):
+    # A module level function, so it can be sent to the worker processes
+    return execute(path, **kwargs)
+
+
+class Builder:
+    """Run a build step for many files in parallel, skipping unchanged ones.
+
+    For each file the manifest records a hash of it and of everything the
+    step wrote for it. When none of those have changed since, we re-use the
+    recorded result instead of running the step again.
+
+    :param jobs: The number of processes to run steps in
+    :param manifest_path: The JSON file to keep hashes in
+    :param force: Run every step even if nothing has changed
+    """
+
+    def __init__(self, jobs, manifest_path, force=False):
+        self._jobs = jobs
+        self._manifest_path = manifest_path
+        self._manifest = {}
+        self._timings = []
+
+        if not force and os.path.exists(manifest_path):
+            with open(manifest_path) as handle:
+                self._manifest = json.load(handle)
+
+    def run(self, step, execute, tasks):
+        """Run a build step for some files.
+
+        :param step: The name of the step, like "minify"
+        :param execute: A function to run for each file with its keyword
+            arguments. It returns a dict with the "report" lines to print
+            and a list of the "outputs" it wrote, along with anything else
+        :param tasks: A list of (path, keyword arguments) tuples
+        :return: A list of the result for each task
+        """
+        start = time.monotonic()
+        results = {}
+        todo = []
+
+        for path, kwargs in tasks:
+            entry = self._manifest.get(f"{step}:{path}")
+            if entry and entry["kwargs"] == kwargs and self._unchanged(entry):
+                results[path] = entry["result"]
+            else:
+                todo.append((path, kwargs))
+
+        for (path, kwargs), result in zip(todo, self._map(execute, todo)):
+            print("\n".join(result["report"]))
+
+            results[path] = result
+            self._manifest[f"{step}:{path}"] = {
+                "kwargs": kwargs,
+                "hashes": {
+                    output: _hash(output) for output in [path] + result["outputs"]
+                },
+                "result": dict(result, report=[]),
+            }
+
+        self._timings.append(
+            (step, len(todo), len(tasks) - len(todo), time.monotonic() - start)
+        )
+
+        return [results[path] for path, _ in tasks]
+
+    def save(self):
+        """Write the manifest for the next build."""
+        with open(self._manifest_path, "w") as handle:
+            json.dump(self._manifest, handle, indent=1, sort_keys=True)
+
+    def summary(self):
+        """Get how long each step took.
+
+        :return: A string to print
+        """
+        lines = []
+        for step, built, unchanged, seconds in self._timings:
+            lines.append(
+                f"{step}: {built} built, {unchanged} unchanged in {seconds:.2f}s"
+            )
+
+        total = sum(seconds for *_, seconds in self._timings)
+        lines.append(f"Total: {total:.2f}s with {self._jobs} jobs")
+
+        return "\n".join(lines)
+
+    def _map(self, execute, todo):
+        if self._jobs <= 1 or len(todo) <= 1:
+            return (execute(path, **kwargs) for path, kwargs in todo)
+
+        paths = [path for path, _ in todo]
+        kwargs = [kwargs for _, kwargs in todo]
+
+        # One file at a time, as a few large files make up most of the work
+        with ProcessPoolExecutor(max_workers=self._jobs) as executor:
+            return list(executor.map(_call, repeat(execute), paths, kwargs))
+
+    @staticmethod
+    def _unchanged(entry):
+        return all(
+            os.path.exists(path) and _hash(path) == file_hash
+            for path, file_hash in entry["hashes"].items()
+        )
+
+
 class Minifier:
     """Minifier for CSS, Javascript and HTML."""
 
@@ -36,7 +178,7 @@ class Minifier:
     }
 
     @classmethod
-    def minify(cls, instructions):
+    def minify(cls, instructions, builder):
         """Minify resources found at specified paths.
 
         The instructions are provided as glob keys with dict values.
@@ -44,13 +186,13 @@ class Minifier:
         By default `file.ext` is compressed to `file.min.ext`. This can be
         disabled by providing `in_place` in the settings dict for path.
         :param instructions: Globs to instructions in a dict
+        :param builder: The `Builder` to run the minification with
         """
         tasks = {}
-        for path, handler, settings in cls._find_files(instructions):
-            tasks[path] = (handler, settings)
+        for path, settings in cls._find_files(instructions):
+            tasks[path] = settings
 
-        for path, (handler, settings) in tasks.items():
-            cls._execute(path, handler, **settings)
+        builder.run("minify", cls._execute, list(tasks.items()))
 
     @classmethod
     def _ext(cls, filename):
@@ -72,35 +214,126 @@ class Minifier:
                 if filename.endswith(f".min.{ext}"):
                     continue
 
-                handler = cls.handlers.get(ext)
-                if not handler:
+                if ext not in cls.handlers:
                     continue
 
-                yield filename, handler, settings
+                yield filename, settings
 
     @classmethod
-    def _execute(cls, path, handler, in_place=False):
-        with open(path) as handle:
+    def _execute(cls, path, in_place=False):
+        with open(path, encoding="utf-8") as handle:
             content = handle.read()
 
         if not content:
-            print("NOO", path)
-            return
+            return {"report": [f"NOO {path}"], "outputs": []}
 
-        minified = handler(content)
+        ext = cls._ext(path)
+        minified = cls.handlers[ext](content)
 
         target = path
         if not in_place:
-            ext = cls._ext(target)
             target = re.sub(f"\\.{ext}$", f".min.{ext}", target)
 
         percent = int(1000 * len(minified) / len(content)) / 10.0
-        print(path)
-        print(f"\t-> {target} {len(content)} -> {len(minified)} ({percent}%)")
 
-        with open(target, "w") as handle:
+        with open(target, "w", encoding="utf-8") as handle:
             handle.write(minified)
 
+        return {
+            "report": [
+                path,
+                f"\t-> {target} {len(content)} -> {len(minified)} ({percent}%)",
+            ],
+            "outputs": [] if in_place else [target],
+        }
+
+
+class PreCompressor:
+    """Write gzip and Brotli compressed copies of files.
+
+    WhiteNoise serves `file.gz` or `file.br` instead of `file` to clients
+    which accept them, so nothing has to be compressed when it's requested.
+    """
+
+    # The files to skip, like images and fonts which are already compressed
+    compressor = Compressor(quiet=True)
+
+    # Copies which don't save at least this much aren't worth serving
+    max_ratio = 0.95
+
+    encodings = {".gz": Compressor.compress_gzip, ".br": Compressor.compress_brotli}
+
+    @classmethod
+    def compress(cls, directories, builder):
+        """Compress every compressible file in some directories.
+
+        :param directories: The directories to search for files in
+        :param builder: The `Builder` to run the compression with
+        """
+        suffixes = [".gz", ".br"] if brotli_installed else [".gz"]
+        tasks = [
+            (path, {"suffixes": suffixes}) for path in cls._find_files(directories)
+        ]
+
+        totals = Counter()
+        for result in builder.run("compress", cls._execute, tasks):
+            totals.update(result["sizes"])
+
+        original = totals["original"]
+        print(f"Compressed {len(tasks)} files, {original} bytes in total:")
+        for suffix in suffixes:
+            percent = int(1000 * totals[suffix] / max(original, 1)) / 10.0
+            print(f"\t-> {suffix} {original} -> {totals[suffix]} ({percent}%)")
+
+    @classmethod
+    def _find_files(cls, directories):
+        for directory in directories:
+            for base_dir, dirs, file_names in os.walk(directory):
+                dirs.sort()
+
+                for file_name in sorted(file_names):
+                    if cls.compressor.should_compress(file_name):
+                        yield os.path.join(base_dir, file_name)
+
+    @classmethod
+    def _execute(cls, path, suffixes):
+        with open(path, "rb") as handle:
+            content = handle.read()
+
+        report = [path]
+        outputs = []
+
+        # Sizes as served, so skipped copies count as the original size
+        sizes = {"original": len(content)}
+        for suffix in cls.encodings:
+            target = path + suffix
+            compressed = (
+                cls.encodings[suffix](content)
+                if suffix in suffixes and content
+                else content
+            )
+
+            if len(compressed) > cls.max_ratio * len(content) or not content:
+                # Don't leave an old copy to be served in place of this file
+                if os.path.exists(target):
+                    os.remove(target)
+                if suffix in suffixes:
+                    report.append(f"\t-> {target} skipped, as it's barely smaller")
+                sizes[suffix] = len(content)
+                continue
+
+            percent = int(1000 * len(compressed) / len(content)) / 10.0
+            report.append(
+                f"\t-> {target} {len(content)} -> {len(compressed)} ({percent}%)"
+            )
+
+            with open(target, "wb") as handle:
+                handle.write(compressed)
+            outputs.append(target)
+            sizes[suffix] = len(compressed)
+
+        return {"report": report, "outputs": outputs, "sizes": sizes}
+
 
 def main():
     """Script entry-point to compress assets."""
@@ -113,7 +346,18 @@ def main():
     with open(config_file) as handle:
         config = json.load(handle)
 
-    Minifier.minify(config)
+    builder = Builder(args.jobs, args.manifest, force=args.force)
+
+    Minifier.minify(config, builder)
+
+    if args.compress:
+        if not brotli_installed:
+            print("Brotli isn't installed, so only writing .gz files", file=sys.stderr)
+
+        PreCompressor.compress(args.compress, builder)
+
+    builder.save()
+    print(builder.summary())
 
 
 if __name__ == "__main__":
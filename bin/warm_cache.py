@@ -0,0 +1,336 @@
+"""Fill the URL details cache with URLs we expect to be asked for.
+
+URLs are read from CSV (a "url" column, or the first column), JSON lines
+(objects with a "url" key, or plain strings) or plain text with one URL per
+line. Use "-" to read from stdin:
+
+    python bin/warm_cache.py syllabus_links.csv
+    cat links.txt | python bin/warm_cache.py - --format text
+
+This uses the same settings (from environment variables) and cache as the
+app, so it's only useful with a cache the app can see, like the "disk"
+backend on the same host.
+
+Requests are sent with the headers of a typical browser, as some sites
+answer scripts differently (or not at all). Use `--header` to change them:
+
+    python bin/warm_cache.py links.txt --header "Accept-Language: fr"
+"""
+
+import csv
+import json
+import os
+import sys
+import threading
+import time
+from argparse import ArgumentParser, ArgumentTypeError, FileType
+from collections import Counter, OrderedDict, deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from urllib.parse import urlsplit
+
+from pyramid.config import Configurator
+
+from via.app import REQUIRED_PARAMS, load_settings
+from via.get_url.cache import normalize_url
+
+# pylint: disable=too-few-public-methods
+
+FORMATS = {".csv": "csv", ".jsonl": "jsonl", ".ndjson": "jsonl", ".txt": "text"}
+
+# What a visitor's browser would send, so we get the response they would. The
+# app adds the rest (like `Referer`) when it cleans the headers
+DEFAULT_HEADERS = {
+    "User-Agent": (
+        "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 "
+        "(KHTML, like Gecko) Chrome/85.0.4183.121 Safari/537.36"
+    ),
+    "Accept": (
+        "text/html,application/xhtml+xml,application/xml;q=0.9," "image/webp,*/*;q=0.8"
+    ),
+    "Accept-Language": "en-US,en;q=0.9",
+    "Upgrade-Insecure-Requests": "1",
+}
+
+
+def parse_header(header):
+    """Parse a header given on the command line.
+
+    :param header: A string like "Name: value"
+    :return: A 2-tuple of (name, value)
+    :raise ArgumentTypeError: If there's no name
+    """
+    name, colon, value = header.partition(":")
+    if not colon or not name.strip():
+        raise ArgumentTypeError(f"Expected 'Name: value', not '{header}'")
+
+    return name.strip(), value.strip()
+
+
+PARSER = ArgumentParser(description=__doc__.splitlines()[0])
+PARSER.add_argument("input", type=FileType("r"), help="The file to read, or '-'")
+PARSER.add_argument(
+    "-f",
+    "--format",
+    choices=sorted(set(FORMATS.values())),
+    help="The format of the input (default: from the file extension, or text)",
+)
+PARSER.add_argument(
+    "-c", "--concurrency", type=int, default=10, help="URLs to look up at once"
+)
+PARSER.add_argument(
+    "-r",
+    "--per-host-rate",
+    type=float,
+    default=2.0,
+    help="The most URLs to look up per second from any one host",
+)
+PARSER.add_argument(
+    "-H",
+    "--header",
+    action="append",
+    default=[],
+    type=parse_header,
+    dest="headers",
+    metavar="'NAME: VALUE'",
+    help="A header to send in place of the default one with that name, or "
+    "with no value to not send it. Can be given more than once",
+)
+PARSER.add_argument(
+    "-q", "--quiet", action="store_true", help="Only print the summary at the end"
+)
+
+
+def build_headers(overrides):
+    """Get the headers to send, from the defaults and any given.
+
+    :param overrides: A list of (name, value) tuples to replace the default
+        with the same name (in any case). An empty value removes it
+    :return: A dict of headers
+    """
+    headers = dict(DEFAULT_HEADERS)
+
+    for name, value in overrides:
+        for existing in [key for key in headers if key.lower() == name.lower()]:
+            del headers[existing]
+
+        if value:
+            headers[name] = value
+
+    return headers
+
+
+def read_urls(handle, format_):
+    """Read URLs from an open file, skipping blanks and duplicates.
+
+    :param handle: The file to read from
+    :param format_: One of "csv", "jsonl" or "text"
+    :return: A list of URLs in the order they were first seen
+    """
+    if format_ == "csv":
+        rows = csv.reader(handle)
+        header = next(rows, [])
+        column = header.index("url") if "url" in header else 0
+        urls = ([] if "url" in header else header[:1]) + [
+            row[column] for row in rows if len(row) > column
+        ]
+
+    elif format_ == "jsonl":
+        urls = []
+        for line in handle:
+            if line.strip():
+                item = json.loads(line)
+                urls.append(item.get("url") if isinstance(item, dict) else item)
+
+    else:
+        urls = list(handle)
+
+    unique = OrderedDict()
+    for url in urls:
+        if isinstance(url, str) and url.strip():
+            unique.setdefault(normalize_url(url.strip()), url.strip())
+
+    return list(unique.values())
+
+
+def interleave_hosts(urls):
+    """Re-order URLs so each host's URLs are spread out over the run.
+
+    This stops a long run of URLs for one rate limited host from tying up
+    every worker while other hosts wait.
+
+    :param urls: The URLs to re-order
+    :return: A list of the same URLs, taking one from each host in turn
+    """
+    by_host = OrderedDict()
+    for url in urls:
+        by_host.setdefault(urlsplit(url).hostname, deque()).append(url)
+
+    interleaved = []
+    while by_host:
+        for host in list(by_host):
+            interleaved.append(by_host[host].popleft())
+            if not by_host[host]:
+                del by_host[host]
+
+    return interleaved
+
+
+class HostRateLimiter:
+    """Space out requests to each host so we don't hammer anyone.
+
+    :param per_second: The most requests to start per second for each host
+    """
+
+    def __init__(self, per_second):
+        self._interval = 1 / per_second
+        self._next_slot = {}
+        self._lock = threading.Lock()
+
+    def wait(self, url):
+        """Block until it's OK to request a URL.
+
+        :param url: The URL which will be requested
+        """
+        host = urlsplit(url).hostname
+
+        with self._lock:
+            now = time.monotonic()
+            slot = max(now, self._next_slot.get(host, now))
+            self._next_slot[host] = slot + self._interval
+
+        time.sleep(slot - now)
+
+
+class Progress:
+    """Print how far we've got and how fast we're going.
+
+    :param total: The number of URLs to look up
+    :param quiet: Only print the summary
+    """
+
+    def __init__(self, total, quiet=False):
+        self._total = total
+        self._quiet = quiet
+        self._start = time.monotonic()
+
+        self.done = 0
+        self.outcomes = Counter()
+
+    def record(self, url, outcome):
+        """Record and print the outcome of looking up a URL.
+
+        :param url: The URL looked up
+        :param outcome: A short description of the result
+        """
+        self.done += 1
+        self.outcomes[outcome.split(" ")[0]] += 1
+
+        if not self._quiet:
+            print(
+                f"[{self.done}/{self._total} {self.rate:.1f}/s] {outcome} {url}",
+                file=sys.stderr,
+            )
+
+    @property
+    def rate(self):
+        """Get the number of URLs done per second so far."""
+        return self.done / max(time.monotonic() - self._start, 1e-6)
+
+    def summary(self):
+        """Get a summary of the whole run.
+
+        :return: A string to print
+        """
+        elapsed = time.monotonic() - self._start
+        outcomes = ", ".join(f"{count} {key}" for key, count in self.outcomes.items())
+
+        return (
+            f"Warmed {self.done} URLs in {elapsed:.1f}s ({self.rate:.1f}/s): "
+            f"{outcomes or 'nothing to do'}"
+        )
+
+
+def warm(  # pylint: disable=too-many-arguments
+    cache, urls, headers, concurrency, rate_limiter, progress
+):
+    """Look up each URL so its details are in the cache.
+
+    :param cache: The `URLDetailsCache` to fill
+    :param urls: The URLs to look up
+    :param headers: The headers to send with each request
+    :param concurrency: The number of URLs to look up at once
+    :param rate_limiter: A `HostRateLimiter` to space out requests with
+    :param progress: A `Progress` to record each outcome in
+    """
+
+    def look_up(url):
+        rate_limiter.wait(url)
+        try:
+            mime_type, status_code = cache.get_url_details(url, headers)
+        except Exception as err:  # pylint: disable=broad-except
+            return f"{err.__class__.__name__} ({err})"
+
+        return f"{status_code} {mime_type}"
+
+    urls = iter(urls)
+    pending = {}
+
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        while True:
+            # Keep the queue short, so we're not sat on thousands of futures
+            while len(pending) < concurrency:
+                url = next(urls, None)
+                if url is None:
+                    break
+                pending[executor.submit(look_up, url)] = url
+
+            if not pending:
+                return
+
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                progress.record(pending.pop(future), future.result())
+
+
+def main():
+    """Script entry-point to warm the cache."""
+    args = PARSER.parse_args()
+
+    format_ = args.format or FORMATS.get(
+        os.path.splitext(args.input.name)[1].lower(), "text"
+    )
+    urls = interleave_hosts(read_urls(args.input, format_))
+
+    # We only look URLs up, so don't need the settings for routing them
+    settings = load_settings(
+        {param: os.environ.get(param.upper(), "") for param in REQUIRED_PARAMS}
+    )
+    if settings["url_details_cache_backend"] == "memory":
+        print(
+            "Warning: the 'memory' cache backend can't be shared with the app",
+            file=sys.stderr,
+        )
+
+    config = Configurator(settings=settings)
+    config.include("via.get_url")
+    registry = config.registry
+
+    progress = Progress(len(urls), quiet=args.quiet)
+    try:
+        warm(
+            registry.url_details_cache,
+            urls,
+            headers=build_headers(args.headers),
+            concurrency=args.concurrency,
+            rate_limiter=HostRateLimiter(args.per_host_rate),
+            progress=progress,
+        )
+    finally:
+        registry.url_details_refresher.shutdown(wait=True)
+
+    print(progress.summary())
+    print(f"Cache: {json.dumps(registry.url_details_cache.stats)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,8 @@
+# Configuration settings for Gunicorn running the async (ASGI) entry point
+#
+# Use with: gunicorn -c conf/gunicorn/async.conf.py 'via.asgi:create_asgi_app()'
+
+worker_class = "uvicorn.workers.UvicornWorker"
+workers = 4
+bind = "0.0.0.0:9082"
+timeout = 20
@@ -0,0 +1,26 @@
+# Configuration settings for Gunicorn running the WSGI app with workers which
+# handle many requests at once, as most of our time is spent waiting on
+# upstream servers
+#
+# Use with: gunicorn -c conf/gunicorn/concurrent.conf.py 'via.app:create_app()'
+#
+# Threads are used by default. Set GUNICORN_WORKER_CLASS=gevent to use gevent
+# instead (gevent must be installed separately). The number of probes in
+# flight is bounded by PROBE_MAX_CONCURRENT and PROBE_MAX_PER_HOST, and
+# HTTP_POOL_MAXSIZE should be at least PROBE_MAX_PER_HOST so probes to one
+# host don't queue for connections.
+import os
+
+worker_class = os.environ.get("GUNICORN_WORKER_CLASS", "gthread")
+workers = 4
+threads = 50
+worker_connections = 1000
+bind = "0.0.0.0:9082"
+timeout = 20
+
+
+def worker_exit(server, worker):  # pylint: disable=unused-argument
+    """Close the app's upstream connections as the worker stops."""
+    from via.app import close_app  # pylint: disable=import-outside-toplevel
+
+    close_app(worker.wsgi)
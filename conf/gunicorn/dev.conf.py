@@ -3,4 +3,11 @@
 workers = 4
 reload = True
 bind = "0.0.0.0:9082"
-timeout = 20
\ No newline at end of file
+timeout = 20
+
+
+def worker_exit(server, worker):  # pylint: disable=unused-argument
+    """Close the app's upstream connections as the worker stops."""
+    from via.app import close_app  # pylint: disable=import-outside-toplevel
+
+    close_app(worker.wsgi)
@@ -0,0 +1,10 @@
+# Configuration settings for Gunicorn in production
+#
+# Use with: gunicorn -c conf/gunicorn/production.conf.py 'via.app:create_app()'
+
+
+def worker_exit(server, worker):  # pylint: disable=unused-argument
+    """Close the app's upstream connections as the worker stops."""
+    from via.app import close_app  # pylint: disable=import-outside-toplevel
+
+    close_app(worker.wsgi)
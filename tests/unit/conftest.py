@@ -1,5 +1,6 @@
 # pylint: disable=no-self-use
 """A place to put fixture functions that are useful application-wide."""
+import asyncio
 import functools
 from unittest import mock
 from urllib.parse import urlencode
@@ -30,6 +31,18 @@ def patch(request):
     return functools.partial(autopatcher, request)
 
 
+@pytest.fixture
+def clock(patch):
+    """Stop the clock used for timeouts and expiry, at 1000 seconds.
+
+    Our modules all call `time.monotonic()` through the `time` module, so
+    this controls it for every one of them.
+    """
+    monotonic = patch("time.monotonic")
+    monotonic.return_value = 1000.0
+    return monotonic
+
+
 @pytest.fixture
 def pyramid_config(pyramid_settings):
     with testing.testConfig(settings=pyramid_settings) as config:
@@ -86,3 +99,17 @@ def assert_cache_control(headers, cache_parts):
     assert (
         headers["Cache-Control"].split(", ") == Any.list.containing(cache_parts).only()
     )
+
+
+def run(coroutine):
+    """Run a coroutine to completion, and get what it returns."""
+    return asyncio.get_event_loop().run_until_complete(coroutine)
+
+
+def as_async(func):
+    """Get a coroutine function which calls (usually mock) `func`."""
+
+    async def async_func(*args, **kwargs):
+        return func(*args, **kwargs)
+
+    return async_func
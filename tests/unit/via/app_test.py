@@ -2,7 +2,7 @@ from unittest import mock
 
 import pytest
 
-from via.app import create_app, load_settings
+from via.app import OPTIONAL_PARAMS, close_app, create_app, load_settings
 from via.sentry_filters import SENTRY_FILTERS
 
 
@@ -24,6 +24,18 @@ def test_settings_are_configured_from_environment_variables(os_env):
         assert pyramid_settings[key] == value
 
 
+def test_settings_have_defaults_for_optional_params(os_env):
+    pyramid_settings = load_settings({})
+
+    assert pyramid_settings["url_details_cache_size"] == 1024
+
+
+def test_settings_can_override_optional_params(os_env):
+    pyramid_settings = load_settings({"url_details_cache_size": "10"})
+
+    assert pyramid_settings["url_details_cache_size"] == "10"
+
+
 def test_app(configurator, pyramid, os_env):
     create_app()
 
@@ -32,17 +44,28 @@ def test_app(configurator, pyramid, os_env):
             "client_embed_url": "https://hypothes.is/embed.js",
             "nginx_server": "https://via3.hypothes.is",
             "legacy_via_url": "https://via.hypothes.is",
+            **OPTIONAL_PARAMS,
             "h_pyramid_sentry.filters": SENTRY_FILTERS,
         }
     )
     assert configurator.include.call_args_list == [
         mock.call("pyramid_jinja2"),
+        mock.call("via.get_url"),
         mock.call("via.views"),
         mock.call("h_pyramid_sentry"),
     ]
     configurator.make_wsgi_app.assert_called_once_with()
 
 
+def test_close_app(patch):
+    get_url = patch("via.app.get_url")
+    app = mock.Mock()
+
+    close_app(app)
+
+    get_url.close.assert_called_once_with(app.application.registry)
+
+
 @pytest.fixture
 def configurator(pyramid):
     return pyramid.config.Configurator.return_value
@@ -55,13 +78,13 @@ def pyramid(patch):
 
 @pytest.fixture
 def os_env(patch):
-    def get(env_var):
+    def get(env_var, default=None):
         env = {
             "CLIENT_EMBED_URL": "https://hypothes.is/embed.js",
             "NGINX_SERVER": "https://via3.hypothes.is",
             "LEGACY_VIA_URL": "https://via.hypothes.is",
         }
-        return env[env_var]
+        return env.get(env_var, default)
 
     os = patch("via.app.os")
     os.environ.get = get
@@ -0,0 +1,220 @@
+import asyncio
+import time
+from unittest.mock import Mock
+
+import pytest
+from h_matchers import Any
+
+from tests.unit.conftest import run
+from via.asgi import AsyncRouteByContent, ThreadPoolWsgiToAsgi, create_asgi_app
+from via.exceptions import UpstreamServiceError
+from via.get_url.async_details import AsyncURLDetailsCache
+from via.get_url.redirects import RedirectIndex
+from via.get_url.store import MemoryStore
+
+
+class TestAsyncRouteByContent:
+    def test_it_routes_pdfs(self, call, fetch):
+        fetch.return_value = ("application/pdf", 200)
+
+        status, headers, _ = call("/route", b"url=http://example.com/a.pdf&a=b")
+
+        assert status == 302
+        assert headers["location"] == Any.url.with_path("/pdf").with_query(
+            {"url": "http://example.com/a.pdf", "a": "b"}
+        )
+        assert headers["cache-control"] == Any.string.containing("max-age=300")
+        fetch.assert_called_once_with(
+            "http://example.com/a.pdf", Any.mapping.containing({"Host": "example.com"})
+        )
+
+    def test_it_routes_html(self, call, fetch):
+        fetch.return_value = ("text/html", 200)
+
+        status, headers, _ = call("/route", b"url=http://example.com/")
+
+        assert status == 302
+        assert headers["location"] == Any.url.with_host("via.hypothes.is")
+
+    def test_it_renders_missing_urls_like_the_wsgi_app(self, call):
+        status, _, body = call("/route")
+
+        assert status == 400
+        assert b"Bad request" in body
+
+    def test_it_renders_upstream_errors_like_the_wsgi_app(self, call, fetch):
+        fetch.side_effect = UpstreamServiceError("Oh")
+
+        status, _, body = call("/route", b"url=http://example.com/")
+
+        assert status == 409
+        assert b"Could not get web page" in body
+
+    def test_it_looks_up_urls_like_the_wsgi_app(self, lookup, app, call):
+        call("/route", b"url=http://example.com/")
+
+        lookup.assert_called_once_with(
+            app.client,
+            "http://example.com/",
+            Any.mapping(),
+            sniff=True,
+            redirects=Any.instance_of(RedirectIndex),
+            deadline=15.0,
+        )
+
+    def test_it_negatively_caches_errors(self, lookup, call):
+        lookup.side_effect = UpstreamServiceError("Oh")
+
+        for _ in range(2):
+            status, _, _ = call("/route", b"url=http://example.com/")
+            assert status == 409
+
+        lookup.assert_called_once()
+
+    def test_it_stops_looking_up_urls_on_failing_hosts(self, lookup, call):
+        lookup.return_value = ("text/html", 503)
+
+        for number in range(10):
+            status, _, _ = call("/route", f"url=http://example.com/{number}".encode())
+
+        # The default number of requests before the circuit breaker opens
+        assert lookup.call_count == 5
+        assert status == 409
+
+    def test_it_passes_everything_else_to_the_wsgi_app(self, call):
+        status, _, _ = call("/_status")
+
+        assert status == 200
+
+    def test_it_closes_the_clients_on_shutdown(self, app, patch):
+        get_url = patch("via.asgi.get_url")
+        messages = [{"type": "lifespan.startup"}, {"type": "lifespan.shutdown"}]
+        sent = []
+
+        async def receive():
+            return messages.pop(0)
+
+        async def send(message):
+            sent.append(message["type"])
+
+        run(app({"type": "lifespan"}, receive, send))
+
+        assert sent == ["lifespan.startup.complete", "lifespan.shutdown.complete"]
+        assert app.client.is_closed
+        # pylint: disable=protected-access
+        get_url.close.assert_called_once_with(app._registry)
+
+    @pytest.fixture
+    def app(self, pyramid_settings):
+        app = create_asgi_app(**pyramid_settings)
+        yield app
+        run(app.client.aclose())
+
+    @pytest.fixture
+    def lookup(self, monkeypatch):
+        # This must come before `app` in a test's arguments, so it's patched
+        # before the app is created
+        lookup = Mock(return_value=("text/html", 200))
+
+        async def get_url_details_async(*args, **kwargs):
+            return lookup(*args, **kwargs)
+
+        monkeypatch.setattr("via.asgi.get_url_details_async", get_url_details_async)
+        return lookup
+
+    @pytest.fixture
+    def fetch(self, app):
+        fetch = Mock(return_value=("text/html", 200))
+
+        async def async_fetch(url, headers):
+            return fetch(url, headers)
+
+        app.url_details_cache = AsyncURLDetailsCache(async_fetch, MemoryStore())
+        return fetch
+
+    @pytest.fixture
+    def call(self, app):
+        def call(path, query_string=b""):
+            messages = []
+
+            async def receive():
+                return {"type": "http.request", "body": b"", "more_body": False}
+
+            async def send(message):
+                messages.append(message)
+
+            scope = {
+                "type": "http",
+                "http_version": "1.1",
+                "method": "GET",
+                "scheme": "http",
+                "server": ("example.com", 80),
+                "root_path": "",
+                "path": path,
+                "query_string": query_string,
+                "headers": [(b"host", b"example.com")],
+            }
+            run(app(scope, receive, send))
+
+            start, *bodies = messages
+            headers = {
+                name.decode("latin-1"): value.decode("latin-1")
+                for name, value in start["headers"]
+            }
+            body = b"".join(message.get("body", b"") for message in bodies)
+
+            return start["status"], headers, body
+
+        return call
+
+
+class TestThreadPoolWsgiToAsgi:
+    def test_it_handles_requests_at_the_same_time(self):
+        def slow_wsgi_app(_environ, start_response):
+            time.sleep(0.25)
+            start_response("200 OK", [("Content-Type", "text/plain")])
+            return [b"OK"]
+
+        app = ThreadPoolWsgiToAsgi(slow_wsgi_app, max_workers=4)
+
+        start = time.monotonic()
+        responses = run(asyncio.gather(*(self.call(app) for _ in range(4))))
+        elapsed = time.monotonic() - start
+        app.close()
+
+        assert responses == [(200, b"OK")] * 4
+        # One at a time would take a second
+        assert elapsed < 0.75
+
+    @staticmethod
+    async def call(app):
+        messages = []
+
+        async def receive():
+            return {"type": "http.request", "body": b"", "more_body": False}
+
+        async def send(message):
+            messages.append(message)
+
+        scope = {
+            "type": "http",
+            "http_version": "1.1",
+            "method": "GET",
+            "scheme": "http",
+            "server": ("example.com", 80),
+            "root_path": "",
+            "path": "/",
+            "query_string": b"",
+            "headers": [],
+        }
+        await app(scope, receive, send)
+
+        start, *bodies = messages
+        return start["status"], b"".join(body.get("body", b"") for body in bodies)
+
+
+def test_create_asgi_app_wraps_the_wsgi_app(pyramid_settings):
+    app = create_asgi_app(**pyramid_settings)
+
+    assert isinstance(app, AsyncRouteByContent)
+    run(app.client.aclose())
@@ -1,4 +1,8 @@
+import json
+
+import pytest
 from h_matchers import Any
+from webob.multidict import MultiDict
 
 from via.configuration import Configuration
 
@@ -50,3 +54,43 @@ class TestConfiguration:
 
         assert via_params == {}
         assert client_params == Any.dict.containing({"openSidebar": "foo"})
+
+    def test_it_uses_the_last_value_for_repeated_keys(self):
+        via_params, _ = Configuration.extract_from_params(
+            MultiDict([("via.key_name", "one"), ("via.key_name", "two")])
+        )
+
+        assert via_params == {"key_name": "two"}
+
+    def test_it_caches_results_for_the_same_via_params(self):
+        first = Configuration.extract_from_params(
+            {"via.client.openSidebar": "1", "url": "http://example.com"}
+        )
+        second = Configuration.extract_from_params(
+            {"via.client.openSidebar": "1", "url": "http://other.example.com"}
+        )
+
+        assert second is first
+
+    @pytest.mark.parametrize(
+        "mutate",
+        (
+            lambda config: config.update({"theme": "clean"}),
+            lambda config: config.__setitem__("theme", "clean"),
+            lambda config: config["requestConfigFromFrame"].pop("itemOne"),
+        ),
+    )
+    def test_it_returns_read_only_results(self, mutate):
+        _, client_params = Configuration.extract_from_params(
+            {"via.client.requestConfigFromFrame.itemOne": "one"}
+        )
+
+        with pytest.raises(TypeError):
+            mutate(client_params)
+
+    def test_results_can_be_dumped_as_json(self):
+        _, client_params = Configuration.extract_from_params(
+            {"via.client.requestConfigFromFrame.itemOne": "one"}
+        )
+
+        assert json.loads(json.dumps(client_params)) == client_params
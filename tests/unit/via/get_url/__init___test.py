@@ -0,0 +1,77 @@
+from unittest import mock
+
+import pytest
+
+from via import get_url
+from via.get_url import URLDetailsCache
+from via.get_url.breaker import CircuitBreaker
+from via.get_url.dns import DNSCache
+from via.get_url.limiter import ProbeLimiter
+from via.get_url.negative import NegativeCache
+from via.get_url.redirects import RedirectIndex
+from via.get_url.refresh import BackgroundRefresher
+from via.get_url.timing import PhaseTimings
+
+
+class TestIncludeMe:
+    def test_include_me(self, session_from_settings):
+        config = mock.MagicMock()
+        config.registry.settings = {
+            "url_details_cache_backend": "memory",
+            "url_details_cache_size": "10",
+            "url_details_cache_revalidate_for": "86400",
+            "url_details_cache_stale_while_revalidate": "86400",
+            "url_details_refresh_workers": "2",
+            "url_details_refresh_max_pending": "10",
+            "url_dns_cache": "true",
+            "url_dns_cache_ttl": "60",
+            "url_dns_cache_negative_ttl": "10",
+            "url_dns_cache_size": "100",
+            "url_probe_method": "head",
+            "url_sniff_content": "true",
+            "url_negative_cache_bad_url_max_age": "300",
+            "url_negative_cache_host_not_found_max_age": "60",
+            "url_negative_cache_connection_refused_max_age": "10",
+            "url_negative_cache_upstream_error_max_age": "30",
+            "url_negative_cache_size": "100",
+            "url_connect_timeout": "5",
+            "url_read_timeout": "10",
+            "url_probe_deadline": "15",
+            "url_redirect_permanent_max_age": "86400",
+            "url_redirect_temporary_max_age": "60",
+            "probe_max_concurrent": "10",
+            "probe_max_per_host": "2",
+            "probe_wait_timeout": "1",
+            "circuit_breaker_failure_rate": "0.5",
+            "circuit_breaker_min_requests": "5",
+            "circuit_breaker_window": "60",
+            "circuit_breaker_cool_down": "30",
+        }
+
+        get_url.includeme(config)
+
+        assert isinstance(config.registry.dns_cache, DNSCache)
+        session_from_settings.assert_called_once_with(
+            config.registry.settings, resolver=config.registry.dns_cache
+        )
+        assert config.registry.http_session == session_from_settings.return_value
+        assert isinstance(config.registry.url_details_cache, URLDetailsCache)
+        assert isinstance(config.registry.probe_limiter, ProbeLimiter)
+        assert isinstance(config.registry.circuit_breaker, CircuitBreaker)
+        assert isinstance(config.registry.negative_cache, NegativeCache)
+        assert isinstance(config.registry.probe_timings, PhaseTimings)
+        assert isinstance(config.registry.redirect_index, RedirectIndex)
+        assert isinstance(config.registry.url_details_refresher, BackgroundRefresher)
+
+    @pytest.fixture
+    def session_from_settings(self, patch):
+        return patch("via.get_url.session_from_settings")
+
+
+def test_close():
+    registry = mock.Mock()
+
+    get_url.close(registry)
+
+    registry.url_details_refresher.shutdown.assert_called_once_with(wait=False)
+    registry.http_session.close.assert_called_once_with()
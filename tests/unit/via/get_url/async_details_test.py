@@ -0,0 +1,322 @@
+import asyncio
+import socket
+from unittest.mock import Mock, create_autospec, sentinel
+
+import httpx
+import pytest
+
+from tests.unit.conftest import run
+from via.exceptions import (
+    BadURL,
+    UnhandledException,
+    UpstreamConnectionRefused,
+    UpstreamHostNotFound,
+    UpstreamServiceError,
+    UpstreamTimeout,
+)
+from via.get_url.async_details import (
+    AsyncURLDetailsCache,
+    async_client_from_settings,
+    get_url_details_async,
+)
+from via.get_url.redirects import RedirectIndex, Resolved
+from via.get_url.store import MemoryStore
+
+
+def connect_error(cause):
+    """Get an `httpx` error for failing to connect, like it really raises."""
+    error = httpx.ConnectError(str(cause))
+    error.__context__ = cause
+
+    return error
+
+
+class TestGetURLDetailsAsync:
+    @pytest.mark.parametrize(
+        "content_type,mime_type,status_code",
+        (
+            ("text/html", "text/html", 501),
+            ("application/pdf", "application/pdf", 200),
+            ("application/pdf; qs=0.001", "application/pdf", 201),
+            (None, None, 301),
+        ),
+    )
+    def test_it_gets_the_details(self, respond, content_type, mime_type, status_code):
+        client = respond(status_code, content_type)
+
+        result = run(get_url_details_async(client, "http://example.com", {}))
+
+        assert result == (mime_type, status_code)
+
+    def test_it_cleans_and_passes_on_the_users_headers(self, respond, requests):
+        client = respond(200, "text/html")
+
+        run(get_url_details_async(client, "http://example.com", {"Cookie": "a"}))
+
+        assert "Cookie" not in requests[0].headers
+
+    def test_it_assumes_pdf_with_a_google_drive_url(self, respond, requests):
+        client = respond(200, "text/html")
+
+        result = run(
+            get_url_details_async(
+                client, "https://drive.google.com/uc?id=--FILEID--&export=download", {}
+            )
+        )
+
+        assert result == ("application/pdf", 200)
+        assert not requests
+
+    @pytest.mark.parametrize(
+        "content_type,content,sniff,mime_type",
+        (
+            ("application/octet-stream", b"%PDF-1.4", True, "application/pdf"),
+            (None, b"x" * 500 + b"%PDF-1.4" + b"x" * 1000, True, "application/pdf"),
+            (
+                "application/octet-stream",
+                b"Not a PDF",
+                True,
+                "application/octet-stream",
+            ),
+            (
+                "application/octet-stream",
+                b"%PDF-1.4",
+                False,
+                "application/octet-stream",
+            ),
+        ),
+    )
+    def test_it_sniffs_generic_content(
+        self, respond, content_type, content, sniff, mime_type
+    ):
+        client = respond(200, content_type, content)
+
+        result = run(
+            get_url_details_async(client, "http://example.com", {}, sniff=sniff)
+        )
+
+        assert result == (mime_type, 200)
+
+    def test_it_ignores_errors_when_sniffing(self, make_client):
+        async def broken_body():
+            yield b"%PD"
+            raise httpx.ReadError("Oh noe")
+
+        client = make_client(lambda request: httpx.Response(200, content=broken_body()))
+
+        result = run(get_url_details_async(client, "http://example.com", {}, True))
+
+        assert result == (None, 200)
+
+    @pytest.mark.parametrize(
+        "exception,expected",
+        (
+            (httpx.UnsupportedProtocol("Oh noe"), BadURL),
+            (httpx.InvalidURL("Oh noe"), BadURL),
+            (httpx.ConnectError("Oh noe"), UpstreamServiceError),
+            (
+                connect_error(socket.gaierror(-2, "Name or service not known")),
+                UpstreamHostNotFound,
+            ),
+            (
+                connect_error(ConnectionRefusedError(111, "Connection refused")),
+                UpstreamConnectionRefused,
+            ),
+            (httpx.ReadTimeout("Oh noe"), UpstreamTimeout),
+            (httpx.TooManyRedirects("Oh noe"), UpstreamServiceError),
+            (httpx.DecodingError("Oh noe"), UnhandledException),
+        ),
+    )
+    def test_it_maps_errors(self, make_client, exception, expected):
+        def handler(request):
+            raise exception
+
+        client = make_client(handler)
+
+        with pytest.raises(Exception) as exc_info:
+            run(get_url_details_async(client, "http://example.com", {}))
+
+        assert exc_info.type is expected
+
+    @pytest.mark.parametrize("bad_url", ("no-schema", "glub://example.com", "http://"))
+    def test_it_raises_BadURL_for_invalid_urls(self, bad_url):
+        async def get_url_details():
+            async with httpx.AsyncClient() as client:
+                return await get_url_details_async(client, bad_url, {})
+
+        with pytest.raises(BadURL):
+            run(get_url_details())
+
+    def test_it_gives_up_after_the_deadline(self, make_client):
+        async def slow_handler(request):
+            await asyncio.sleep(10)
+
+        client = make_client(slow_handler)
+
+        with pytest.raises(UpstreamTimeout) as exc_info:
+            run(get_url_details_async(client, "http://example.com", {}, deadline=0.01))
+
+        assert exc_info.value.detail == "Gave up after 0.01 seconds"
+
+    def test_it_skips_known_redirects(self, redirecting_client, requests):
+        redirects = RedirectIndex(MemoryStore())
+
+        for _ in range(2):
+            result = run(
+                get_url_details_async(
+                    redirecting_client, "http://a.example.com/", {}, redirects=redirects
+                )
+            )
+            assert result == ("application/pdf", 200)
+
+        assert [request.url.host for request in requests] == [
+            "a.example.com",
+            "b.example.com",
+            "b.example.com",
+        ]
+        assert redirects.resolve("http://a.example.com/") == Resolved(
+            "http://b.example.com/", 200, "application/pdf"
+        )
+
+    def test_it_forgets_redirects_which_stop_working(
+        self, redirecting_client, requests
+    ):
+        redirects = create_autospec(RedirectIndex, instance=True, spec_set=True)
+        redirects.resolve.return_value = Resolved(
+            "http://gone.example.com/", 200, "application/pdf"
+        )
+
+        result = run(
+            get_url_details_async(
+                redirecting_client, "http://a.example.com/", {}, redirects=redirects
+            )
+        )
+
+        assert result == ("application/pdf", 200)
+        assert requests[0].url.host == "gone.example.com"
+        redirects.forget.assert_called_once_with("http://a.example.com/")
+        redirects.record.assert_called_once()
+
+    @pytest.fixture
+    def redirecting_client(self, make_client, requests):
+        def handler(request):
+            requests.append(request)
+
+            if request.url.host == "a.example.com":
+                return httpx.Response(
+                    301, headers={"Location": "http://b.example.com/"}
+                )
+            if request.url.host == "gone.example.com":
+                return httpx.Response(404)
+
+            return httpx.Response(200, headers={"Content-Type": "application/pdf"})
+
+        return make_client(handler)
+
+    @pytest.fixture
+    def requests(self):
+        return []
+
+    @pytest.fixture
+    def respond(self, make_client, requests):
+        def respond(status_code, content_type, content=b""):
+            def handler(request):
+                requests.append(request)
+                headers = {"Content-Type": content_type} if content_type else {}
+                return httpx.Response(status_code, headers=headers, content=content)
+
+            return make_client(handler)
+
+        return respond
+
+
+class TestAsyncURLDetailsCache:
+    def test_it_calls_fetch_on_a_miss(self, cache, fetch):
+        result = run(cache.get_url_details("http://example.com", sentinel.headers))
+
+        fetch.assert_called_once_with("http://example.com", sentinel.headers)
+        assert result == ("text/html", 200)
+        assert cache.stats == {
+            "hits": 0,
+            "stale_hits": 0,
+            "misses": 1,
+            "coalesced": 0,
+            "revalidated": 0,
+            "evictions": 0,
+            "size": 1,
+        }
+
+    def test_it_returns_cached_values_on_a_hit(self, cache, fetch):
+        run(cache.get_url_details("http://example.com", sentinel.headers))
+        fetch.reset_mock()
+
+        result = run(cache.get_url_details("HTTP://EXAMPLE.COM/", sentinel.headers))
+
+        fetch.assert_not_called()
+        assert result == ("text/html", 200)
+        assert cache.stats["hits"] == 1
+
+    def test_it_does_not_cache_errors(self, cache, fetch):
+        fetch.return_value = ("text/html", 503)
+
+        run(cache.get_url_details("http://example.com", sentinel.headers))
+        run(cache.get_url_details("http://example.com", sentinel.headers))
+
+        assert fetch.call_count == 2
+
+    def test_it_coalesces_concurrent_misses(self, cache, fetch):
+        async def get_many():
+            return await asyncio.gather(
+                *(
+                    cache.get_url_details("http://example.com", sentinel.headers)
+                    for _ in range(3)
+                )
+            )
+
+        results = run(get_many())
+
+        fetch.assert_called_once()
+        assert results == [("text/html", 200)] * 3
+        assert cache.stats["coalesced"] == 2
+
+    @pytest.fixture
+    def fetch(self):
+        return Mock(return_value=("text/html", 200))
+
+    @pytest.fixture
+    def cache(self, fetch):
+        async def async_fetch(url, headers):
+            await asyncio.sleep(0)
+            return fetch(url, headers)
+
+        return AsyncURLDetailsCache(async_fetch, MemoryStore())
+
+
+@pytest.fixture
+def make_client():
+    clients = []
+
+    def make_client(handler):
+        client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+        clients.append(client)
+        return client
+
+    yield make_client
+
+    for client in clients:
+        run(client.aclose())
+
+
+class TestAsyncClientFromSettings:
+    def test_it(self):
+        client = async_client_from_settings(
+            {
+                "async_max_connections": "100",
+                "http_pool_maxsize": "10",
+                "url_connect_timeout": "5",
+                "url_read_timeout": "10",
+            }
+        )
+
+        assert isinstance(client, httpx.AsyncClient)
+        run(client.aclose())
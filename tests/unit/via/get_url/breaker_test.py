@@ -0,0 +1,248 @@
+from unittest.mock import Mock, sentinel
+
+import pytest
+
+from tests.unit.conftest import as_async, run
+from via.exceptions import BadURL, UpstreamHostFailing, UpstreamServiceError
+from via.get_url.breaker import CircuitBreaker, breaker_from_settings
+
+
+class TestCircuitBreaker:
+    def test_wrap_calls_through(self, breaker):
+        fetch = Mock(return_value=("text/html", 200))
+
+        result = breaker.wrap(fetch)(
+            "http://example.com", sentinel.headers, validators=sentinel.validators
+        )
+
+        fetch.assert_called_once_with(
+            "http://example.com", sentinel.headers, validators=sentinel.validators
+        )
+        assert result == ("text/html", 200)
+
+    def test_wrap_counts_upstream_errors_as_failures(self, breaker):
+        fetch = breaker.wrap(Mock(side_effect=UpstreamServiceError("Timeout")))
+
+        for _ in range(2):
+            with pytest.raises(UpstreamServiceError):
+                fetch("http://example.com", {})
+
+        assert breaker.state("example.com") == "open"
+
+    def test_wrap_counts_5xx_as_failures(self, breaker):
+        fetch = breaker.wrap(Mock(return_value=("text/html", 503)))
+
+        fetch("http://example.com", {})
+        fetch("http://example.com", {})
+
+        assert breaker.state("example.com") == "open"
+
+    def test_wrap_ignores_other_errors(self, breaker):
+        fetch = breaker.wrap(Mock(side_effect=BadURL("Bad")))
+
+        for _ in range(3):
+            with pytest.raises(BadURL):
+                fetch("http://example.com", {})
+
+        assert breaker.state("example.com") == "closed"
+
+    def test_wrap_fails_fast_when_open(self, breaker):
+        self.fail_until_open(breaker)
+        fetch = Mock()
+
+        with pytest.raises(UpstreamHostFailing):
+            breaker.wrap(fetch)("http://example.com", {})
+
+        fetch.assert_not_called()
+        assert breaker.stats["rejected"] == 1
+
+    def test_wrap_async_calls_through(self, breaker):
+        fetch = Mock(return_value=("text/html", 200))
+
+        result = run(
+            breaker.wrap_async(as_async(fetch))(
+                "http://example.com", sentinel.headers, validators=sentinel.validators
+            )
+        )
+
+        fetch.assert_called_once_with(
+            "http://example.com", sentinel.headers, validators=sentinel.validators
+        )
+        assert result == ("text/html", 200)
+
+    @pytest.mark.parametrize(
+        "fetch,state",
+        (
+            (Mock(side_effect=UpstreamServiceError("Timeout")), "open"),
+            (Mock(return_value=("text/html", 503)), "open"),
+            (Mock(side_effect=BadURL("Bad")), "closed"),
+        ),
+    )
+    def test_wrap_async_counts_failures_like_wrap(self, breaker, fetch, state):
+        wrapped = breaker.wrap_async(as_async(fetch))
+
+        for _ in range(2):
+            try:
+                run(wrapped("http://example.com", {}))
+            except (UpstreamServiceError, BadURL):
+                pass
+
+        assert breaker.state("example.com") == state
+
+    def test_wrap_async_fails_fast_when_open(self, breaker):
+        self.fail_until_open(breaker)
+        fetch = Mock()
+
+        with pytest.raises(UpstreamHostFailing):
+            run(breaker.wrap_async(as_async(fetch))("http://example.com", {}))
+
+        fetch.assert_not_called()
+
+    def test_it_needs_enough_requests_to_open(self, breaker):
+        breaker.before_request("example.com")
+        breaker.after_request("example.com", failed=True)
+
+        assert breaker.state("example.com") == "closed"
+
+    def test_it_stays_closed_below_the_failure_rate(self, breaker):
+        for failed in (False, False, True):
+            breaker.before_request("example.com")
+            breaker.after_request("example.com", failed=failed)
+
+        assert breaker.state("example.com") == "closed"
+
+    def test_it_forgets_requests_outside_the_window(self, breaker, clock):
+        breaker.after_request("example.com", failed=True)
+        clock.return_value += 60
+        breaker.after_request("example.com", failed=False)
+        breaker.after_request("example.com", failed=False)
+
+        assert breaker.state("example.com") == "closed"
+
+    def test_it_only_affects_the_failing_host(self, breaker):
+        self.fail_until_open(breaker)
+
+        breaker.before_request("other.example.com")
+
+    def test_it_lets_one_trial_through_after_cool_down(self, breaker, clock):
+        self.fail_until_open(breaker)
+        clock.return_value += 30
+
+        breaker.before_request("example.com")
+
+        assert breaker.state("example.com") == "half-open"
+        with pytest.raises(UpstreamServiceError):
+            breaker.before_request("example.com")
+
+    def test_a_successful_trial_closes_the_circuit(self, breaker, clock):
+        self.fail_until_open(breaker)
+        clock.return_value += 30
+        breaker.before_request("example.com")
+
+        breaker.after_request("example.com", failed=False)
+
+        assert breaker.state("example.com") == "closed"
+        breaker.after_request("example.com", failed=True)
+        assert breaker.state("example.com") == "closed"
+
+    def test_a_failed_trial_opens_the_circuit_again(self, breaker, clock):
+        self.fail_until_open(breaker)
+        clock.return_value += 30
+        breaker.before_request("example.com")
+
+        breaker.after_request("example.com", failed=True)
+
+        assert breaker.state("example.com") == "open"
+        clock.return_value += 29
+        with pytest.raises(UpstreamServiceError):
+            breaker.before_request("example.com")
+
+    def test_an_inconclusive_trial_allows_another(self, breaker, clock):
+        self.fail_until_open(breaker)
+        clock.return_value += 30
+        breaker.before_request("example.com")
+
+        breaker.after_request("example.com", failed=None)
+
+        breaker.before_request("example.com")
+
+    @pytest.mark.parametrize("async_", (False, True))
+    def test_wrap_ends_the_trial_when_the_lookup_is_killed(
+        self, breaker, clock, async_
+    ):
+        self.fail_until_open(breaker)
+        clock.return_value += 30
+        fetch = Mock(side_effect=Killed)
+
+        with pytest.raises(Killed):
+            if async_:
+                run(breaker.wrap_async(as_async(fetch))("http://example.com", {}))
+            else:
+                breaker.wrap(fetch)("http://example.com", {})
+
+        assert breaker.state("example.com") == "half-open"
+        breaker.before_request("example.com")
+
+    def test_it_ignores_results_which_arrive_while_open(self, breaker):
+        self.fail_until_open(breaker)
+
+        breaker.after_request("example.com", failed=False)
+
+        assert breaker.state("example.com") == "open"
+
+    def test_stats_shows_hosts_which_are_not_closed(self, breaker):
+        self.fail_until_open(breaker)
+        breaker.after_request("other.example.com", failed=False)
+
+        assert breaker.stats == {
+            "rejected": 0,
+            "hosts": {"example.com": {"state": "open", "failure_rate": 1.0}},
+        }
+
+    def test_it_forgets_closed_hosts_but_not_open_ones(self, clock):
+        breaker = CircuitBreaker(min_requests=1, max_hosts=2)
+        breaker.after_request("a.example.com", failed=True)
+        breaker.after_request("b.example.com", failed=False)
+        breaker.after_request("c.example.com", failed=False)
+
+        assert breaker.state("a.example.com") == "open"
+        assert "b.example.com" not in breaker._circuits
+
+    def test_it_keeps_open_hosts_beyond_the_limit(self, clock):
+        breaker = CircuitBreaker(min_requests=1, max_hosts=1)
+        breaker.after_request("a.example.com", failed=True)
+        breaker.after_request("b.example.com", failed=True)
+
+        assert breaker.state("a.example.com") == "open"
+        assert breaker.state("b.example.com") == "open"
+
+    def fail_until_open(self, breaker):
+        for _ in range(2):
+            breaker.before_request("example.com")
+            breaker.after_request("example.com", failed=True)
+
+        assert breaker.state("example.com") == "open"
+
+    @pytest.fixture
+    def breaker(self, clock):
+        return CircuitBreaker(failure_rate=0.5, min_requests=2, cool_down=30)
+
+
+class Killed(BaseException):
+    """Like `gevent.Timeout` or `GreenletExit`, which aren't `Exception`."""
+
+
+class TestBreakerFromSettings:
+    def test_it(self):
+        breaker = breaker_from_settings(
+            {
+                "circuit_breaker_failure_rate": "1",
+                "circuit_breaker_min_requests": "1",
+                "circuit_breaker_window": "60",
+                "circuit_breaker_cool_down": "30",
+            }
+        )
+
+        breaker.after_request("example.com", failed=True)
+
+        assert breaker.state("example.com") == "open"
@@ -0,0 +1,304 @@
+from unittest.mock import Mock, create_autospec, sentinel
+
+import pytest
+from h_matchers import Any
+
+from via.get_url.cache import (
+    CacheEntry,
+    URLDetailsCache,
+    max_age_for_status,
+    normalize_url,
+)
+from via.get_url.details import URLDetails
+from via.get_url.refresh import BackgroundRefresher
+from via.get_url.store import DiskStore, MemoryStore
+
+VALIDATORS = {"If-None-Match": '"1"'}
+
+
+class TestNormalizeURL:
+    @pytest.mark.parametrize(
+        "url,expected",
+        (
+            ("http://example.com/path", "http://example.com/path"),
+            ("HTTP://EXAMPLE.COM/Path", "http://example.com/Path"),
+            ("http://example.com:80/path", "http://example.com/path"),
+            ("https://example.com:443/path", "https://example.com/path"),
+            ("https://example.com:80/path", "https://example.com:80/path"),
+            ("http://example.com", "http://example.com/"),
+            ("http://example.com/path?b=2&a=1", "http://example.com/path?b=2&a=1"),
+            ("http://example.com/path#fragment", "http://example.com/path"),
+            ("no-schema", "no-schema"),
+            ("http://[invalid", "http://[invalid"),
+        ),
+    )
+    def test_it(self, url, expected):
+        assert normalize_url(url) == expected
+
+
+class TestMaxAgeForStatus:
+    @pytest.mark.parametrize(
+        "status_code,max_age",
+        ((200, 60), (401, 60), (404, 60), (500, None), (501, None)),
+    )
+    def test_it(self, status_code, max_age):
+        assert max_age_for_status(status_code) == max_age
+
+
+class TestURLDetailsCache:
+    def test_it_calls_fetch_on_a_miss(self, cache, fetch, store):
+        result = cache.get_url_details("http://example.com", sentinel.headers)
+
+        fetch.assert_called_once_with("http://example.com", sentinel.headers)
+        assert result == fetch.return_value
+        assert cache.stats == {
+            "hits": 0,
+            "stale_hits": 0,
+            "misses": 1,
+            "coalesced": 0,
+            "revalidated": 0,
+            "evictions": 0,
+            "size": 1,
+        }
+
+    def test_it_returns_cached_values_on_a_hit(self, cache, fetch):
+        cache.get_url_details("http://example.com", sentinel.headers)
+        fetch.reset_mock()
+
+        result = cache.get_url_details("HTTP://EXAMPLE.COM:80/", sentinel.headers)
+
+        fetch.assert_not_called()
+        assert result == ("text/html", 200)
+        assert cache.stats["hits"] == 1
+
+    def test_it_does_not_cache_errors(self, cache, fetch):
+        fetch.return_value = ("text/html", 503)
+
+        cache.get_url_details("http://example.com", sentinel.headers)
+        cache.get_url_details("http://example.com", sentinel.headers)
+
+        assert fetch.call_count == 2
+
+    def test_it_stores_with_the_max_age_for_the_status(self, cache, store, wall_clock):
+        cache.get_url_details("http://example.com", sentinel.headers)
+
+        assert store.get("http://example.com/") == CacheEntry(
+            ("text/html", 200), None, wall_clock.return_value + 60
+        )
+
+    def test_it_refetches_stale_entries(self, cache, fetch, wall_clock):
+        cache.get_url_details("http://example.com", sentinel.headers)
+        wall_clock.return_value += 60
+
+        cache.get_url_details("http://example.com", sentinel.headers)
+
+        assert fetch.call_count == 2
+        assert cache.stats["misses"] == 2
+
+    def test_it_revalidates_stale_entries_with_validators(
+        self, cache, fetch, store, wall_clock
+    ):
+        fetch.return_value = URLDetails("application/pdf", 200, VALIDATORS)
+        cache.get_url_details("http://example.com", sentinel.headers)
+        wall_clock.return_value += 60
+        fetch.return_value = URLDetails(None, 304)
+
+        result = cache.get_url_details("http://example.com", sentinel.headers)
+
+        fetch.assert_called_with(
+            "http://example.com", sentinel.headers, validators=VALIDATORS
+        )
+        assert result == ("application/pdf", 200)
+        assert store.get("http://example.com/") == CacheEntry(
+            ("application/pdf", 200), VALIDATORS, wall_clock.return_value + 60
+        )
+        assert cache.stats["revalidated"] == 1
+
+    def test_it_replaces_stale_entries_which_have_changed(
+        self, cache, fetch, wall_clock
+    ):
+        fetch.return_value = URLDetails("application/pdf", 200, VALIDATORS)
+        cache.get_url_details("http://example.com", sentinel.headers)
+        wall_clock.return_value += 60
+        fetch.return_value = URLDetails("text/html", 200, {"If-None-Match": '"2"'})
+
+        result = cache.get_url_details("http://example.com", sentinel.headers)
+
+        assert result == ("text/html", 200)
+        assert cache.stats["revalidated"] == 0
+
+    def test_it_keeps_entries_with_validators_to_revalidate(self, fetch):
+        store = create_autospec(MemoryStore, instance=True, spec_set=True)
+        store.get.return_value = None
+        cache = URLDetailsCache(fetch, store, revalidate_for=1000)
+        fetch.return_value = URLDetails("application/pdf", 200, VALIDATORS)
+
+        cache.get_url_details("http://example.com", sentinel.headers)
+
+        store.set.assert_called_once_with("http://example.com/", Any(), 1060)
+
+    def test_it_counts_coalesced_calls(self, cache):
+        assert cache.stats["coalesced"] == 0
+
+    def test_it_releases_the_claim_after_fetching(self, cache, store):
+        store.release = create_autospec(store.release)
+        cache.get_url_details("http://example.com", sentinel.headers)
+
+        store.release.assert_called_once_with("http://example.com/")
+
+    def test_it_releases_the_claim_after_errors(self, cache, fetch, store):
+        store.release = create_autospec(store.release)
+        fetch.side_effect = ValueError
+
+        with pytest.raises(ValueError):
+            cache.get_url_details("http://example.com", sentinel.headers)
+
+        store.release.assert_called_once_with("http://example.com/")
+
+    def test_it_waits_for_another_process_with_the_claim(
+        self, cache, fetch, disk_store
+    ):
+        disk_store.claim.return_value = False
+        disk_store.get.side_effect = (
+            None,
+            None,
+            CacheEntry(("text/html", 200), None, 0),
+            CacheEntry(("application/pdf", 200), None, 1000),
+        )
+
+        result = cache.get_url_details("http://example.com", sentinel.headers)
+
+        assert result == ("application/pdf", 200)
+        fetch.assert_not_called()
+        disk_store.release.assert_not_called()
+
+    def test_it_fetches_if_the_other_process_gives_up(self, cache, fetch, disk_store):
+        disk_store.claim.return_value = False
+        disk_store.get.return_value = None
+        disk_store.is_claimed.return_value = False
+
+        result = cache.get_url_details("http://example.com", sentinel.headers)
+
+        assert result == fetch.return_value
+        disk_store.release.assert_not_called()
+
+    def test_it_fetches_if_the_other_process_times_out(
+        self, cache, fetch, disk_store, clock
+    ):
+        disk_store.claim.return_value = False
+        disk_store.get.return_value = None
+        disk_store.is_claimed.return_value = True
+        clock.side_effect = [0, 0, 16]
+
+        result = cache.get_url_details("http://example.com", sentinel.headers)
+
+        assert result == fetch.return_value
+
+    def test_it_serves_stale_entries_while_refreshing(
+        self, fetch, store, wall_clock, refresher
+    ):
+        cache = URLDetailsCache(
+            fetch, store, stale_while_revalidate=600, refresher=refresher
+        )
+        cache.get_url_details("http://example.com", {"Header": "value"})
+        wall_clock.return_value += 120
+        fetch.return_value = ("application/pdf", 200)
+
+        result = cache.get_url_details("http://example.com", {"Header": "value"})
+
+        assert result == ("text/html", 200)
+        assert cache.stats["stale_hits"] == 1
+        refresher.refresh.assert_called_once_with("http://example.com/", Any())
+
+        _, refresh = refresher.refresh.call_args[0]
+        refresh()
+
+        assert fetch.call_count == 2
+        assert cache.get_url_details("http://example.com", {}) == (
+            "application/pdf",
+            200,
+        )
+
+    def test_it_keeps_entries_to_serve_stale(self, fetch, refresher):
+        store = create_autospec(MemoryStore, instance=True, spec_set=True)
+        store.get.return_value = None
+        cache = URLDetailsCache(
+            fetch, store, stale_while_revalidate=600, refresher=refresher
+        )
+
+        cache.get_url_details("http://example.com", sentinel.headers)
+
+        store.set.assert_called_once_with("http://example.com/", Any(), 660)
+
+    def test_it_fetches_entries_too_stale_to_serve(
+        self, fetch, store, wall_clock, refresher
+    ):
+        cache = URLDetailsCache(
+            fetch, store, stale_while_revalidate=600, refresher=refresher
+        )
+        cache.get_url_details("http://example.com", sentinel.headers)
+        wall_clock.return_value += 660
+
+        cache.get_url_details("http://example.com", sentinel.headers)
+
+        assert fetch.call_count == 2
+        refresher.refresh.assert_not_called()
+
+    def test_it_only_serves_stale_with_a_refresher(self, fetch):
+        store = create_autospec(MemoryStore, instance=True, spec_set=True)
+        store.get.return_value = None
+        cache = URLDetailsCache(fetch, store, stale_while_revalidate=600)
+
+        cache.get_url_details("http://example.com", sentinel.headers)
+
+        store.set.assert_called_once_with("http://example.com/", Any(), 60)
+
+    def test_fresh_entries(self, cache, store, wall_clock):
+        cache.get_url_details("http://example.com", sentinel.headers)
+        store.set("claim:other", 1234, 60)
+        store.set(
+            "http://stale.example.com/", CacheEntry(("text/html", 200), None, 0), 60
+        )
+
+        entries = list(cache.fresh_entries())
+
+        assert entries == [
+            (
+                "http://example.com/",
+                CacheEntry(("text/html", 200), None, wall_clock.return_value + 60),
+            )
+        ]
+
+    @pytest.fixture
+    def refresher(self):
+        return create_autospec(BackgroundRefresher, instance=True, spec_set=True)
+
+    @pytest.fixture
+    def disk_store(self, cache):
+        # pylint: disable=protected-access
+        cache._store = create_autospec(DiskStore, instance=True, spec_set=True)
+        return cache._store
+
+    @pytest.fixture(autouse=True)
+    def clock(self, clock, patch):
+        # Waiting for another process to fetch a URL sleeps between checks
+        patch("via.get_url.cache.time.sleep")
+        return clock
+
+    @pytest.fixture(autouse=True)
+    def wall_clock(self, patch):
+        time_ = patch("via.get_url.cache.time.time")
+        time_.return_value = 500
+        return time_
+
+    @pytest.fixture
+    def fetch(self):
+        return Mock(return_value=("text/html", 200))
+
+    @pytest.fixture
+    def store(self):
+        return MemoryStore()
+
+    @pytest.fixture
+    def cache(self, fetch, store):
+        return URLDetailsCache(fetch, store)
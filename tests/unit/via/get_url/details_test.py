@@ -1,17 +1,49 @@
+import logging
+import socket
+from datetime import timedelta
 from io import BytesIO
+from unittest.mock import create_autospec
 
 import pytest
 from h_matchers import Any
-from requests import Response
+from requests import Response, Session
 from requests.exceptions import (
+    ConnectionError,
+    ConnectTimeout,
     MissingSchema,
     ProxyError,
+    ReadTimeout,
     SSLError,
     UnrewindableBodyError,
 )
+from urllib3.exceptions import MaxRetryError, NewConnectionError, ProtocolError
 
-from via.exceptions import BadURL, UnhandledException, UpstreamServiceError
-from via.get_url.details import get_url_details
+from via.exceptions import (
+    BadURL,
+    UnhandledException,
+    UpstreamConnectionRefused,
+    UpstreamHostNotFound,
+    UpstreamServiceError,
+    UpstreamTimeout,
+    UpstreamTransientError,
+)
+from via.get_url.details import URLDetails, get_url_details
+from via.get_url.probe import ProbeStrategy
+from via.get_url.session import make_session
+from via.get_url.timing import PhaseTimings
+
+
+def connection_error(cause):
+    """Get a `requests` error for failing to connect, like it really raises."""
+    reason = NewConnectionError(None, f"Failed to establish a new connection: {cause}")
+    reason.__context__ = cause
+    retry_error = MaxRetryError(None, "/", reason)
+    retry_error.__context__ = reason
+
+    error = ConnectionError(retry_error)
+    error.__context__ = retry_error
+
+    return error
 
 
 class TestGetURLDetails:
@@ -27,7 +59,7 @@ class TestGetURLDetails:
     def test_it_calls_get_for_normal_urls(
         # pylint: disable=too-many-arguments
         self,
-        requests,
+        session,
         response,
         content_type,
         mime_type,
@@ -42,34 +74,136 @@ class TestGetURLDetails:
 
         url = "http://example.com"
 
-        result = get_url_details(url, headers={})
+        result = get_url_details(session, url, headers={})
+
+        assert result == URLDetails(mime_type, status_code)
+        session.get.assert_called_once_with(
+            url,
+            allow_redirects=True,
+            stream=True,
+            headers=Any(),
+            timeout=(10, 10),
+            hooks=Any(),
+        )
+
+    @pytest.mark.parametrize(
+        "content_type,sniff,mime_type",
+        (
+            ("application/octet-stream", True, "application/pdf"),
+            (None, True, "application/pdf"),
+            ("application/octet-stream", False, "application/octet-stream"),
+            ("text/html", True, "text/html"),
+        ),
+    )
+    def test_it_sniffs_generic_content(
+        self, session, response, content_type, sniff, mime_type
+    ):
+        response.raw = BytesIO(b"%PDF-1.4")
+        response.headers = {"Content-Type": content_type} if content_type else {}
+
+        result = get_url_details(session, "http://example.com", {}, sniff=sniff)
+
+        assert result == URLDetails(mime_type, 200)
+
+    def test_it_keeps_the_header_type_if_sniffing_fails(self, session, response):
+        response.raw = BytesIO(b"Not a PDF")
+        response.headers = {"Content-Type": "application/octet-stream"}
+
+        result = get_url_details(session, "http://example.com", {}, sniff=True)
+
+        assert result == URLDetails("application/octet-stream", 200)
+
+    @pytest.mark.usefixtures("response")
+    def test_it_uses_the_probe_strategy(self, session, clean_headers):
+        probe_strategy = create_autospec(ProbeStrategy, instance=True, spec_set=True)
+        probe_strategy.open.return_value = session.get.return_value
+
+        get_url_details(
+            session, "http://example.com", {}, probe_strategy=probe_strategy
+        )
+
+        probe_strategy.open.assert_called_once_with(
+            session, "http://example.com", headers=clean_headers.return_value,
+        )
+
+    @pytest.mark.parametrize(
+        "headers,validators",
+        (
+            ({"ETag": '"abc"'}, {"If-None-Match": '"abc"'}),
+            (
+                {"Last-Modified": "Wed, 21 Oct 2015 07:28:00 GMT"},
+                {"If-Modified-Since": "Wed, 21 Oct 2015 07:28:00 GMT"},
+            ),
+            ({"ETag": ""}, None),
+        ),
+    )
+    def test_it_returns_validators(self, session, response, headers, validators):
+        response.headers = dict(headers, **{"Content-Type": "application/pdf"})
+
+        result = get_url_details(session, "http://example.com", {})
+
+        assert result.validators == validators
+
+    def test_it_sends_validators(self, session, response, clean_headers):
+        clean_headers.return_value = {"User-Agent": "Agent"}
+        response.status_code = 304
+
+        result = get_url_details(
+            session, "http://example.com", {}, validators={"If-None-Match": '"abc"'}
+        )
+
+        _args, kwargs = session.get.call_args
+        assert kwargs["headers"] == {"User-Agent": "Agent", "If-None-Match": '"abc"'}
+        assert result.status_code == 304
+
+    def test_it_records_the_time_spent_in_each_phase(self, session, response):
+        redirect = Response()
+        redirect.elapsed = timedelta(seconds=2)
+        response.history = [redirect]
+        response.elapsed = timedelta(seconds=1)
+        timings = PhaseTimings()
+
+        get_url_details(session, "http://example.com", {}, timings=timings)
 
-        assert result == (mime_type, status_code)
-        requests.get.assert_called_once_with(
-            url, allow_redirects=True, stream=True, headers=Any(), timeout=10,
+        assert timings.stats["probes"] == 1
+        assert timings.stats["max_seconds"] == Any.dict.containing(
+            {"redirects": 2, "response": 1}
         )
 
+    def test_it_logs_the_time_spent_in_each_phase(self, session, response, caplog):
+        response.elapsed = timedelta(seconds=1.5)
+        caplog.set_level(logging.DEBUG, logger="via.get_url.details")
+
+        get_url_details(session, "http://example.com", {}, timings=PhaseTimings())
+
+        assert caplog.messages == [
+            Any.string.matching(
+                r"^Probed http://example.com \(redirects 0.000s, response 1.500s, "
+                r"body \d+\.\d{3}s\)$"
+            )
+        ]
+
     @pytest.mark.usefixtures("response")
-    def test_it_cleans_and_passes_on_the_users_headers(self, requests, clean_headers):
-        get_url_details(url="http://example.com", headers={})
+    def test_it_cleans_and_passes_on_the_users_headers(self, session, clean_headers):
+        get_url_details(session, url="http://example.com", headers={})
 
-        _args, kwargs = requests.get.call_args
+        _args, kwargs = session.get.call_args
 
         assert kwargs["headers"] == clean_headers.return_value
 
-    def test_it_assumes_pdf_with_a_google_drive_url(self, requests):
+    def test_it_assumes_pdf_with_a_google_drive_url(self, session):
         result = get_url_details(
-            "https://drive.google.com/uc?id=--FILEID--&export=download", {}
+            session, "https://drive.google.com/uc?id=--FILEID--&export=download", {}
         )
 
-        assert result == ("application/pdf", 200)
+        assert result == URLDetails("application/pdf", 200)
 
-        requests.get.assert_not_called()
+        session.get.assert_not_called()
 
     @pytest.mark.parametrize("bad_url", ("no-schema", "glub://example.com", "http://"))
     def test_it_raises_BadURL_for_invalid_urls(self, bad_url):
         with pytest.raises(BadURL):
-            get_url_details(bad_url, {})
+            get_url_details(make_session(), bad_url, {})
 
     @pytest.mark.parametrize(
         "request_exception,expected_exception",
@@ -81,26 +215,58 @@ class TestGetURLDetails:
         ),
     )
     def test_it_catches_requests_exceptions(
-        self, requests, request_exception, expected_exception
+        self, session, request_exception, expected_exception
     ):
-        requests.get.side_effect = request_exception("Oh noe")
+        session.get.side_effect = request_exception("Oh noe")
 
         with pytest.raises(expected_exception):
-            get_url_details("http://example.com", {})
+            get_url_details(session, "http://example.com", {})
+
+    @pytest.mark.parametrize(
+        "request_exception,expected_exception",
+        (
+            (
+                connection_error(socket.gaierror(-2, "Name or service not known")),
+                UpstreamHostNotFound,
+            ),
+            (
+                connection_error(ConnectionRefusedError(111, "Connection refused")),
+                UpstreamConnectionRefused,
+            ),
+            (
+                ConnectionError(
+                    ProtocolError("Connection aborted.", ConnectionResetError(104))
+                ),
+                UpstreamTransientError,
+            ),
+            (ConnectTimeout("Connect timed out"), UpstreamTimeout),
+            (ReadTimeout("Read timed out"), UpstreamTimeout),
+            (SSLError("Bad certificate"), UpstreamServiceError),
+        ),
+    )
+    def test_it_tells_upstream_errors_apart(
+        self, session, request_exception, expected_exception
+    ):
+        session.get.side_effect = request_exception
+
+        with pytest.raises(UpstreamServiceError) as exc_info:
+            get_url_details(session, "http://example.com", {})
+
+        assert exc_info.type is expected_exception
 
     @pytest.fixture
-    def response(self, requests):
+    def response(self, session):
         response = Response()
         response.raw = BytesIO(b"")
         response.headers = {"Content-Type": "dummy"}
         response.status_code = 200
-        requests.get.return_value = response
+        session.get.return_value = response
 
         return response
 
     @pytest.fixture
-    def requests(self, patch):
-        return patch("via.get_url.details.requests")
+    def session(self):
+        return create_autospec(Session, instance=True, spec_set=True)
 
     @pytest.fixture(autouse=True)
     def clean_headers(self, patch):
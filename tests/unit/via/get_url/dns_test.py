@@ -0,0 +1,184 @@
+import socket
+from unittest.mock import create_autospec, sentinel
+
+import pytest
+from urllib3.exceptions import NewConnectionError
+
+from via.get_url.dns import DNSCache, ResolvingHTTPAdapter, dns_cache_from_settings
+from via.get_url.timing import PhaseTimings
+
+
+class TestDNSCache:
+    def test_it_resolves_hosts(self, getaddrinfo):
+        assert DNSCache().resolve("example.com") == ("1.2.3.4",)
+
+        getaddrinfo.assert_called_once_with(
+            "example.com", None, socket.AF_INET, socket.SOCK_STREAM
+        )
+
+    def test_it_keeps_every_address_once(self, getaddrinfo):
+        getaddrinfo.return_value = [
+            (socket.AF_INET6, socket.SOCK_STREAM, 6, "", ("::1", 0, 0, 0)),
+            (socket.AF_INET, socket.SOCK_STREAM, 6, "", ("1.2.3.4", 0)),
+            (socket.AF_INET, socket.SOCK_STREAM, 6, "", ("1.2.3.4", 0)),
+        ]
+
+        assert DNSCache().resolve("example.com") == ("::1", "1.2.3.4")
+
+    def test_it_caches_addresses(self, getaddrinfo):
+        cache = DNSCache()
+
+        cache.resolve("example.com")
+        cache.resolve("example.com")
+
+        getaddrinfo.assert_called_once()
+        assert cache.stats == {"hits": 1, "misses": 1, "evictions": 0, "size": 1}
+
+    def test_it_forgets_addresses_after_the_ttl(self, getaddrinfo, clock):
+        cache = DNSCache(ttl=60)
+        cache.resolve("example.com")
+
+        clock.return_value += 60
+        cache.resolve("example.com")
+
+        assert getaddrinfo.call_count == 2
+
+    def test_it_caches_failures(self, getaddrinfo, clock):
+        getaddrinfo.side_effect = socket.gaierror(socket.EAI_NONAME, "Not known")
+        cache = DNSCache(negative_ttl=10)
+
+        for _ in range(2):
+            with pytest.raises(socket.gaierror) as exc_info:
+                cache.resolve("missing.example.com")
+
+        assert exc_info.value.args == (socket.EAI_NONAME, "Not known")
+        getaddrinfo.assert_called_once()
+
+        clock.return_value += 10
+        with pytest.raises(socket.gaierror):
+            cache.resolve("missing.example.com")
+        assert getaddrinfo.call_count == 2
+
+    def test_it_limits_the_number_of_hosts(self, getaddrinfo):
+        cache = DNSCache(max_size=1)
+
+        cache.resolve("a.example.com")
+        cache.resolve("b.example.com")
+
+        assert cache.stats["size"] == 1
+
+    def test_it_records_lookup_time(self, getaddrinfo, clock):
+        timings = create_autospec(PhaseTimings, instance=True, spec_set=True)
+        clock.side_effect = [1000.0, 1000.25, 1000.25]
+
+        DNSCache(timings=timings).resolve("example.com")
+
+        timings.add.assert_called_once_with("dns", 0.25)
+
+
+class TestResolvingHTTPAdapter:
+    @pytest.mark.parametrize(
+        "url,port", (("http://example.com", 80), ("https://example.com", 443))
+    )
+    def test_it_connects_to_the_cached_address(self, url, port, create_connection):
+        adapter = ResolvingHTTPAdapter(DNSCache())
+        pool = adapter.get_connection(url)
+
+        conn = pool._new_conn()  # pylint: disable=protected-access
+        conn._new_conn()  # pylint: disable=protected-access
+
+        assert conn.host == "example.com"
+        create_connection.assert_called_once()
+        assert create_connection.call_args[0][0] == ("1.2.3.4", port)
+
+    @pytest.mark.parametrize(
+        "error", (OSError("Network is unreachable"), socket.timeout("timed out"))
+    )
+    def test_it_tries_each_address_in_turn(self, getaddrinfo, create_connection, error):
+        getaddrinfo.return_value = [
+            (socket.AF_INET6, socket.SOCK_STREAM, 6, "", ("::1", 0, 0, 0)),
+            (socket.AF_INET, socket.SOCK_STREAM, 6, "", ("1.2.3.4", 0)),
+        ]
+        create_connection.side_effect = [error, sentinel.socket]
+        adapter = ResolvingHTTPAdapter(DNSCache())
+        conn = adapter.get_connection("http://example.com")._new_conn()
+
+        assert conn._new_conn() == sentinel.socket  # pylint: disable=protected-access
+
+        assert [call[0][0] for call in create_connection.call_args_list] == [
+            ("::1", 80),
+            ("1.2.3.4", 80),
+        ]
+        assert conn._dns_host == "example.com"  # pylint: disable=protected-access
+
+    def test_it_raises_the_last_error_if_no_address_works(
+        self, getaddrinfo, create_connection
+    ):
+        getaddrinfo.return_value = [
+            (socket.AF_INET, socket.SOCK_STREAM, 6, "", ("1.2.3.4", 0)),
+            (socket.AF_INET, socket.SOCK_STREAM, 6, "", ("5.6.7.8", 0)),
+        ]
+        create_connection.side_effect = OSError("Connection refused")
+        adapter = ResolvingHTTPAdapter(DNSCache())
+        conn = adapter.get_connection("http://example.com")._new_conn()
+
+        with pytest.raises(NewConnectionError):
+            conn._new_conn()  # pylint: disable=protected-access
+
+        assert create_connection.call_count == 2
+
+    def test_it_raises_NewConnectionError_for_unknown_hosts(
+        self, getaddrinfo, create_connection
+    ):
+        getaddrinfo.side_effect = socket.gaierror(socket.EAI_NONAME, "Not known")
+        adapter = ResolvingHTTPAdapter(DNSCache())
+        conn = adapter.get_connection("http://missing.example.com")._new_conn()
+
+        with pytest.raises(NewConnectionError):
+            conn._new_conn()  # pylint: disable=protected-access
+
+        create_connection.assert_not_called()
+
+    @pytest.fixture
+    def create_connection(self, patch):
+        create_connection = patch("urllib3.connection.connection.create_connection")
+        create_connection.return_value = sentinel.socket
+        return create_connection
+
+
+class TestDNSCacheFromSettings:
+    def test_it(self, getaddrinfo):
+        timings = PhaseTimings()
+
+        cache = dns_cache_from_settings(
+            {
+                "url_dns_cache": "true",
+                "url_dns_cache_ttl": "60",
+                "url_dns_cache_negative_ttl": "10",
+                "url_dns_cache_size": "0",
+            },
+            timings=timings,
+        )
+
+        cache.resolve("example.com")
+        assert cache.stats["size"] == 0
+        assert timings.stats["max_seconds"]["dns"] >= 0
+
+    def test_it_returns_None_if_disabled(self):
+        assert dns_cache_from_settings({"url_dns_cache": "false"}) is None
+
+
+@pytest.fixture(autouse=True)
+def getaddrinfo(patch):
+    getaddrinfo = patch("via.get_url.dns.socket.getaddrinfo")
+    getaddrinfo.return_value = [
+        (socket.AF_INET, socket.SOCK_STREAM, 6, "", ("1.2.3.4", 0))
+    ]
+    return getaddrinfo
+
+
+@pytest.fixture(autouse=True)
+def allowed_gai_family(patch):
+    allowed_gai_family = patch("via.get_url.dns.allowed_gai_family")
+    allowed_gai_family.return_value = socket.AF_INET
+    return allowed_gai_family
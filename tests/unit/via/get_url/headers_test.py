@@ -1,7 +1,8 @@
-from collections import OrderedDict
+from unittest import mock
 
 import pytest
 
+from via.get_url import headers
 from via.get_url.headers import (
     BANNED_HEADERS,
     HEADER_DEFAULTS,
@@ -18,7 +19,12 @@ class TestCleanHeaders:
 
         assert result == headers
         assert list(result.keys()) == ["Most-Headers", "Preserving"]
-        assert isinstance(result, OrderedDict)
+
+    def test_the_result_is_read_only(self):
+        result = clean_headers({"Header": "value"})
+
+        with pytest.raises(TypeError):
+            result["Header"] = "other value"
 
     # For the following tests we are going to lean heavily on the defined lists
     # of headers, and just test that the function applies them correctly. Other
@@ -42,6 +48,29 @@ class TestCleanHeaders:
 
         assert header_name not in result
 
+    @pytest.mark.parametrize(
+        "header_name,expected",
+        (
+            ("cf-ray", {}),
+            ("HOST", {}),
+            ("referer", {"Referer": "https://www.google.com"}),
+            ("dnt", {"DNT": "value"}),
+            ("most-headers", {"most-headers": "value"}),
+        ),
+    )
+    def test_we_match_names_case_insensitively(self, header_name, expected):
+        result = clean_headers({header_name: "value"})
+
+        assert result == expected
+
+    def test_it_stops_remembering_header_names_when_full(self):
+        with mock.patch.object(headers, "_RULES_BY_NAME", {}) as rules_by_name:
+            with mock.patch.object(headers, "_RULES_BY_NAME_SIZE", 1):
+                result = clean_headers({"Cf-Ray": "value", "Dnt": "1", "Other": "2"})
+
+        assert result == {"DNT": "1", "Other": "2"}
+        assert list(rules_by_name) == ["Cf-Ray"]
+
     @pytest.mark.parametrize("header_name,mapped_name", HEADER_MAP.items())
     def test_we_map_mangled_header_names(self, header_name, mapped_name):
         result = clean_headers({header_name: "value"})
@@ -0,0 +1,96 @@
+import threading
+from unittest.mock import Mock, sentinel
+
+import pytest
+
+from via.exceptions import UpstreamTimeout
+from via.get_url.limiter import ProbeLimiter, limiter_from_settings
+
+
+class TestProbeLimiter:
+    def test_wrap_calls_through(self, limiter):
+        fetch = Mock(return_value=sentinel.details)
+
+        result = limiter.wrap(fetch)(
+            "http://example.com", sentinel.headers, validators=sentinel.validators
+        )
+
+        fetch.assert_called_once_with(
+            "http://example.com", sentinel.headers, validators=sentinel.validators
+        )
+        assert result == sentinel.details
+
+    def test_it_counts_probes_in_flight(self, limiter):
+        with limiter.slot("http://example.com"):
+            assert limiter.stats == {"in_flight": 1, "rejected": 0}
+
+        assert limiter.stats == {"in_flight": 0, "rejected": 0}
+
+    def test_it_limits_probes_per_host(self, limiter):
+        with limiter.slot("http://example.com/a"):
+            with pytest.raises(UpstreamTimeout):
+                with limiter.slot("http://example.com/b"):
+                    pass  # pragma: no cover
+
+            with limiter.slot("http://other.example.com"):
+                pass
+
+        assert limiter.stats["rejected"] == 1
+
+    def test_it_limits_probes_overall(self, limiter):
+        with limiter.slot("http://a.example.com"):
+            with limiter.slot("http://b.example.com"):
+                with pytest.raises(UpstreamTimeout):
+                    with limiter.slot("http://c.example.com"):
+                        pass  # pragma: no cover
+
+    def test_it_frees_slots_on_error(self, limiter):
+        with pytest.raises(ValueError):
+            with limiter.slot("http://example.com"):
+                raise ValueError()
+
+        with limiter.slot("http://example.com"):
+            pass
+
+        assert limiter.stats == {"in_flight": 0, "rejected": 0}
+
+    def test_it_waits_for_a_free_slot(self):
+        limiter = ProbeLimiter(max_concurrent=1, wait_timeout=5)
+        in_slot = threading.Event()
+
+        def hold_slot():
+            with limiter.slot("http://example.com"):
+                in_slot.set()
+                release.wait()
+
+        release = threading.Event()
+        thread = threading.Thread(target=hold_slot)
+        thread.start()
+        in_slot.wait()
+
+        threading.Timer(0.05, release.set).start()
+        with limiter.slot("http://other.example.com"):
+            pass
+
+        thread.join()
+        assert limiter.stats == {"in_flight": 0, "rejected": 0}
+
+    @pytest.fixture
+    def limiter(self):
+        return ProbeLimiter(max_concurrent=2, max_per_host=1, wait_timeout=0)
+
+
+class TestLimiterFromSettings:
+    def test_it(self):
+        limiter = limiter_from_settings(
+            {
+                "probe_max_concurrent": "1",
+                "probe_max_per_host": "1",
+                "probe_wait_timeout": "0",
+            }
+        )
+
+        with limiter.slot("http://example.com"):
+            with pytest.raises(UpstreamTimeout):
+                with limiter.slot("http://other.example.com"):
+                    pass  # pragma: no cover
@@ -0,0 +1,204 @@
+from unittest.mock import Mock, sentinel
+
+import pytest
+
+from tests.unit.conftest import as_async, run
+from via.exceptions import (
+    BadURL,
+    UnhandledException,
+    UpstreamConnectionRefused,
+    UpstreamHostFailing,
+    UpstreamHostNotFound,
+    UpstreamServiceError,
+    UpstreamTimeout,
+    UpstreamTransientError,
+)
+from via.get_url.breaker import CircuitBreaker
+from via.get_url.negative import NegativeCache, negative_cache_from_settings
+
+
+class TestNegativeCache:
+    def test_it_calls_through(self, cache):
+        fetch = Mock(return_value=("text/html", 200))
+
+        result = cache.wrap(fetch)(
+            "http://example.com", sentinel.headers, validators=sentinel.validators
+        )
+
+        fetch.assert_called_once_with(
+            "http://example.com", sentinel.headers, validators=sentinel.validators
+        )
+        assert result == ("text/html", 200)
+
+    @pytest.mark.parametrize("error_class", (BadURL, UpstreamServiceError))
+    def test_it_caches_errors(self, cache, error_class):
+        fetch = cache.wrap(Mock(side_effect=error_class("Oh no")))
+
+        with pytest.raises(error_class):
+            fetch("http://example.com", {})
+        with pytest.raises(error_class) as exc_info:
+            fetch("HTTP://EXAMPLE.COM:80/", {})
+
+        assert exc_info.value.detail == "Oh no"
+        assert cache.stats == {"hits": 1, "evictions": 0, "size": 1}
+
+    def test_wrap_async_calls_through(self, cache):
+        fetch = Mock(return_value=("text/html", 200))
+
+        result = run(
+            cache.wrap_async(as_async(fetch))(
+                "http://example.com", sentinel.headers, validators=sentinel.validators
+            )
+        )
+
+        fetch.assert_called_once_with(
+            "http://example.com", sentinel.headers, validators=sentinel.validators
+        )
+        assert result == ("text/html", 200)
+
+    @pytest.mark.parametrize(
+        "error_class,calls", ((BadURL, 1), (UnhandledException, 2))
+    )
+    def test_wrap_async_caches_errors_like_wrap(self, cache, error_class, calls):
+        fetch = Mock(side_effect=error_class("Oh no"))
+        wrapped = cache.wrap_async(as_async(fetch))
+
+        for _ in range(2):
+            with pytest.raises(error_class):
+                run(wrapped("http://example.com", {}))
+
+        assert fetch.call_count == calls
+
+    @pytest.mark.parametrize(
+        "error_class,max_age",
+        (
+            (BadURL, 300),
+            (UpstreamHostNotFound, 60),
+            (UpstreamConnectionRefused, 10),
+            (UpstreamServiceError, 30),
+        ),
+    )
+    def test_it_caches_each_class_for_its_own_max_age(
+        self, cache, clock, error_class, max_age
+    ):
+        fetch = Mock(side_effect=error_class("Oh no"))
+        wrapped = cache.wrap(fetch)
+        with pytest.raises(error_class):
+            wrapped("http://example.com", {})
+
+        clock.return_value += max_age - 1
+        with pytest.raises(error_class):
+            wrapped("http://example.com", {})
+        assert fetch.call_count == 1
+
+        clock.return_value += 1
+        with pytest.raises(error_class):
+            wrapped("http://example.com", {})
+        assert fetch.call_count == 2
+
+    @pytest.mark.parametrize(
+        "error_class",
+        (
+            UnhandledException,
+            UpstreamHostFailing,
+            UpstreamTransientError,
+            UpstreamTimeout,
+        ),
+    )
+    def test_it_does_not_cache_other_errors(self, cache, error_class):
+        fetch = Mock(side_effect=error_class("Oh no"))
+        wrapped = cache.wrap(fetch)
+
+        for _ in range(2):
+            with pytest.raises(error_class):
+                wrapped("http://example.com", {})
+
+        assert fetch.call_count == 2
+
+    def test_it_lets_the_circuit_breaker_try_again_after_cool_down(self, cache):
+        breaker = CircuitBreaker(min_requests=1, cool_down=0)
+        breaker.before_request("example.com")
+        breaker.after_request("example.com", failed=True)
+        fetch = Mock(return_value=("text/html", 200))
+        wrapped = cache.wrap(breaker.wrap(fetch))
+
+        # Our cool down is over straight away, so take the trial slot
+        breaker.before_request("example.com")
+        with pytest.raises(UpstreamHostFailing):
+            wrapped("http://example.com", {})
+        breaker.after_request("example.com", failed=None)
+
+        assert wrapped("http://example.com", {}) == ("text/html", 200)
+
+    def test_it_does_not_cache_errors_with_no_max_age(self):
+        cache = NegativeCache({BadURL: 0})
+        fetch = Mock(side_effect=BadURL("Bad"))
+        wrapped = cache.wrap(fetch)
+
+        for _ in range(2):
+            with pytest.raises(BadURL):
+                wrapped("http://example.com", {})
+
+        assert fetch.call_count == 2
+
+    def test_it_does_not_cache_responses(self, cache):
+        fetch = Mock(return_value=("text/html", 503))
+        wrapped = cache.wrap(fetch)
+
+        wrapped("http://example.com", {})
+        wrapped("http://example.com", {})
+
+        assert fetch.call_count == 2
+
+    def test_it_limits_the_number_of_errors(self):
+        cache = NegativeCache({BadURL: 300}, max_size=1)
+        fetch = cache.wrap(Mock(side_effect=BadURL("Bad")))
+
+        for url in ("http://a.example.com", "http://b.example.com"):
+            with pytest.raises(BadURL):
+                fetch(url, {})
+
+        assert cache.stats["size"] == 1
+
+    @pytest.fixture
+    def cache(self):
+        return NegativeCache(
+            {
+                BadURL: 300,
+                UpstreamHostNotFound: 60,
+                UpstreamConnectionRefused: 10,
+                UpstreamServiceError: 30,
+            }
+        )
+
+
+class TestNegativeCacheFromSettings:
+    @pytest.mark.parametrize(
+        "setting,error_class",
+        (
+            ("url_negative_cache_bad_url_max_age", BadURL),
+            ("url_negative_cache_host_not_found_max_age", UpstreamHostNotFound),
+            (
+                "url_negative_cache_connection_refused_max_age",
+                UpstreamConnectionRefused,
+            ),
+            ("url_negative_cache_upstream_error_max_age", UpstreamServiceError),
+        ),
+    )
+    def test_it(self, setting, error_class):
+        settings = {
+            "url_negative_cache_bad_url_max_age": "300",
+            "url_negative_cache_host_not_found_max_age": "60",
+            "url_negative_cache_connection_refused_max_age": "10",
+            "url_negative_cache_upstream_error_max_age": "30",
+            "url_negative_cache_size": "10",
+        }
+        settings[setting] = "0"
+        fetch = Mock(side_effect=error_class("Down"))
+        wrapped = negative_cache_from_settings(settings).wrap(fetch)
+
+        for _ in range(2):
+            with pytest.raises(error_class):
+                wrapped("http://example.com", {})
+
+        assert fetch.call_count == 2
@@ -0,0 +1,45 @@
+from unittest.mock import create_autospec, sentinel
+
+import pytest
+from urllib3.connection import HTTPConnection
+from urllib3.connectionpool import HTTPConnectionPool
+
+from via.get_url.pools import (
+    CountingHTTPAdapter,
+    CountingHTTPConnectionPool,
+    CountingHTTPSConnectionPool,
+)
+
+
+class TestCountingHTTPConnectionPool:
+    def test_it_counts_requests_which_open_a_socket(self, _make_request):
+        pool = CountingHTTPConnectionPool("example.com")
+        conn = create_autospec(HTTPConnection, instance=True)
+
+        conn.sock = None
+        result = pool._make_request(conn, "GET", "/")
+        conn.sock = sentinel.socket
+        pool._make_request(conn, "GET", "/")
+
+        assert pool.num_connects == 1
+        assert result == _make_request.return_value
+        _make_request.assert_called_with(pool, conn, "GET", "/")
+
+    @pytest.fixture
+    def _make_request(self, patch):
+        return patch("urllib3.connectionpool.HTTPConnectionPool._make_request")
+
+
+class TestCountingHTTPAdapter:
+    @pytest.mark.parametrize(
+        "url,pool_class",
+        (
+            ("http://example.com", CountingHTTPConnectionPool),
+            ("https://example.com", CountingHTTPSConnectionPool),
+        ),
+    )
+    def test_it_uses_counting_pools(self, url, pool_class):
+        pool = CountingHTTPAdapter().get_connection(url)
+
+        assert isinstance(pool, pool_class)
+        assert isinstance(pool, HTTPConnectionPool)
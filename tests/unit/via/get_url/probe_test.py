@@ -0,0 +1,214 @@
+from io import BytesIO
+from unittest.mock import create_autospec, sentinel
+
+import pytest
+from h_matchers import Any
+from requests import Response, Session
+
+from via.get_url.probe import ProbeStrategy
+from via.get_url.redirects import RedirectIndex, Resolved
+from via.get_url.timing import Timeouts
+
+
+class TestProbeStrategy:
+    def test_get_makes_a_streaming_get(self, session):
+        result = ProbeStrategy("get").open(
+            session, "http://example.com", headers={}, verify=sentinel.verify
+        )
+
+        session.get.assert_called_once_with(
+            "http://example.com",
+            stream=True,
+            allow_redirects=True,
+            headers={},
+            timeout=(10, 10),
+            hooks=Any(),
+            verify=sentinel.verify,
+        )
+        assert result == session.get.return_value
+
+    @pytest.mark.parametrize("status_code,expected", ((206, 200), (200, 200)))
+    def test_range_gets_the_first_byte(self, session, respond, status_code, expected):
+        respond(session.get, status_code)
+
+        result = ProbeStrategy("range").open(
+            session, "http://example.com", headers={"A": "b"}
+        )
+
+        session.get.assert_called_once_with(
+            "http://example.com",
+            stream=True,
+            allow_redirects=True,
+            headers={"A": "b", "Range": "bytes=0-1023"},
+            timeout=(10, 10),
+            hooks=Any(),
+        )
+        assert result.status_code == expected
+
+    def test_range_falls_back_to_get_if_not_satisfiable(self, session, respond):
+        respond(session.get, 416)
+
+        ProbeStrategy("range").open(session, "http://example.com", headers={})
+
+        assert session.get.call_count == 2
+        _, kwargs = session.get.call_args
+        assert "Range" not in kwargs["headers"]
+
+    def test_head_makes_a_head_request(self, session, respond):
+        respond(session.head, 200)
+
+        result = ProbeStrategy("head").open(session, "http://example.com", {})
+
+        session.head.assert_called_once_with(
+            "http://example.com",
+            allow_redirects=True,
+            headers={},
+            timeout=(10, 10),
+            hooks=Any(),
+        )
+        session.get.assert_not_called()
+        assert result == session.head.return_value
+
+    def test_head_accepts_not_modified(self, session, respond):
+        respond(session.head, 304, content_type=None)
+
+        result = ProbeStrategy("head").open(session, "http://example.com", {})
+
+        session.get.assert_not_called()
+        assert result.status_code == 304
+
+    @pytest.mark.parametrize(
+        "head_status,get_status", ((405, 206), (501, 206), (405, 404), (403, 206))
+    )
+    def test_head_falls_back_to_range_and_remembers_if_head_is_not_supported(
+        self, session, respond, head_status, get_status
+    ):
+        respond(session.head, head_status)
+        respond(session.get, get_status)
+        strategy = ProbeStrategy("head")
+
+        strategy.open(session, "http://example.com/1", {})
+        strategy.open(session, "http://example.com/2", {})
+
+        session.head.assert_called_once()
+        assert session.get.call_count == 2
+        assert strategy.method_for_host("example.com") == "range"
+        assert strategy.method_for_host("other.example.com") == "head"
+
+    @pytest.mark.parametrize(
+        "head_status,content_type,get_status",
+        (
+            (404, "text/html", 404),
+            (503, "text/html", 503),
+            (200, None, 206),
+            (200, "application/octet-stream; charset=binary", 206),
+        ),
+    )
+    def test_head_falls_back_to_range_for_just_this_url(
+        self, session, respond, head_status, content_type, get_status
+    ):
+        respond(session.head, head_status, content_type)
+        respond(session.get, get_status)
+        strategy = ProbeStrategy("head")
+
+        result = strategy.open(session, "http://example.com/1", {})
+        strategy.open(session, "http://example.com/2", {})
+
+        assert result == session.get.return_value
+        assert session.head.call_count == 2
+        assert session.get.call_count == 2
+        assert strategy.method_for_host("example.com") == "head"
+
+    def test_it_forgets_the_oldest_hosts(self, session, respond):
+        respond(session.head, 405)
+        respond(session.get, 206)
+        strategy = ProbeStrategy("head", max_hosts=1)
+
+        strategy.open(session, "http://one.example.com", {})
+        strategy.open(session, "http://two.example.com", {})
+
+        assert strategy.method_for_host("one.example.com") == "head"
+        assert strategy.method_for_host("two.example.com") == "range"
+
+    def test_it_applies_the_timeouts(self, session, respond):
+        respond(session.get, 200)
+        strategy = ProbeStrategy(timeouts=Timeouts(connect=1, read=2, total=30))
+
+        strategy.open(session, "http://example.com", {})
+
+        _, kwargs = session.get.call_args
+        assert kwargs["timeout"] == (1, 2)
+
+    def test_it_shares_the_deadline_between_requests(self, session, respond):
+        respond(session.head, 405)
+        respond(session.get, 200)
+        strategy = ProbeStrategy("head", timeouts=Timeouts(connect=1, read=2, total=30))
+
+        strategy.open(session, "http://example.com", {})
+
+        _, head_kwargs = session.head.call_args
+        _, get_kwargs = session.get.call_args
+        assert head_kwargs["hooks"] == get_kwargs["hooks"]
+
+    def test_it_records_redirects(self, session, respond, redirects):
+        respond(session.get, 200)
+
+        result = ProbeStrategy(redirects=redirects).open(
+            session, "http://example.com", {}
+        )
+
+        redirects.record.assert_called_once_with(result)
+
+    def test_it_skips_to_known_destinations(self, session, respond, redirects):
+        redirects.resolve.return_value = Resolved("http://final.example.com", 200, None)
+        respond(session.get, 200)
+
+        result = ProbeStrategy(redirects=redirects).open(
+            session, "http://example.com", {}
+        )
+
+        session.get.assert_called_once()
+        args, _ = session.get.call_args
+        assert args == ("http://final.example.com",)
+        redirects.record.assert_not_called()
+        assert result == session.get.return_value
+
+    def test_it_forgets_known_destinations_which_fail(
+        self, session, respond, redirects
+    ):
+        redirects.resolve.return_value = Resolved("http://final.example.com", 200, None)
+        respond(session.get, 404)
+
+        ProbeStrategy(redirects=redirects).open(session, "http://example.com", {})
+
+        redirects.forget.assert_called_once_with("http://example.com")
+        assert session.get.call_count == 2
+        args, _ = session.get.call_args
+        assert args == ("http://example.com",)
+
+    def test_it_raises_for_unknown_methods(self):
+        with pytest.raises(ValueError):
+            ProbeStrategy("post")
+
+    @pytest.fixture
+    def respond(self):
+        def respond(method, status_code, content_type="text/html"):
+            response = Response()
+            response.raw = BytesIO(b"")
+            response.status_code = status_code
+            if content_type:
+                response.headers["Content-Type"] = content_type
+
+            method.return_value = response
+
+        return respond
+
+    @pytest.fixture
+    def redirects(self):
+        redirects = create_autospec(RedirectIndex, instance=True, spec_set=True)
+        redirects.resolve.return_value = None
+        return redirects
+
+    @pytest.fixture
+    def session(self):
+        return create_autospec(Session, instance=True, spec_set=True)
@@ -0,0 +1,119 @@
+from unittest.mock import ANY, Mock
+
+import pytest
+from requests import Response
+
+from via.get_url.redirects import RedirectIndex, Resolved, redirect_index_from_settings
+from via.get_url.store import MemoryStore
+
+
+class TestRedirectIndex:
+    def test_it_returns_None_for_unknown_urls(self, index):
+        assert index.resolve("http://example.com") is None
+        assert index.stats == {"hits": 0, "misses": 1}
+
+    def test_it_maps_every_url_in_the_chain_to_the_final_url(self, index):
+        index.record(
+            self.chain(
+                ("http://a.example.com", 301),
+                ("http://b.example.com", 301),
+                ("http://c.example.com", 200),
+            )
+        )
+
+        resolved = Resolved("http://c.example.com", 200, "application/pdf")
+        assert index.resolve("http://a.example.com") == resolved
+        assert index.resolve("HTTP://B.EXAMPLE.COM:80/") == resolved
+        assert index.stats == {"hits": 2, "misses": 0}
+
+    @pytest.mark.parametrize(
+        "first,second,a_max_age,b_max_age",
+        ((301, 308, 86400, 86400), (302, 301, 60, 86400), (301, 307, 60, 60),),
+    )
+    def test_temporary_redirects_expire_sooner(
+        # pylint: disable=too-many-arguments
+        self,
+        store,
+        index,
+        first,
+        second,
+        a_max_age,
+        b_max_age,
+    ):
+        index.record(
+            self.chain(
+                ("http://a.example.com", first),
+                ("http://b.example.com", second),
+                ("http://c.example.com", 200),
+            )
+        )
+
+        store.set.assert_any_call("redirect:http://a.example.com/", ANY, a_max_age)
+        store.set.assert_any_call("redirect:http://b.example.com/", ANY, b_max_age)
+
+    def test_it_stops_at_hops_which_are_not_redirects(self, index):
+        index.record(
+            self.chain(
+                ("http://a.example.com", 300),
+                ("http://b.example.com", 301),
+                ("http://c.example.com", 200),
+            )
+        )
+
+        assert index.resolve("http://a.example.com") is None
+        assert index.resolve("http://b.example.com").url == "http://c.example.com"
+
+    @pytest.mark.parametrize(
+        "chain",
+        (
+            (("http://a.example.com", 200),),
+            (("http://a.example.com", 301), ("http://b.example.com", 404)),
+        ),
+    )
+    def test_it_ignores_responses_without_successful_redirects(self, index, chain):
+        index.record(self.chain(*chain))
+
+        assert index.resolve("http://a.example.com") is None
+
+    def test_forget(self, index):
+        index.record(
+            self.chain(("http://a.example.com", 301), ("http://b.example.com", 200))
+        )
+
+        index.forget("http://a.example.com")
+
+        assert index.resolve("http://a.example.com") is None
+
+    def chain(self, *hops):
+        responses = []
+        for url, status_code in hops:
+            response = Response()
+            response.url = url
+            response.status_code = status_code
+            response.headers["Content-Type"] = "application/pdf"
+            responses.append(response)
+
+        final = responses.pop()
+        final.history = responses
+        return final
+
+    @pytest.fixture
+    def store(self):
+        return Mock(wraps=MemoryStore())
+
+    @pytest.fixture
+    def index(self, store):
+        return RedirectIndex(store, permanent_max_age=86400, temporary_max_age=60)
+
+
+class TestRedirectIndexFromSettings:
+    def test_it(self):
+        index = redirect_index_from_settings(
+            {
+                "url_redirect_permanent_max_age": "86400",
+                "url_redirect_temporary_max_age": "60",
+            },
+            MemoryStore(),
+        )
+
+        assert isinstance(index, RedirectIndex)
@@ -0,0 +1,61 @@
+import threading
+from unittest.mock import Mock
+
+import pytest
+
+from via.get_url.refresh import BackgroundRefresher
+
+
+class TestBackgroundRefresher:
+    def test_it_runs_refreshes_in_the_background(self, refresher):
+        func = Mock()
+
+        assert refresher.refresh("key", func)
+        refresher.shutdown()
+
+        func.assert_called_once_with()
+        assert refresher.stats == {
+            "pending": 0,
+            "queued": 1,
+            "dropped": 0,
+            "failed": 0,
+        }
+
+    def test_it_only_refreshes_each_key_once_at_a_time(self, refresher, blocker):
+        refresher.refresh("key", blocker.wait)
+
+        assert not refresher.refresh("key", Mock())
+
+        blocker.set()
+        refresher.shutdown()
+        assert refresher.stats["queued"] == 1
+        assert refresher.stats["dropped"] == 0
+
+    def test_it_drops_refreshes_when_full(self, blocker):
+        refresher = BackgroundRefresher(max_workers=1, max_pending=1)
+        refresher.refresh("key", blocker.wait)
+
+        assert not refresher.refresh("other_key", Mock())
+
+        blocker.set()
+        refresher.shutdown()
+        assert refresher.stats["dropped"] == 1
+
+    def test_it_counts_failures(self, refresher):
+        refresher.refresh("key", Mock(side_effect=ValueError))
+        refresher.shutdown()
+
+        assert refresher.stats["failed"] == 1
+        assert refresher.stats["pending"] == 0
+
+    @pytest.fixture
+    def blocker(self):
+        blocker = threading.Event()
+        yield blocker
+        blocker.set()
+
+    @pytest.fixture
+    def refresher(self):
+        refresher = BackgroundRefresher(max_workers=1, max_pending=10)
+        yield refresher
+        refresher.shutdown()
@@ -0,0 +1,159 @@
+from unittest.mock import create_autospec
+
+import httpretty
+import pytest
+from requests import Response
+from urllib3.exceptions import (
+    ConnectTimeoutError,
+    NewConnectionError,
+    ProtocolError,
+    ReadTimeoutError,
+)
+from urllib3.response import HTTPResponse
+
+from via.get_url.dns import DNSCache, ResolvingHTTPAdapter
+from via.get_url.pools import CountingHTTPAdapter
+from via.get_url.session import (
+    DRAIN_MAX_BYTES,
+    IDEMPOTENT_METHODS,
+    NoTimeoutRetry,
+    make_session,
+    pool_stats,
+    release,
+    session_from_settings,
+)
+
+
+class TestNoTimeoutRetry:
+    @pytest.mark.parametrize(
+        "error",
+        (
+            ReadTimeoutError(None, "/", "Read timed out"),
+            ConnectTimeoutError("Connect timed out"),
+        ),
+    )
+    def test_it_does_not_retry_timeouts(self, error):
+        retry = NoTimeoutRetry(total=1, connect=1, read=1)
+
+        with pytest.raises(type(error)):
+            retry.increment("GET", "/", error=error)
+
+    @pytest.mark.parametrize(
+        "error,counter",
+        (
+            (ProtocolError("Connection aborted"), "read"),
+            (NewConnectionError(None, "Connection refused"), "connect"),
+        ),
+    )
+    def test_it_retries_other_errors(self, error, counter):
+        retry = NoTimeoutRetry(total=1, connect=1, read=1)
+
+        retry = retry.increment("GET", "/", error=error)
+
+        assert isinstance(retry, NoTimeoutRetry)
+        assert getattr(retry, counter) == 0
+
+
+class TestMakeSession:
+    def test_it_mounts_a_tuned_adapter(self):
+        session = make_session(pool_connections=5, pool_maxsize=7, retries=3)
+
+        adapter = session.get_adapter("https://example.com")
+        assert isinstance(adapter, CountingHTTPAdapter)
+        assert session.get_adapter("http://example.com") is adapter
+        assert adapter.poolmanager.connection_pool_kw["maxsize"] == 7
+        assert isinstance(adapter.max_retries, NoTimeoutRetry)
+        assert adapter.max_retries.total == 3
+        assert adapter.max_retries.method_whitelist == IDEMPOTENT_METHODS
+
+    def test_it_resolves_with_the_dns_cache_if_given(self):
+        resolver = DNSCache()
+
+        session = make_session(pool_maxsize=7, resolver=resolver)
+
+        adapter = session.get_adapter("https://example.com")
+        assert isinstance(adapter, ResolvingHTTPAdapter)
+        assert adapter.poolmanager.connection_pool_kw["maxsize"] == 7
+
+    def test_it_never_sends_cookies_upstream_servers_set(self):
+        httpretty.register_uri(
+            httpretty.GET,
+            "http://example.com/login",
+            adding_headers={"Set-Cookie": "session=alice-secret; Path=/"},
+        )
+        httpretty.register_uri(httpretty.GET, "http://example.com/other")
+        session = make_session()
+
+        session.get("http://example.com/login")
+        session.get("http://example.com/other")
+
+        assert "Cookie" not in httpretty.last_request().headers
+        assert not session.cookies
+
+
+class TestRelease:
+    @pytest.mark.parametrize("remaining", (0, DRAIN_MAX_BYTES))
+    def test_it_reads_what_is_left_of_short_bodies(self, response, remaining):
+        response.raw.length_remaining = remaining
+
+        release(response)
+
+        response.raw.drain_conn.assert_called_once_with()
+        response.close.assert_called_once_with()
+
+    @pytest.mark.parametrize("remaining", (None, DRAIN_MAX_BYTES + 1))
+    def test_it_just_closes_long_or_unknown_bodies(self, response, remaining):
+        response.raw.length_remaining = remaining
+
+        release(response)
+
+        response.raw.drain_conn.assert_not_called()
+        response.close.assert_called_once_with()
+
+    @pytest.fixture
+    def response(self):
+        response = create_autospec(Response, instance=True)
+        response.raw = create_autospec(HTTPResponse, instance=True)
+        return response
+
+
+class TestSessionFromSettings:
+    def test_it(self):
+        session = session_from_settings(
+            {
+                "http_pool_connections": "5",
+                "http_pool_maxsize": "7",
+                "http_pool_block": "true",
+                "http_max_retries": "0",
+            },
+            resolver=DNSCache(),
+        )
+
+        adapter = session.get_adapter("https://example.com")
+        assert adapter.poolmanager.connection_pool_kw["block"]
+        assert adapter.max_retries.total == 0
+        assert isinstance(adapter, ResolvingHTTPAdapter)
+
+
+class TestPoolStats:
+    def test_it_reports_connection_reuse(self):
+        httpretty.register_uri(httpretty.GET, "http://example.com/", body="")
+        session = make_session()
+
+        session.get("http://example.com/")
+        session.get("http://example.com/")
+        # Our fake sockets always look dropped, so pretend we kept one open
+        session.get_adapter("http://example.com").get_connection(
+            "http://example.com/"
+        ).num_connects = 1
+
+        assert pool_stats(session) == {
+            "http://example.com:80": {"connections": 1, "requests": 2}
+        }
+
+    def test_it_skips_pools_evicted_while_listing(self):
+        session = make_session()
+        pools = session.get_adapter("http://example.com").poolmanager.pools
+        pools["not-a-real-key"] = None
+
+        assert not pool_stats(session)
@@ -0,0 +1,78 @@
+import threading
+import time
+from unittest.mock import sentinel
+
+import pytest
+
+from via.get_url.single_flight import SingleFlight
+
+
+class TestSingleFlight:
+    def test_it_returns_the_result(self, single_flight):
+        assert single_flight.call("key", lambda: sentinel.result) == sentinel.result
+
+    def test_it_raises_the_error(self, single_flight):
+        def func():
+            raise ValueError("Oh noe")
+
+        with pytest.raises(ValueError):
+            single_flight.call("key", func)
+
+    def test_it_runs_again_once_the_first_call_is_done(self, single_flight):
+        single_flight.call("key", lambda: 1)
+
+        assert single_flight.call("key", lambda: 2) == 2
+
+    @pytest.mark.parametrize("fail", (False, True))
+    def test_concurrent_callers_share_the_first_call(self, single_flight, fail):
+        started = threading.Event()
+        release = threading.Event()
+        calls = []
+
+        def slow():
+            calls.append("slow")
+            started.set()
+            release.wait()
+
+            if fail:
+                raise ValueError("Oh noe")
+
+            return sentinel.slow_result
+
+        results = []
+
+        def call(func):
+            try:
+                results.append(single_flight.call("key", func))
+            except ValueError as err:
+                results.append(err)
+
+        leader = threading.Thread(target=call, args=(slow,))
+        leader.start()
+        started.wait()
+
+        followers = [
+            threading.Thread(target=call, args=(lambda: calls.append("fast"),))
+            for _ in range(3)
+        ]
+        for follower in followers:
+            follower.start()
+
+        # Wait for the followers to be queued up behind the leader
+        while single_flight.coalesced < 3:
+            time.sleep(0.001)
+
+        release.set()
+        for thread in [leader] + followers:
+            thread.join()
+
+        assert calls == ["slow"]
+        assert len(results) == 4
+        if fail:
+            assert all(isinstance(result, ValueError) for result in results)
+        else:
+            assert results == [sentinel.slow_result] * 4
+
+    @pytest.fixture
+    def single_flight(self):
+        return SingleFlight()
@@ -0,0 +1,64 @@
+from io import BytesIO
+from unittest.mock import create_autospec
+
+import pytest
+from requests import Response
+from requests.exceptions import ChunkedEncodingError
+
+from via.get_url.sniff import (
+    GENERIC_MIME_TYPES,
+    header_mime_type,
+    is_generic,
+    sniff_mime_type,
+)
+
+
+class TestHeaderMimeType:
+    @pytest.mark.parametrize(
+        "content_type,mime_type",
+        (
+            ("application/pdf", "application/pdf"),
+            ("application/pdf; qs=0.001", "application/pdf"),
+            (None, None),
+        ),
+    )
+    def test_it(self, content_type, mime_type):
+        response = Response()
+        if content_type:
+            response.headers["Content-Type"] = content_type
+
+        assert header_mime_type(response) == mime_type
+
+
+class TestIsGeneric:
+    @pytest.mark.parametrize("mime_type", [None] + list(GENERIC_MIME_TYPES))
+    def test_it_returns_True_for_generic_types(self, mime_type):
+        assert is_generic(mime_type)
+
+    @pytest.mark.parametrize("mime_type", ("application/pdf", "text/html"))
+    def test_it_returns_False_for_specific_types(self, mime_type):
+        assert not is_generic(mime_type)
+
+
+class TestSniffMimeType:
+    @pytest.mark.parametrize(
+        "content,mime_type",
+        (
+            (b"%PDF-1.4\n...", "application/pdf"),
+            (b"\xef\xbb\xbf%PDF-1.7", "application/pdf"),
+            (b"<!DOCTYPE html>", None),
+            (b"", None),
+            (b" " * 2000 + b"%PDF-1.4", None),
+        ),
+    )
+    def test_it(self, content, mime_type):
+        response = Response()
+        response.raw = BytesIO(content)
+
+        assert sniff_mime_type(response) == mime_type
+
+    def test_it_returns_None_if_the_content_cannot_be_read(self):
+        response = create_autospec(Response, instance=True, spec_set=True)
+        response.iter_content.side_effect = ChunkedEncodingError
+
+        assert sniff_mime_type(response) is None
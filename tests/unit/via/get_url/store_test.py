@@ -0,0 +1,144 @@
+import os
+
+import pytest
+
+from via.get_url.store import DiskStore, MemoryStore, store_from_settings
+
+
+@pytest.mark.usefixtures("clock")
+class TestMemoryStore:
+    def test_it_stores_values(self, store):
+        store.set("key", "value", 60)
+
+        assert store.get("key") == "value"
+
+    def test_it_returns_None_for_missing_values(self, store):
+        assert store.get("missing") is None
+
+    def test_it_expires_values(self, store, clock):
+        store.set("key", "value", 60)
+
+        clock.return_value += 60
+
+        assert store.get("key") is None
+        assert store.stats["size"] == 0
+
+    def test_it_evicts_the_least_recently_used_entry(self):
+        store = MemoryStore(max_size=2)
+        store.set("a", "value_a", 60)
+        store.set("b", "value_b", 60)
+        store.get("a")
+
+        store.set("c", "value_c", 60)
+
+        assert store.get("a") == "value_a"
+        assert store.get("b") is None
+        assert store.get("c") == "value_c"
+        assert store.stats == {"evictions": 1, "size": 2}
+
+    def test_items(self, store, clock):
+        store.set("expired", "value", 10)
+        store.set("key", "value", 60)
+        clock.return_value += 10
+
+        assert store.items() == [("key", "value")]
+
+    def test_it_always_has_the_claim(self, store):
+        assert store.claim("key", 10)
+        assert store.claim("key", 10)
+        assert not store.is_claimed("key")
+
+        store.release("key")
+
+    @pytest.fixture
+    def store(self):
+        return MemoryStore()
+
+
+class TestDiskStore:
+    def test_it_stores_values(self, store):
+        store.set("key", ("text/html", 200), 60)
+
+        assert store.get("key") == ("text/html", 200)
+        assert store.stats == {"size": 1}
+
+    def test_it_returns_None_for_missing_values(self, store):
+        assert store.get("missing") is None
+
+    def test_it_shares_values_between_instances(self, store, tmpdir):
+        store.set("key", "value", 60)
+
+        assert DiskStore(str(tmpdir)).get("key") == "value"
+
+    def test_it_expires_values(self, store, Cache):
+        store.set("key", "value", 60)
+
+        Cache.return_value.set.assert_called_once_with(
+            "key", "value", expire=60, retry=True
+        )
+
+    def test_it_reopens_the_cache_after_a_fork(self, store, Cache, patch):
+        getpid = patch("via.get_url.store.os.getpid")
+        getpid.return_value = 1
+        store.get("key")
+
+        getpid.return_value = 2
+        store.get("key")
+
+        assert Cache.call_count == 2
+
+    def test_items(self, store):
+        store.set("key", "value", 60)
+        store.set("other_key", "other_value", 60)
+
+        assert sorted(store.items()) == [("key", "value"), ("other_key", "other_value")]
+
+    def test_items_skips_values_which_expire_while_listing(self, store, Cache):
+        Cache.return_value.iterkeys.return_value = ["key", "expired"]
+        Cache.return_value.get.side_effect = ["value", None]
+
+        assert list(store.items()) == [("key", "value")]
+
+    def test_only_one_process_can_claim_a_key(self, store, tmpdir):
+        other_store = DiskStore(str(tmpdir))
+
+        assert store.claim("key", 10)
+        assert not other_store.claim("key", 10)
+        assert other_store.is_claimed("key")
+
+        store.release("key")
+
+        assert not other_store.is_claimed("key")
+        assert other_store.claim("key", 10)
+
+    @pytest.fixture
+    def Cache(self, patch):
+        return patch("via.get_url.store.Cache")
+
+    @pytest.fixture
+    def store(self, tmpdir):
+        return DiskStore(str(tmpdir))
+
+
+class TestStoreFromSettings:
+    def test_it_creates_a_memory_store(self):
+        store = store_from_settings(
+            {"url_details_cache_backend": "memory", "url_details_cache_size": "10"}
+        )
+
+        assert isinstance(store, MemoryStore)
+
+    def test_it_creates_a_disk_store(self, tmpdir):
+        store = store_from_settings(
+            {
+                "url_details_cache_backend": "disk",
+                "url_details_cache_dir": str(tmpdir),
+                "url_details_cache_size_limit": "1000000",
+            }
+        )
+
+        assert isinstance(store, DiskStore)
+
+    def test_it_raises_for_unknown_backends(self):
+        with pytest.raises(ValueError):
+            store_from_settings({"url_details_cache_backend": "wat"})
@@ -0,0 +1,123 @@
+from datetime import timedelta
+from unittest.mock import create_autospec
+
+import pytest
+from requests import Response, Timeout
+
+from via.get_url.timing import Deadline, PhaseTimings, Timeouts, timeouts_from_settings
+
+
+class TestDeadline:
+    def test_it_has_no_limit_with_no_seconds(self, clock):
+        deadline = Deadline(None)
+        clock.return_value += 1000
+
+        assert deadline.remaining() is None
+        assert deadline.request_timeout(Timeouts(1, 2, None)) == (1, 2)
+
+    def test_request_timeout_never_exceeds_the_time_remaining(self, clock):
+        deadline = Deadline(10)
+        clock.return_value += 9
+
+        assert deadline.request_timeout(Timeouts(5, 5, 10)) == (1, 1)
+
+    def test_request_timeout_raises_when_out_of_time(self, clock):
+        deadline = Deadline(10)
+        clock.return_value += 10
+
+        with pytest.raises(Timeout):
+            deadline.request_timeout(Timeouts(5, 5, 10))
+
+    def test_check_response_allows_responses_in_time(self, clock, response):
+        deadline = Deadline(10)
+        clock.return_value += 9
+
+        deadline.check_response(response)
+
+        response.close.assert_not_called()
+
+    def test_check_response_stops_when_out_of_time(self, clock, response):
+        deadline = Deadline(10)
+        clock.return_value += 10
+
+        with pytest.raises(Timeout):
+            deadline.check_response(response)
+
+        response.close.assert_called_once_with()
+
+    def test_check_response_allows_anything_without_a_limit(self, clock, response):
+        deadline = Deadline(None)
+        clock.return_value += 1000
+
+        deadline.check_response(response)
+
+    @pytest.fixture
+    def response(self):
+        response = create_autospec(Response, instance=True)
+        response.url = "http://example.com"
+        return response
+
+
+class TestPhaseTimings:
+    def test_it_records_phases(self):
+        timings = PhaseTimings()
+
+        phases = timings.record(self.response(redirects=(1, 2), seconds=3), 0.5)
+
+        assert phases == {"redirects": 3, "response": 3, "body": 0.5}
+
+    def test_stats(self):
+        timings = PhaseTimings()
+        timings.record(self.response(redirects=(1,), seconds=2), 1)
+        timings.record(self.response(redirects=(), seconds=4), 0)
+
+        assert timings.stats == {
+            "probes": 2,
+            "mean_seconds": {"dns": 0, "redirects": 0.5, "response": 3, "body": 0.5},
+            "max_seconds": {"dns": 0, "redirects": 1, "response": 4, "body": 1},
+        }
+
+    def test_add(self):
+        timings = PhaseTimings()
+        timings.record(self.response(redirects=(), seconds=2), 0)
+
+        timings.add("dns", 0.25)
+        timings.add("dns", 0.5)
+
+        assert timings.stats["probes"] == 1
+        assert timings.stats["mean_seconds"]["dns"] == 0.75
+        assert timings.stats["max_seconds"]["dns"] == 0.5
+
+    def test_stats_with_no_probes(self):
+        assert PhaseTimings().stats["mean_seconds"] == {
+            "dns": 0,
+            "redirects": 0,
+            "response": 0,
+            "body": 0,
+        }
+
+    def response(self, redirects, seconds):
+        history = []
+        for redirect_seconds in redirects:
+            redirect = Response()
+            redirect.elapsed = timedelta(seconds=redirect_seconds)
+            history.append(redirect)
+
+        response = Response()
+        response.history = history
+        response.elapsed = timedelta(seconds=seconds)
+        return response
+
+
+class TestTimeoutsFromSettings:
+    @pytest.mark.parametrize("deadline,total", (("15", 15), ("", None)))
+    def test_it(self, deadline, total):
+        timeouts = timeouts_from_settings(
+            {
+                "url_connect_timeout": "5",
+                "url_read_timeout": "10",
+                "url_probe_deadline": deadline,
+            }
+        )
+
+        assert timeouts == Timeouts(connect=5, read=10, total=total)
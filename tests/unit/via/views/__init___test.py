@@ -2,6 +2,7 @@ from unittest import mock
 
 from via import views
 from via.resources import URLResource
+from via.views.predicates import ExplicitAcceptPredicate
 
 
 class TestIncludeMe:
@@ -14,6 +15,11 @@ class TestIncludeMe:
             mock.call("get_status", "/_status"),
             mock.call("view_pdf", "/pdf", factory=URLResource),
             mock.call("route_by_content", "/route", factory=URLResource),
+            mock.call("route_batch", "/route/batch"),
             mock.call("debug_headers", "/debug/headers"),
+            mock.call("debug_upstream", "/debug/upstream"),
         ]
+        config.add_view_predicate.assert_called_once_with(
+            "explicit_accept", ExplicitAcceptPredicate
+        )
         config.scan.assert_called_once_with("via.views")
@@ -0,0 +1,63 @@
+from unittest.mock import create_autospec
+
+from via.get_url import URLDetailsCache
+from via.get_url.breaker import CircuitBreaker
+from via.get_url.dns import DNSCache
+from via.get_url.limiter import ProbeLimiter
+from via.get_url.negative import NegativeCache
+from via.get_url.redirects import RedirectIndex
+from via.get_url.refresh import BackgroundRefresher
+from via.get_url.session import make_session
+from via.get_url.store import MemoryStore
+from via.get_url.timing import PhaseTimings
+from via.views.debug import debug_upstream
+
+
+class TestDebugUpstream:
+    def test_it_shows_cache_and_pool_stats(self, make_request, pyramid_config):
+        cache = create_autospec(URLDetailsCache, instance=True)
+        pyramid_config.registry.url_details_cache = cache
+        pyramid_config.registry.http_session = make_session()
+        pyramid_config.registry.dns_cache = DNSCache()
+        pyramid_config.registry.probe_limiter = ProbeLimiter()
+        pyramid_config.registry.url_details_refresher = BackgroundRefresher()
+        pyramid_config.registry.circuit_breaker = CircuitBreaker()
+        pyramid_config.registry.negative_cache = NegativeCache({})
+        pyramid_config.registry.probe_timings = PhaseTimings()
+        pyramid_config.registry.redirect_index = RedirectIndex(MemoryStore())
+
+        result = debug_upstream(None, make_request())
+
+        assert result == {
+            "url_details_cache": cache.stats,
+            "url_details_refresher": {
+                "pending": 0,
+                "queued": 0,
+                "dropped": 0,
+                "failed": 0,
+            },
+            "http_pools": {},
+            "dns_cache": {"hits": 0, "misses": 0, "evictions": 0, "size": 0},
+            "probe_limiter": {"in_flight": 0, "rejected": 0},
+            "circuit_breaker": {"rejected": 0, "hosts": {}},
+            "negative_cache": {"hits": 0, "evictions": 0, "size": 0},
+            "probe_timings": PhaseTimings().stats,
+            "redirect_index": {"hits": 0, "misses": 0},
+        }
+
+    def test_it_shows_no_dns_cache_when_disabled(self, make_request, pyramid_config):
+        pyramid_config.registry.url_details_cache = create_autospec(
+            URLDetailsCache, instance=True
+        )
+        pyramid_config.registry.http_session = make_session()
+        pyramid_config.registry.dns_cache = None
+        pyramid_config.registry.probe_limiter = ProbeLimiter()
+        pyramid_config.registry.url_details_refresher = BackgroundRefresher()
+        pyramid_config.registry.circuit_breaker = CircuitBreaker()
+        pyramid_config.registry.negative_cache = NegativeCache({})
+        pyramid_config.registry.probe_timings = PhaseTimings()
+        pyramid_config.registry.redirect_index = RedirectIndex(MemoryStore())
+
+        result = debug_upstream(None, make_request())
+
+        assert result["dns_cache"] is None
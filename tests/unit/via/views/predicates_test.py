@@ -0,0 +1,37 @@
+from unittest.mock import sentinel
+
+import pytest
+from pyramid.testing import DummyRequest
+from webob.acceptparse import create_accept_header
+
+from via.views.predicates import ExplicitAcceptPredicate
+
+
+class TestExplicitAcceptPredicate:
+    @pytest.mark.parametrize(
+        "accept,matches",
+        (
+            ("application/x-ndjson", True),
+            ("APPLICATION/X-NDJSON", True),
+            ("application/json, application/x-ndjson", True),
+            ("application/json;q=0.5, application/x-ndjson", True),
+            ("application/json, application/x-ndjson;q=0.5", False),
+            ("application/x-ndjson;q=0", False),
+            ("application/json", False),
+            ("*/*", False),
+            ("application/*", False),
+            (None, False),
+            ("not a valid header;;;", False),
+        ),
+    )
+    def test_it(self, accept, matches):
+        predicate = ExplicitAcceptPredicate("application/x-ndjson", sentinel.config)
+        request = DummyRequest(accept=create_accept_header(accept))
+
+        assert predicate(sentinel.context, request) == matches
+
+    def test_text(self):
+        predicate = ExplicitAcceptPredicate("Application/X-NDJSON", sentinel.config)
+
+        assert predicate.text() == "explicit_accept = application/x-ndjson"
+        assert predicate.phash() == predicate.text()
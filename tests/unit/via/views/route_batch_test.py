@@ -0,0 +1,314 @@
+import json
+from threading import Event
+from unittest.mock import create_autospec
+
+import pytest
+from h_matchers import Any
+from pyramid.httpexceptions import HTTPBadRequest
+from pyramid.request import Request
+
+from via.exceptions import BadURL, UpstreamServiceError
+from via.get_url import URLDetailsCache
+from via.views.route_batch import route_batch, route_batch_stream
+
+
+class TestRouteBatch:
+    def test_it_routes_each_url(self, call_route_batch, get_url_details):
+        get_url_details.side_effect = lambda url, _headers: {
+            "http://example.com/a.pdf": ("application/pdf", 200),
+            "http://example.com/page?a=b": ("text/html", 503),
+        }[url]
+
+        result = call_route_batch(
+            ["http://example.com/a.pdf", "http://example.com/page?a=b"],
+            params={"other": "value"},
+        )
+
+        assert result == {
+            "results": [
+                {
+                    "url": "http://example.com/a.pdf",
+                    "mime_type": "application/pdf",
+                    "status_code": 200,
+                    "target": Any.url.with_path("/pdf").with_query(
+                        {"other": "value", "url": "http://example.com/a.pdf"}
+                    ),
+                    "headers": {"Cache-Control": Any.string.containing("max-age=300")},
+                },
+                {
+                    "url": "http://example.com/page?a=b",
+                    "mime_type": "text/html",
+                    "status_code": 503,
+                    "target": Any.url.with_host("via.hypothes.is")
+                    .with_path("/http://example.com/page")
+                    .with_query({"a": "b", "other": "value"}),
+                    "headers": {"Cache-Control": "no-cache"},
+                },
+            ]
+        }
+
+    def test_it_passes_the_request_headers(self, call_route_batch, get_url_details):
+        call_route_batch(["http://example.com"], headers={"User-Agent": "Agent"})
+
+        get_url_details.assert_called_once_with(
+            "http://example.com", Any.dict.containing({"User-Agent": "Agent"})
+        )
+
+    @pytest.mark.parametrize(
+        "error,status_code",
+        (
+            (BadURL("Bad URL"), 400),
+            (UpstreamServiceError("Bad upstream"), 409),
+            (ValueError("Bug"), 417),
+        ),
+    )
+    def test_it_reports_errors_for_each_url(
+        self, call_route_batch, get_url_details, error, status_code
+    ):
+        get_url_details.side_effect = [error, ("text/html", 200)]
+
+        result = call_route_batch(["http://bad.example.com", "http://example.com"])
+
+        assert result["results"] == [
+            {
+                "url": "http://bad.example.com",
+                "error": {
+                    "class": error.__class__.__name__,
+                    "details": str(error),
+                    "status_code": status_code,
+                },
+            },
+            Any.dict.containing({"url": "http://example.com", "status_code": 200}),
+        ]
+
+    def test_it_reports_blank_urls_as_bad(self, call_route_batch, get_url_details):
+        result = call_route_batch([""])
+
+        assert result["results"][0]["error"]["class"] == "BadURL"
+        get_url_details.assert_not_called()
+
+    def test_it_returns_nothing_for_no_urls(self, call_route_batch):
+        assert call_route_batch([]) == {"results": []}
+
+    @pytest.mark.parametrize(
+        "body",
+        (
+            "not json",
+            json.dumps(["http://example.com"]),
+            json.dumps({"url": "http://example.com"}),
+            json.dumps({"urls": "http://example.com"}),
+            json.dumps({"urls": [1]}),
+        ),
+    )
+    def test_it_rejects_bad_bodies(self, make_post, body):
+        with pytest.raises(HTTPBadRequest):
+            route_batch(None, make_post(body))
+
+    def test_it_gives_up_on_urls_after_the_deadline(
+        self, call_route_batch, get_url_details, pyramid_config, slow_url
+    ):
+        pyramid_config.registry.settings["route_batch_deadline"] = "0.1"
+
+        results = call_route_batch(
+            [slow_url, "http://example.com", slow_url, slow_url]
+        )["results"]
+
+        assert results == [
+            timed_out(slow_url),
+            Any.dict.containing({"url": "http://example.com"}),
+            timed_out(slow_url),
+            timed_out(slow_url),
+        ]
+        # The last URL was never started
+        assert get_url_details.call_count == 3
+
+    def test_it_rejects_too_many_urls(self, call_route_batch, pyramid_config):
+        pyramid_config.registry.settings["route_batch_max_urls"] = "2"
+
+        with pytest.raises(HTTPBadRequest):
+            call_route_batch(["http://example.com"] * 3)
+
+    @pytest.fixture
+    def call_route_batch(self, make_post):
+        def call_route_batch(urls, params=None, headers=None):
+            request = make_post(json.dumps({"urls": urls}), params, headers)
+
+            return route_batch(None, request)
+
+        return call_route_batch
+
+    @pytest.mark.parametrize(
+        "headers",
+        (
+            {},
+            {"Accept": "*/*"},
+            {"Accept": "application/json"},
+            {"Accept": "application/json, application/x-ndjson;q=0.5"},
+        ),
+    )
+    def test_it_is_the_default_for_the_route(self, test_app, headers):
+        response = test_app.post_json("/route/batch", {"urls": [""]}, headers=headers)
+
+        assert response.content_type == "application/json"
+        assert response.json["results"][0]["error"]["class"] == "BadURL"
+
+
+class TestRouteBatchStream:
+    def test_it_streams_a_line_per_url(self, make_post, get_url_details):
+        get_url_details.side_effect = [BadURL("Bad URL"), ("application/pdf", 200)]
+        request = make_post(
+            json.dumps({"urls": ["http://bad.example.com", "http://example.com"]})
+        )
+
+        response = route_batch_stream(None, request)
+
+        assert response.content_type == "application/x-ndjson"
+        assert response.headers["X-Accel-Buffering"] == "no"
+        lines = [json.loads(line) for line in response.app_iter]
+        assert sorted(lines, key=lambda line: line["index"]) == [
+            Any.dict.containing({"index": 0, "url": "http://bad.example.com"}),
+            Any.dict.containing(
+                {
+                    "index": 1,
+                    "url": "http://example.com",
+                    "mime_type": "application/pdf",
+                }
+            ),
+        ]
+
+    def test_it_streams_in_the_order_lookups_finish(self, make_post, get_url_details):
+        release_slow = Event()
+
+        def get_url_details_(url, _headers):
+            if url == "http://slow.example.com":
+                release_slow.wait(timeout=5)
+            return ("text/html", 200)
+
+        get_url_details.side_effect = get_url_details_
+        request = make_post(
+            json.dumps({"urls": ["http://slow.example.com", "http://example.com"]})
+        )
+
+        app_iter = route_batch_stream(None, request).app_iter
+        first = next(app_iter)
+        release_slow.set()
+        rest = list(app_iter)
+
+        assert [json.loads(line)["index"] for line in [first] + rest] == [1, 0]
+
+    def test_it_only_looks_up_max_workers_urls_at_a_time(
+        self, make_post, get_url_details, pyramid_config
+    ):
+        pyramid_config.registry.settings["route_batch_max_workers"] = "1"
+        request = make_post(json.dumps({"urls": ["http://example.com"] * 3}))
+
+        app_iter = route_batch_stream(None, request).app_iter
+        next(app_iter)
+
+        assert get_url_details.call_count == 1
+        assert len(list(app_iter)) == 2
+
+    def test_it_gives_up_on_urls_after_the_deadline(
+        self, make_post, get_url_details, pyramid_config, slow_url
+    ):
+        pyramid_config.registry.settings["route_batch_deadline"] = "0.1"
+        request = make_post(
+            json.dumps({"urls": [slow_url, "http://example.com", slow_url, slow_url]})
+        )
+
+        lines = [
+            json.loads(line) for line in route_batch_stream(None, request).app_iter
+        ]
+
+        assert sorted(lines, key=lambda line: line["index"]) == [
+            dict(timed_out(slow_url), index=0),
+            Any.dict.containing({"index": 1, "url": "http://example.com"}),
+            dict(timed_out(slow_url), index=2),
+            dict(timed_out(slow_url), index=3),
+        ]
+        # The last URL was never started
+        assert get_url_details.call_count == 3
+
+    def test_it_streams_nothing_for_no_urls(self, make_post):
+        request = make_post(json.dumps({"urls": []}))
+
+        assert not list(route_batch_stream(None, request).app_iter)
+
+    def test_it_rejects_bad_bodies_before_streaming(self, make_post):
+        with pytest.raises(HTTPBadRequest):
+            route_batch_stream(None, make_post("not json"))
+
+    @pytest.mark.parametrize(
+        "accept",
+        (
+            "application/x-ndjson",
+            "application/json, application/x-ndjson",
+            "application/json;q=0.5, application/x-ndjson",
+            "text/html, application/json, application/x-ndjson, */*;q=0.1",
+        ),
+    )
+    def test_it_is_used_when_ndjson_is_accepted(self, test_app, accept):
+        response = test_app.post_json(
+            "/route/batch", {"urls": [""]}, headers={"Accept": accept}
+        )
+
+        assert response.content_type == "application/x-ndjson"
+        assert json.loads(response.body) == Any.dict.containing({"index": 0, "url": ""})
+
+
+def timed_out(url):
+    return {
+        "url": url,
+        "error": {
+            "class": "UpstreamTimeout",
+            "details": "Gave up after 0.1 seconds",
+            "status_code": 409,
+        },
+    }
+
+
+@pytest.fixture
+def slow_url(get_url_details):
+    """Get a URL which takes longer to look up than our deadlines."""
+    release = Event()
+
+    def get_url_details_(url, _headers):
+        if url == "http://slow.example.com":
+            release.wait(timeout=5)
+        return ("text/html", 200)
+
+    get_url_details.side_effect = get_url_details_
+    yield "http://slow.example.com"
+
+    # Don't leave the lookups running after the test
+    release.set()
+
+
+@pytest.fixture
+def pyramid_settings(pyramid_settings):
+    pyramid_settings["route_batch_max_urls"] = "100"
+    pyramid_settings["route_batch_max_workers"] = "2"
+    pyramid_settings["route_batch_deadline"] = "5"
+    return pyramid_settings
+
+
+@pytest.fixture(autouse=True)
+def get_url_details(pyramid_config):
+    cache = create_autospec(URLDetailsCache, instance=True, spec_set=True)
+    cache.get_url_details.return_value = ("text/html", 200)
+    pyramid_config.registry.url_details_cache = cache
+
+    return cache.get_url_details
+
+
+@pytest.fixture
+def make_post(pyramid_config):
+    def make_post(body, params=None, headers=None):
+        request = Request.blank(
+            "/route/batch", POST=body, content_type="application/json", headers=headers,
+        )
+        request.GET.update(params or {})
+        request.registry = pyramid_config.registry
+        return request
+
+    return make_post
@@ -1,10 +1,11 @@
-from unittest.mock import sentinel
+from unittest.mock import create_autospec, sentinel
 
 import pytest
 from h_matchers import Any
 from webob.headers import EnvironHeaders
 
 from tests.unit.conftest import assert_cache_control
+from via.get_url import URLDetailsCache
 from via.resources import URLResource
 from via.views.route_by_content import route_by_content
 
@@ -59,6 +60,38 @@ class TestRouteByContent:
             {"a": "b", "other": "value"}
         )
 
+    @pytest.mark.parametrize(
+        "params,location",
+        (
+            (
+                [("url", "http://example.com/path#frag")],
+                "http://via.hypothes.is/http://example.com/path#frag",
+            ),
+            (
+                [("url", "http://example.com/path;params?a=1&b=2&a=3")],
+                "http://via.hypothes.is/http://example.com/path;params?b=2&a=3",
+            ),
+            (
+                [("a", "1"), ("url", "http://example.com/?a=2"), ("c", "3")],
+                "http://via.hypothes.is/http://example.com/?c=3&a=2",
+            ),
+            (
+                [("url", "example:path;"), ("url", "other")],
+                "http://via.hypothes.is/example:path?url=other",
+            ),
+        ),
+    )
+    @pytest.mark.usefixtures("html_response")
+    def test_legacy_via_urls_match_the_original_format(
+        self, params, location, make_request
+    ):
+        request = make_request()
+        request.GET.extend(params)
+
+        result = route_by_content(URLResource(request), request)
+
+        assert result.location == location
+
     @pytest.mark.parametrize(
         "content_type,max_age", [("application/pdf", 300), ("text/html", 60)],
     )
@@ -94,11 +127,12 @@ class TestRouteByContent:
         assert result.headers == Any.iterable.containing({"Cache-Control": cache})
 
     @pytest.fixture(autouse=True)
-    def get_url_details(self, patch):
-        get_url_details = patch("via.views.route_by_content.get_url_details")
-        get_url_details.return_value = (sentinel.content_type, 200)
+    def get_url_details(self, pyramid_config):
+        cache = create_autospec(URLDetailsCache, instance=True, spec_set=True)
+        cache.get_url_details.return_value = (sentinel.content_type, 200)
+        pyramid_config.registry.url_details_cache = cache
 
-        return get_url_details
+        return cache.get_url_details
 
     @pytest.fixture
     def pdf_response(self, get_url_details):
@@ -1,28 +1,26 @@
 import json
-from unittest.mock import sentinel
 
 import pytest
 from h_matchers import Any
-from markupsafe import Markup
+from pyramid.renderers import render
 
 from tests.unit.conftest import assert_cache_control
+from via import configuration
 from via.resources import URLResource
-from via.views.view_pdf import view_pdf
+from via.views.view_pdf import PDFViewerShell, _string_literal, view_pdf
 
 
 class TestViewPDF:
     def test_it_passes_through_static_config(self, call_view_pdf, pyramid_settings):
         response = call_view_pdf()
 
-        assert response == Any.dict.containing(
-            {
-                "client_embed_url": json.dumps(pyramid_settings["client_embed_url"]),
-                "static_url": Any.function(),
-            }
-        )
-
-        # Check we disable Jinja 2 escaping
-        assert isinstance(response["client_embed_url"], Markup)
+        assert response.content_type == "text/html"
+        assert response.charset == "UTF-8"
+        assert (
+            f"window.CLIENT_EMBED_URL = "
+            f"{json.dumps(pyramid_settings['client_embed_url'])};"
+        ) in response.text
+        assert 'href="http://example.com/static/salt/favicon.ico"' in response.text
 
     @pytest.mark.parametrize(
         "pdf_url",
@@ -37,20 +35,18 @@ class TestViewPDF:
     ):
         response = call_view_pdf(pdf_url)
 
-        assert response["pdf_url"] == json.dumps(
+        pdf_url = json.dumps(
             f"{pyramid_settings['nginx_server']}/proxy/static/{pdf_url}"
         )
-
-        # Check we disable Jinja 2 escaping
-        assert isinstance(response["pdf_url"], Markup)
+        assert f"window.PDF_URL = {pdf_url};" in response.text
 
     def test_we_escape_quote_literals_in_urls_to_prevent_XSS(
         self, call_view_pdf, pyramid_settings
     ):
         response = call_view_pdf('a"b')
-        assert response["pdf_url"] == json.dumps(
-            f"{pyramid_settings['nginx_server']}/proxy/static/a\"b"
-        )
+
+        pdf_url = json.dumps(f"{pyramid_settings['nginx_server']}/proxy/static/a\"b")
+        assert f"window.PDF_URL = {pdf_url};" in response.text
 
     def test_caching_is_disabled(self, test_app):
         response = test_app.get("/pdf?url=http://example.com/foo.pdf")
@@ -60,28 +56,137 @@ class TestViewPDF:
         )
 
     def test_it_extracts_config(self, call_view_pdf, Configuration):
+        Configuration.extract_from_params.return_value = ({}, {"b": "<'&'>", "a": 1})
+
         response = call_view_pdf()
 
         Configuration.extract_from_params.assert_called_once_with(
             Any.mapping.containing({"url": Any.string()})
         )
+        assert (
+            'return {"a": 1, "b": "\\u003c\\u0027\\u0026\\u0027\\u003e"};'
+            in response.text
+        )
+
+    @pytest.mark.parametrize(
+        "url,params",
+        (
+            ("http://example.com/name.pdf", {}),
+            ("http://example.com/a.pdf?a=1&b=2#frag", {"via.open_sidebar": "1"}),
+            (
+                "http://example.com/</script>'\"&.pdf",
+                {"via.request_config_from_frame": "http://lms.example.com/<'&'>"},
+            ),
+        ),
+    )
+    def test_it_matches_rendering_the_template(
+        self, make_request, pyramid_settings, url, params
+    ):
+        request = make_request(params=dict(params, url=url))
+
+        response = view_pdf(URLResource(request), request)
+
+        # This is how the page was rendered before we pre-rendered the shell
+        _, h_config = configuration.Configuration.extract_from_params(request.params)
+        expected = render(
+            PDFViewerShell.TEMPLATE,
+            {
+                "pdf_url": _string_literal(
+                    f"{pyramid_settings['nginx_server']}/proxy/static/{url}"
+                ),
+                "client_embed_url": _string_literal(
+                    pyramid_settings["client_embed_url"]
+                ),
+                "static_url": request.static_url,
+                "hypothesis_config": h_config,
+            },
+            request=request,
+        )
+        assert response.body == expected.encode("utf-8")
+
+    def test_it_only_renders_the_template_once(self, call_view_pdf, patch):
+        render_template = patch("via.views.view_pdf.render", side_effect=render)
+
+        call_view_pdf()
+        call_view_pdf("http://example.com/other.pdf")
+
+        render_template.assert_called_once()
+
+    def test_it_renders_the_template_for_each_host(self, call_view_pdf, patch):
+        render_template = patch("via.views.view_pdf.render", side_effect=render)
+
+        call_view_pdf(host="example.com")
+        response = call_view_pdf(host="other.example.com")
 
-        assert response["hypothesis_config"] == sentinel.h_config
+        assert render_template.call_count == 2
+        assert "http://other.example.com/static/salt/favicon.ico" in response.text
+
+    def test_it_only_keeps_so_many_shells(self, call_view_pdf):
+        for number in range(PDFViewerShell.MAX_SHELLS + 1):
+            call_view_pdf(host=f"{number}.example.com")
+
+        # pylint: disable=protected-access
+        assert len(PDFViewerShell._shells) == PDFViewerShell.MAX_SHELLS
 
     @pytest.fixture
     def Configuration(self, patch):
-        Configuration = patch("via.views.view_pdf.Configuration")
-        Configuration.extract_from_params.return_value = (
-            sentinel.via_config,
-            sentinel.h_config,
-        )
-        return Configuration
+        return patch("via.views.view_pdf.Configuration")
 
     @pytest.fixture
     def call_view_pdf(self, make_request):
-        def call_view_pdf(url="http://example.com/name.pdf", params=None):
+        def call_view_pdf(
+            url="http://example.com/name.pdf", params=None, host="example.com"
+        ):
             request = make_request(params=dict(params or {}, url=url))
+            request.host = host
             context = URLResource(request)
+
             return view_pdf(context, request)
 
         return call_view_pdf
+
+
+class TestPDFViewerShell:
+    def test_it_fills_in_the_values(self):
+        shell = PDFViewerShell(
+            'a __VIA_PDF_URL__ b "__VIA_HYPOTHESIS_CONFIG__" c', json.dumps
+        )
+
+        assert shell.fill('"url"', {"key": "value"}) == (
+            b'a "url" b {"key": "value"} c'
+        )
+
+    def test_it_fills_in_the_values_in_any_order(self):
+        shell = PDFViewerShell('"__VIA_HYPOTHESIS_CONFIG__"__VIA_PDF_URL__', json.dumps)
+
+        assert shell.fill('"url"', 1) == b'1"url"'
+
+    @pytest.mark.parametrize(
+        "html",
+        (
+            "__VIA_PDF_URL__",
+            '"__VIA_HYPOTHESIS_CONFIG__"',
+            '__VIA_PDF_URL__ __VIA_PDF_URL__ "__VIA_HYPOTHESIS_CONFIG__"',
+        ),
+    )
+    def test_it_raises_if_the_values_are_not_each_there_once(self, html):
+        with pytest.raises(ValueError):
+            PDFViewerShell(html, json.dumps)
+
+
+@pytest.fixture(autouse=True)
+def pyramid_config(pyramid_config):
+    pyramid_config.include("pyramid_jinja2")
+    pyramid_config.add_static_view(name="static", path="via:static")
+    pyramid_config.add_cache_buster(
+        "via:static", cachebust=lambda _request, subpath, kw: (f"salt/{subpath}", kw)
+    )
+    pyramid_config.commit()
+
+    return pyramid_config
+
+
+@pytest.fixture(autouse=True)
+def clear_shells():
+    # pylint: disable=protected-access
+    PDFViewerShell._shells.clear()
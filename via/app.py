@@ -5,17 +5,93 @@ import pyramid.config
 from pkg_resources import resource_filename
 from whitenoise import WhiteNoise
 
+from via import get_url
 from via.cache_buster import PathCacheBuster
 from via.sentry_filters import SENTRY_FILTERS
 
 REQUIRED_PARAMS = ["client_embed_url", "nginx_server", "legacy_via_url"]
 
+# Params which can be provided, but which have sensible defaults
+OPTIONAL_PARAMS = {
+    # Either "memory" for a per-process cache or "disk" to share between
+    # the workers on one host
+    "url_details_cache_backend": "memory",
+    "url_details_cache_size": 1024,
+    "url_details_cache_dir": "/tmp/via-url-details",
+    "url_details_cache_size_limit": 2 ** 26,
+    # Seconds to keep stale entries with an ETag or Last-Modified, so we can
+    # check whether they've changed instead of starting again
+    "url_details_cache_revalidate_for": 86400,
+    # Seconds to serve stale entries for while they are refreshed in the
+    # background, and the threads to refresh them with
+    "url_details_cache_stale_while_revalidate": 86400,
+    "url_details_refresh_workers": 4,
+    "url_details_refresh_max_pending": 100,
+    # Connection pooling for requests to upstream servers
+    "http_pool_connections": 10,
+    "http_pool_maxsize": 10,
+    "http_pool_block": False,
+    # Retries for requests which fail, but not for ones which time out
+    "http_max_retries": 1,
+    # Cache DNS lookups for upstream hosts in each process, for seconds, or
+    # for failed lookups. Off by default as it ignores the records' own TTLs
+    "url_dns_cache": False,
+    "url_dns_cache_ttl": 60,
+    "url_dns_cache_negative_ttl": 10,
+    "url_dns_cache_size": 1024,
+    # The most connections the async entry point will open at once, and the
+    # number of threads it runs the WSGI app in for everything but `/route`
+    "async_max_connections": 1000,
+    "async_wsgi_threads": 50,
+    # How to ask upstream servers about URLs: "get", "range" or "head". A
+    # full "get" usually has too much body left to keep its connection open
+    "url_probe_method": "range",
+    # Look for magic numbers when the content type is missing or generic
+    "url_sniff_content": True,
+    # Seconds to remember bad URLs, hosts which don't resolve, hosts which
+    # refuse connections, and URLs which fail upstream in other ways (e.g.
+    # SSL errors or redirect loops) for. Timeouts, dropped connections and
+    # 5xx responses are never cached
+    "url_negative_cache_bad_url_max_age": 300,
+    "url_negative_cache_host_not_found_max_age": 60,
+    "url_negative_cache_connection_refused_max_age": 10,
+    "url_negative_cache_upstream_error_max_age": 30,
+    "url_negative_cache_size": 1024,
+    # Seconds to wait to connect, between bytes, and for the whole probe
+    # including redirects (empty for no overall limit). The overall limit is
+    # checked between requests, so a server trickling out a response a byte
+    # at a time can still hold one request past it (see `Deadline`)
+    "url_connect_timeout": 5,
+    "url_read_timeout": 10,
+    "url_probe_deadline": 15,
+    # Seconds to skip straight to where permanent and temporary redirects go
+    "url_redirect_permanent_max_age": 86400,
+    "url_redirect_temporary_max_age": 60,
+    # Limits on probes in flight at once, per process and per upstream host,
+    # for threaded or gevent workers (see `conf/gunicorn/concurrent.conf.py`)
+    "probe_max_concurrent": 100,
+    "probe_max_per_host": 10,
+    "probe_wait_timeout": 5,
+    # Stop contacting hosts which keep failing for a while
+    "circuit_breaker_failure_rate": 0.5,
+    "circuit_breaker_min_requests": 5,
+    "circuit_breaker_window": 60,
+    "circuit_breaker_cool_down": 30,
+    # The most URLs accepted by `/route/batch`, how many of them to look up
+    # at once, and seconds to allow for the whole batch (empty for no limit).
+    # Keep this well under the gunicorn worker `timeout`
+    "route_batch_max_urls": 100,
+    "route_batch_max_workers": 10,
+    "route_batch_deadline": 10,
+}
+
 
 def load_settings(settings):
     """Load application settings from a dict or environment variables.
 
     Checks that the required parameters are either filled out in the provided
     dict, or that the required values can be loaded from the environment.
+    Optional parameters are loaded the same way, falling back to a default.
 
     :param settings: Settings dict
     :raise ValueError: If a required parameter is not filled
@@ -27,6 +103,9 @@ def load_settings(settings):
         if value is None:
             raise ValueError(f"Param {param} must be provided.")
 
+    for param, default in OPTIONAL_PARAMS.items():
+        settings[param] = settings.get(param, os.environ.get(param.upper(), default))
+
     # Configure sentry
     settings["h_pyramid_sentry.filters"] = SENTRY_FILTERS
 
@@ -38,6 +117,7 @@ def create_app(_=None, **settings):
     config = pyramid.config.Configurator(settings=load_settings(settings))
 
     config.include("pyramid_jinja2")
+    config.include("via.get_url")
     config.include("via.views")
     config.include("h_pyramid_sentry")
 
@@ -67,3 +147,12 @@ def create_app(_=None, **settings):
     )
 
     return app
+
+
+def close_app(app):
+    """Release what the app holds open, when the process is stopping.
+
+    :param app: The WSGI app from `create_app()`
+    """
+    # `create_app()` wraps the Pyramid app in WhiteNoise
+    get_url.close(app.application.registry)
@@ -0,0 +1,202 @@
+"""An ASGI entrypoint which routes by content without blocking.
+
+Routing by content spends almost all of its time waiting for upstream
+servers. Running under an async server (see `conf/gunicorn/async.conf.py`)
+this lets a single process hold thousands of probes in flight at once,
+instead of one per worker.
+
+Everything other than routing is passed through to the normal WSGI app,
+which runs on a pool of `async_wsgi_threads` threads.
+
+Lookups share the WSGI app's circuit breaker, negative cache and redirect
+index, and are held to the same overall deadline (`url_probe_deadline`,
+which is enforced mid-response here). Some features of the WSGI app's
+lookups aren't available:
+
+ * Requests are always `GET`, whatever `url_probe_method` says
+ * Probes are limited by `async_max_connections` in total, instead of the
+   `probe_max_*` limits per process and per host
+ * Cached details aren't served stale while they are refreshed, or
+   revalidated with conditional requests
+ * Lookups aren't coalesced across processes, only within one
+ * Host names aren't resolved with the DNS cache
+"""
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+
+from asgiref.sync import sync_to_async
+from asgiref.wsgi import WsgiToAsgi, WsgiToAsgiInstance
+from pyramid.interfaces import IRoutesMapper
+from pyramid.request import Request, apply_request_extensions
+from pyramid.settings import asbool
+
+from via import get_url
+from via.app import create_app
+from via.get_url.async_details import (
+    AsyncURLDetailsCache,
+    async_client_from_settings,
+    get_url_details_async,
+)
+from via.get_url.store import store_from_settings
+from via.get_url.timing import timeouts_from_settings
+from via.resources import URLResource
+from via.views.route_by_content import redirect_by_content
+
+# pylint: disable=too-few-public-methods
+
+
+class ThreadPoolWsgiToAsgi(WsgiToAsgi):
+    """Run a WSGI app for ASGI requests on a pool of threads.
+
+    asgiref's `WsgiToAsgi` runs the app "thread sensitively", in one thread
+    per process, so each request would wait for all the others to finish.
+
+    :param wsgi_application: The WSGI app to run
+    :param max_workers: The number of requests to handle at once
+    """
+
+    def __init__(self, wsgi_application, max_workers):
+        super().__init__(wsgi_application)
+        self._executor = ThreadPoolExecutor(
+            max_workers=max_workers, thread_name_prefix="wsgi"
+        )
+
+    async def __call__(self, scope, receive, send):
+        """Handle an ASGI connection."""
+        await _ThreadPoolWsgiToAsgiInstance(self.wsgi_application, self._executor)(
+            scope, receive, send
+        )
+
+    def close(self):
+        """Stop the threads once they have finished their requests."""
+        self._executor.shutdown(wait=False)
+
+
+class _ThreadPoolWsgiToAsgiInstance(WsgiToAsgiInstance):
+    # The undecorated method, which runs the app and sends its response
+    _run_wsgi_app = vars(WsgiToAsgiInstance)["run_wsgi_app"].func
+
+    def __init__(self, wsgi_application, executor):
+        super().__init__(wsgi_application)
+        self._executor = executor
+
+    async def run_wsgi_app(self, body):
+        await sync_to_async(
+            self._run_wsgi_app, thread_sensitive=False, executor=self._executor
+        )(body)
+
+
+class AsyncRouteByContent:
+    """An ASGI app which routes by content, and passes the rest to WSGI.
+
+    :param wsgi_app: The WSGI app to pass other requests to
+    :param registry: The Pyramid registry of the WSGI app
+    """
+
+    def __init__(self, wsgi_app, registry):
+        self._wsgi_app = ThreadPoolWsgiToAsgi(
+            wsgi_app, max_workers=int(registry.settings["async_wsgi_threads"])
+        )
+        self._registry = registry
+
+        self._route_path = (
+            registry.getUtility(IRoutesMapper).get_route("route_by_content").pattern
+        )
+
+        settings = registry.settings
+        self.client = async_client_from_settings(settings)
+
+        fetch = partial(
+            get_url_details_async,
+            self.client,
+            sniff=asbool(settings["url_sniff_content"]),
+            redirects=registry.redirect_index,
+            deadline=timeouts_from_settings(settings).total,
+        )
+        # In the same order as `via.get_url.includeme()` wraps them
+        fetch = registry.circuit_breaker.wrap_async(fetch)
+        fetch = registry.negative_cache.wrap_async(fetch)
+
+        self.url_details_cache = AsyncURLDetailsCache(
+            fetch, store=store_from_settings(settings)
+        )
+
+    async def __call__(self, scope, receive, send):
+        """Handle an ASGI connection."""
+        if scope["type"] == "lifespan":
+            await self._lifespan(receive, send)
+
+        elif scope["type"] == "http" and scope["path"] == self._route_path:
+            await self._route_by_content(scope, send)
+
+        else:
+            await self._wsgi_app(scope, receive, send)
+
+    async def _lifespan(self, receive, send):
+        while True:
+            message = await receive()
+
+            if message["type"] == "lifespan.startup":
+                await send({"type": "lifespan.startup.complete"})
+
+            elif message["type"] == "lifespan.shutdown":
+                await self.client.aclose()
+                self._wsgi_app.close()
+                get_url.close(self._registry)
+                await send({"type": "lifespan.shutdown.complete"})
+                return
+
+    async def _route_by_content(self, scope, send):
+        """Do the same as `via.views.route_by_content.route_by_content()`."""
+        request = self._make_request(scope)
+
+        try:
+            mime_type, status_code = await self.url_details_cache.get_url_details(
+                URLResource(request).url(), request.headers
+            )
+
+        except Exception:  # pylint: disable=broad-except
+            # Render errors exactly as the WSGI app would
+            response = request.invoke_exception_view(reraise=True)
+
+        else:
+            response = redirect_by_content(request, mime_type, status_code)
+
+        response = request.get_response(response)
+
+        await send(
+            {
+                "type": "http.response.start",
+                "status": response.status_int,
+                "headers": [
+                    (name.lower().encode("latin-1"), value.encode("latin-1"))
+                    for name, value in response.headerlist
+                ],
+            }
+        )
+        await send({"type": "http.response.body", "body": response.body})
+
+    def _make_request(self, scope):
+        query_string = scope["query_string"].decode("latin-1")
+        host, port = scope.get("server") or ("localhost", 80)
+
+        request = Request.blank(
+            scope["path"] + (f"?{query_string}" if query_string else ""),
+            base_url=f"{scope.get('scheme', 'http')}://{host}:{port}",
+            headers=[
+                (name.decode("latin-1"), value.decode("latin-1"))
+                for name, value in scope["headers"]
+            ],
+        )
+        request.registry = self._registry
+        apply_request_extensions(request)
+
+        return request
+
+
+def create_asgi_app(_=None, **settings):
+    """Configure and return the ASGI app."""
+    wsgi_app = create_app(_, **settings)
+
+    # `create_app()` wraps the Pyramid app in WhiteNoise
+    return AsyncRouteByContent(wsgi_app, wsgi_app.application.registry)
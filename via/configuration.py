@@ -1,5 +1,7 @@
 """Tools for reading in configuration."""
 
+from functools import lru_cache
+
 # pylint: disable=too-few-public-methods
 
 
@@ -52,41 +54,56 @@ class Configuration:
     def extract_from_params(cls, params):
         """Extract Via and H config from query parameters.
 
+        The same links are rendered over and over, so the results are cached
+        by the "via." parameters, and are read-only as they are shared.
+
         :param params: A mapping of query parameters
         :return: A tuple of Via, and H config
         """
+        # Most parameters aren't for us, so skip them without splitting them
+        via_items = tuple(
+            (key, value) for key, value in params.items() if key.startswith("via.")
+        )
+
+        return cls._extract(via_items)
+
+    @classmethod
+    @lru_cache(maxsize=1024)
+    def _extract(cls, via_items):
+        """Extract Via and H config from "via." parameters.
 
-        via_params = cls._unflatten(params)
+        :param via_items: A tuple of (key, value) pairs starting with "via."
+        :return: A tuple of read-only Via, and H config
+        """
+        via_params = cls._unflatten(via_items)
         client_params = via_params.pop("client", {})
 
-        cls._filter_client_params(client_params)
+        client_params = cls._filter_client_params(client_params)
         cls._move_legacy_params(via_params, client_params)
 
         # Set some defaults
         client_params["appType"] = "via"
         client_params.setdefault("showHighlights", True)
 
-        return via_params, client_params
+        return _freeze(via_params), _freeze(client_params)
 
     @staticmethod
-    def _unflatten(params):
+    def _unflatten(via_items):
         """Convert dot delimited flat data into nested dicts.
 
-        This method will skip any keys which do not start with "via." and will
-        return a data structure rooted after that point. So "via.a.b" will
-        start at "a".
+        The data is rooted after the "via." prefix, so "via.a.b" will start
+        at "a".
         """
 
         data = {}
 
-        for key, value in params.items():
-            parts = key.split(".")
-            if parts[0] != "via":
-                continue
+        for key, value in via_items:
+            # Skip the first ('via') part
+            parts = _key_path(key)[1:]
 
             target = data
-            # Skip the first ('via') and last parts
-            for part in parts[1:-1]:
+            # Skip the last part
+            for part in parts[:-1]:
                 target = target.setdefault(part, {})
 
             # Finally set the last key to the value
@@ -96,10 +113,13 @@ class Configuration:
 
     @classmethod
     def _filter_client_params(cls, client_params):
-        """Remove keys which are not in the whitelist."""
+        """Get only the keys which are in the whitelist."""
 
-        for key in set(client_params.keys()) - cls.CLIENT_CONFIG_WHITELIST:
-            client_params.pop(key)
+        return {
+            key: value
+            for key, value in client_params.items()
+            if key in cls.CLIENT_CONFIG_WHITELIST
+        }
 
     @staticmethod
     def _move_legacy_params(via_params, client_params):
@@ -107,3 +127,26 @@ class Configuration:
 
         # This is like to be around for a while
         client_params.setdefault("openSidebar", via_params.pop("open_sidebar", False))
+
+
+@lru_cache(maxsize=1024)
+def _key_path(key):
+    """Split a dot delimited key into its parts."""
+    return tuple(key.split("."))
+
+
+class FrozenDict(dict):
+    """A dict which can't be changed, but can still be dumped as JSON."""
+
+    def _read_only(self, *_args, **_kwargs):
+        raise TypeError(f"'{type(self).__name__}' object is read-only")
+
+    __setitem__ = __delitem__ = _read_only
+    clear = pop = popitem = setdefault = update = _read_only
+
+
+def _freeze(data):
+    if isinstance(data, dict):
+        return FrozenDict((key, _freeze(value)) for key, value in data.items())
+
+    return data
@@ -1,5 +1,8 @@
 """Application specific exceptions."""
 
+import socket
+
+import httpx
 from pyramid.httpexceptions import HTTPBadRequest, HTTPConflict, HTTPExpectationFailed
 from requests import exceptions
 
@@ -19,6 +22,16 @@ REQUESTS_UPSTREAM_SERVICE = (
     exceptions.SSLError,
 )
 
+# The equivalents of the above for our async HTTP client
+HTTPX_BAD_URL = (
+    httpx.InvalidURL,
+    httpx.UnsupportedProtocol,
+)
+HTTPX_UPSTREAM_SERVICE = (
+    httpx.TransportError,
+    httpx.TooManyRedirects,
+)
+
 
 class BadURL(HTTPBadRequest):
     """An invalid URL was discovered."""
@@ -28,5 +41,77 @@ class UpstreamServiceError(HTTPConflict):
     """Something went wrong when calling an upstream service."""
 
 
+class UpstreamHostFailing(UpstreamServiceError):
+    """We didn't call an upstream service, as it keeps failing."""
+
+
+class UpstreamHostNotFound(UpstreamServiceError):
+    """The host name of an upstream service couldn't be resolved."""
+
+
+class UpstreamConnectionRefused(UpstreamServiceError):
+    """An upstream service refused to let us connect."""
+
+
+class UpstreamTransientError(UpstreamServiceError):
+    """A passing failure, like a dropped connection, worth trying again."""
+
+
+class UpstreamTimeout(UpstreamTransientError):
+    """We gave up waiting for an upstream service."""
+
+
 class UnhandledException(HTTPExpectationFailed):
     """Something we did not plan for went wrong."""
+
+
+# The errors (found anywhere in the chain of errors that caused an HTTP
+# client's error) which tell us which `UpstreamServiceError` it was
+_UPSTREAM_CAUSES = (
+    (socket.gaierror, UpstreamHostNotFound),
+    (ConnectionRefusedError, UpstreamConnectionRefused),
+    ((exceptions.Timeout, httpx.TimeoutException, socket.timeout), UpstreamTimeout),
+    ((ConnectionResetError, ConnectionAbortedError), UpstreamTransientError),
+)
+
+
+def upstream_error_class(error):
+    """Get the `UpstreamServiceError` class to raise for an HTTP client error.
+
+    :param error: An error from `REQUESTS_UPSTREAM_SERVICE` or
+        `HTTPX_UPSTREAM_SERVICE`
+    :return: The most specific `UpstreamServiceError` class for the error
+    """
+    causes = list(_causes(error))
+
+    for cause_classes, error_class in _UPSTREAM_CAUSES:
+        if any(isinstance(cause, cause_classes) for cause in causes):
+            return error_class
+
+    return UpstreamServiceError
+
+
+def _causes(error):
+    """Get an error, and every error which led to it.
+
+    `requests` and `urllib3` keep the error they are wrapping as an argument
+    or a `reason`, rather than chaining it, so we look in those too.
+    """
+    pending, seen = [error], set()
+
+    while pending:
+        error = pending.pop()
+        if id(error) not in seen:
+            seen.add(id(error))
+            yield error
+
+            causes = (
+                error.__cause__,
+                error.__context__,
+                getattr(error, "reason", None),
+            )
+            pending.extend(
+                cause
+                for cause in causes + error.args
+                if isinstance(cause, BaseException)
+            )
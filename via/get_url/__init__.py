@@ -1,4 +1,79 @@
 """A collection of tools for getting URL and inspecting the contents."""
+from functools import partial
 
+from pyramid.settings import asbool
+
+from via.get_url.breaker import breaker_from_settings
+from via.get_url.cache import URLDetailsCache
 from via.get_url.details import get_url_details
+from via.get_url.dns import dns_cache_from_settings
 from via.get_url.headers import clean_headers
+from via.get_url.limiter import limiter_from_settings
+from via.get_url.negative import negative_cache_from_settings
+from via.get_url.probe import ProbeStrategy
+from via.get_url.redirects import redirect_index_from_settings
+from via.get_url.refresh import BackgroundRefresher
+from via.get_url.session import session_from_settings
+from via.get_url.store import store_from_settings
+from via.get_url.timing import PhaseTimings, timeouts_from_settings
+
+
+def includeme(config):
+    """Pyramid config."""
+    settings = config.registry.settings
+
+    config.registry.probe_timings = PhaseTimings()
+    config.registry.dns_cache = dns_cache_from_settings(
+        settings, timings=config.registry.probe_timings
+    )
+    config.registry.http_session = session_from_settings(
+        settings, resolver=config.registry.dns_cache
+    )
+
+    config.registry.probe_limiter = limiter_from_settings(settings)
+    config.registry.negative_cache = negative_cache_from_settings(settings)
+    config.registry.circuit_breaker = breaker_from_settings(settings)
+    config.registry.redirect_index = redirect_index_from_settings(
+        settings, store_from_settings(settings)
+    )
+    config.registry.url_details_refresher = BackgroundRefresher(
+        max_workers=int(settings["url_details_refresh_workers"]),
+        max_pending=int(settings["url_details_refresh_max_pending"]),
+    )
+
+    fetch = partial(
+        get_url_details,
+        config.registry.http_session,
+        probe_strategy=ProbeStrategy(
+            settings["url_probe_method"],
+            timeouts=timeouts_from_settings(settings),
+            redirects=config.registry.redirect_index,
+        ),
+        sniff=asbool(settings["url_sniff_content"]),
+        timings=config.registry.probe_timings,
+    )
+    # The negative cache goes outside the circuit breaker, so cached errors
+    # don't count against the host again, and inside the limiter so it never
+    # caches us being too busy
+    fetch = config.registry.circuit_breaker.wrap(fetch)
+    fetch = config.registry.negative_cache.wrap(fetch)
+    fetch = config.registry.probe_limiter.wrap(fetch)
+
+    config.registry.url_details_cache = URLDetailsCache(
+        fetch,
+        store=store_from_settings(settings),
+        revalidate_for=int(settings["url_details_cache_revalidate_for"]),
+        stale_while_revalidate=int(
+            settings["url_details_cache_stale_while_revalidate"]
+        ),
+        refresher=config.registry.url_details_refresher,
+    )
+
+
+def close(registry):
+    """Release the connections and threads `includeme()` opened.
+
+    :param registry: The Pyramid registry `includeme()` configured
+    """
+    registry.url_details_refresher.shutdown(wait=False)
+    registry.http_session.close()
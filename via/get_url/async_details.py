@@ -0,0 +1,200 @@
+"""Retrieve details about a resource at a URL without blocking."""
+
+import asyncio
+from functools import wraps
+
+import httpx
+
+from via.exceptions import (
+    HTTPX_BAD_URL,
+    HTTPX_UPSTREAM_SERVICE,
+    BadURL,
+    UnhandledException,
+    UpstreamTimeout,
+    upstream_error_class,
+)
+from via.get_url.cache import URLDetailsCacheBase, normalize_url
+from via.get_url.details import GOOGLE_DRIVE_REGEX
+from via.get_url.headers import clean_headers
+from via.get_url.sniff import (
+    SNIFF_BYTES,
+    header_mime_type,
+    is_generic,
+    mime_type_from_bytes,
+)
+
+
+def _handle_errors(inner):
+    """Translate errors into our application errors.
+
+    This is the async equivalent of `via.get_url.details._handle_errors()`.
+    """
+
+    @wraps(inner)
+    async def deco(*args, **kwargs):
+        try:
+            return await inner(*args, **kwargs)
+
+        except HTTPX_BAD_URL as err:
+            raise BadURL(str(err)) from None
+
+        except HTTPX_UPSTREAM_SERVICE as err:
+            raise upstream_error_class(err)(str(err)) from None
+
+        except httpx.HTTPError as err:
+            raise UnhandledException(str(err)) from None
+
+    return deco
+
+
+@_handle_errors
+async def get_url_details_async(  # pylint: disable=too-many-arguments
+    client, url, headers, sniff=False, redirects=None, deadline=None
+):
+    """Get the content type and status code for a given URL.
+
+    This is the async equivalent of `via.get_url.details.get_url_details()`.
+
+    :param client: The `httpx.AsyncClient` to make the request with
+    :param url: URL to retrieve
+    :param headers: The original headers the request was made with
+    :param sniff: Look at the start of the content to work out the type
+        when the `Content-Type` is missing or too generic to tell
+    :param redirects: A `RedirectIndex` to skip known redirects with
+    :param deadline: Seconds to allow for the whole lookup including any
+        redirects, or None for no limit. Unlike the WSGI app, this is
+        enforced while waiting on a response too
+    :return: 2-tuple of (mime type, status code)
+
+    :raise BadURL: When the URL is malformed
+    :raise UpstreamServiceError: If we server gives us errors
+    :raise UpstreamTimeout: If we run out of time
+    :raise UnhandledException: For all other request based errors
+    """
+    if GOOGLE_DRIVE_REGEX.match(url):
+        return "application/pdf", 200
+
+    lookup = _follow_known_redirects(
+        client, url, clean_headers(headers), sniff, redirects
+    )
+    if deadline is None:
+        return await lookup
+
+    try:
+        return await asyncio.wait_for(lookup, deadline)
+    except asyncio.TimeoutError:
+        raise UpstreamTimeout(f"Gave up after {deadline} seconds") from None
+
+
+async def _follow_known_redirects(client, url, headers, sniff, redirects):
+    """Do the same as `via.get_url.probe.ProbeStrategy.open()` does."""
+
+    if redirects is None:
+        return await _inspect(client, url, headers, sniff)
+
+    resolved = redirects.resolve(url)
+    if resolved is not None:
+        details = await _inspect(client, resolved.url, headers, sniff)
+        if details[1] < 400:
+            return details
+
+        # The destination has moved on, or only works if you come from the
+        # original URL (e.g. signed links)
+        redirects.forget(url)
+
+    return await _inspect(client, url, headers, sniff, on_response=redirects.record)
+
+
+async def _inspect(client, url, headers, sniff, on_response=None):
+    async with client.stream("GET", url, headers=headers, allow_redirects=True) as rsp:
+        if on_response:
+            on_response(rsp)
+
+        mime_type = header_mime_type(rsp)
+
+        if sniff and is_generic(mime_type):
+            mime_type = await _sniff_mime_type(rsp) or mime_type
+
+        return mime_type, rsp.status_code
+
+
+async def _sniff_mime_type(response):
+    head = b""
+
+    try:
+        async for chunk in response.aiter_bytes():
+            head += chunk
+            if len(head) >= SNIFF_BYTES:
+                break
+
+    except httpx.HTTPError:
+        # We've got the headers already, so don't fail just because the body
+        # is broken or slow
+        return None
+
+    return mime_type_from_bytes(head)
+
+
+class AsyncURLDetailsCache(URLDetailsCacheBase):
+    """A cache in front of an async URL details lookup.
+
+    This is the async equivalent of `via.get_url.cache.URLDetailsCache`, and
+    can share the same stores. Concurrent misses for the same URL in this
+    process are coalesced so only one of them calls `fetch`.
+
+    :param fetch: Coroutine function accepting `(url, headers)` to call on a
+        cache miss returning a 2-tuple of (mime type, status code)
+    :param store: The store to keep entries in (see `via.get_url.store`)
+    """
+
+    def __init__(self, fetch, store):
+        super().__init__(fetch, store)
+
+        self._in_flight = {}
+        self.coalesced = 0
+
+    async def get_url_details(self, url, headers):
+        """Get the content type and status code for a given URL.
+
+        :param url: URL to retrieve
+        :param headers: The original headers the request was made with
+        :return: 2-tuple of (mime type, status code)
+        """
+        key = normalize_url(url)
+
+        entry = self._get_cached(key)
+        if entry is not None and entry.is_fresh():
+            return entry.details
+
+        future = self._in_flight.get(key)
+        if future is None:
+            future = asyncio.ensure_future(self._fetch_and_store(key, url, headers))
+            future.add_done_callback(lambda _: self._in_flight.pop(key, None))
+            self._in_flight[key] = future
+        else:
+            self.coalesced += 1
+
+        # Shield the lookup so one caller going away doesn't cancel it for
+        # everyone else who is waiting
+        return await asyncio.shield(future)
+
+    async def _fetch_and_store(self, key, url, headers):
+        return self._set_cached(key, await self._fetch(url, headers))
+
+
+def async_client_from_settings(settings):
+    """Create an async HTTP client configured from the app settings.
+
+    :param settings: The application settings dict
+    :return: An `httpx.AsyncClient` which must be closed with `aclose()`
+    """
+    return httpx.AsyncClient(
+        timeout=httpx.Timeout(
+            float(settings["url_read_timeout"]),
+            connect=float(settings["url_connect_timeout"]),
+        ),
+        limits=httpx.Limits(
+            max_connections=int(settings["async_max_connections"]),
+            max_keepalive_connections=int(settings["http_pool_maxsize"]),
+        ),
+    )
@@ -0,0 +1,245 @@
+"""A circuit breaker to stop us waiting on upstream hosts which are down."""
+
+import threading
+import time
+from collections import OrderedDict, deque
+from urllib.parse import urlsplit
+
+from via.exceptions import UpstreamHostFailing, UpstreamServiceError
+
+# pylint: disable=too-few-public-methods
+
+
+class _HostCircuit:
+    """The state of the circuit for a single host."""
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half-open"
+
+    def __init__(self):
+        self.state = self.CLOSED
+        self.opened_at = None
+        self.trial_in_progress = False
+
+        # (time, failed) for each recent request
+        self.outcomes = deque()
+
+    def failure_rate(self):
+        """Get the fraction of recent requests which failed."""
+        failures = sum(failed for _, failed in self.outcomes)
+        return failures / max(len(self.outcomes), 1)
+
+
+class CircuitBreaker:  # pylint: disable=too-many-instance-attributes
+    """Fail fast for upstream hosts which keep failing.
+
+    Each host starts `closed` and requests are made as normal. If at least
+    `failure_rate` of the requests in the last `window` seconds failed (and
+    there were at least `min_requests` of them) the circuit `opens`, and
+    requests fail immediately without contacting the host.
+
+    After `cool_down` seconds the circuit is `half-open`: a single trial
+    request is let through. If it succeeds the circuit closes again,
+    otherwise it opens for another `cool_down`.
+
+    Failures are `UpstreamServiceError` (connection errors, timeouts etc.)
+    and 5xx responses.
+
+    :param failure_rate: The fraction of failed requests which opens the
+        circuit
+    :param min_requests: The fewest requests to judge a host on
+    :param window: How far back to look at requests in seconds
+    :param cool_down: How long to keep the circuit open in seconds
+    :param max_hosts: The number of hosts to keep track of
+    """
+
+    def __init__(
+        self, failure_rate=0.5, min_requests=5, window=60, cool_down=30, max_hosts=1024
+    ):  # pylint: disable=too-many-arguments
+        self._failure_rate = failure_rate
+        self._min_requests = min_requests
+        self._window = window
+        self._cool_down = cool_down
+        self._max_hosts = max_hosts
+
+        self._circuits = OrderedDict()
+        self._lock = threading.Lock()
+
+        self.rejected = 0
+
+    def wrap(self, fetch):
+        """Wrap a URL details lookup function so it's protected by this.
+
+        :param fetch: Callable accepting `(url, headers, **kwargs)`
+        :return: A callable with the same signature as `fetch`
+        """
+
+        def protected_fetch(url, headers, **kwargs):
+            host = urlsplit(url).hostname
+            self.before_request(host)
+
+            # Anything else which goes wrong (even a `BaseException` like
+            # `GreenletExit`) isn't the host's fault, but we don't know how
+            # it's doing either. We always record something, so a trial
+            # request never leaves a half open circuit waiting for it forever
+            failed = None
+            try:
+                details = fetch(url, headers, **kwargs)
+            except UpstreamServiceError:
+                failed = True
+                raise
+            else:
+                failed = details[1] >= 500
+            finally:
+                self.after_request(host, failed=failed)
+
+            return details
+
+        return protected_fetch
+
+    def wrap_async(self, fetch):
+        """Wrap an async URL details lookup function, like `wrap()`.
+
+        :param fetch: Coroutine function accepting `(url, headers, **kwargs)`
+        :return: A coroutine function with the same signature as `fetch`
+        """
+
+        async def protected_fetch(url, headers, **kwargs):
+            host = urlsplit(url).hostname
+            self.before_request(host)
+
+            failed = None
+            try:
+                details = await fetch(url, headers, **kwargs)
+            except UpstreamServiceError:
+                failed = True
+                raise
+            else:
+                failed = details[1] >= 500
+            finally:
+                self.after_request(host, failed=failed)
+
+            return details
+
+        return protected_fetch
+
+    def before_request(self, host):
+        """Check whether a request can be made to a host.
+
+        :param host: The host we want to make a request to
+        :raise UpstreamHostFailing: If the circuit for the host is open
+        """
+        now = time.monotonic()
+
+        with self._lock:
+            circuit = self._circuit(host)
+
+            if circuit.state == circuit.OPEN:
+                if now - circuit.opened_at < self._cool_down:
+                    self.rejected += 1
+                    raise UpstreamHostFailing(f"{host} is failing, try again later")
+
+                circuit.state = circuit.HALF_OPEN
+
+            if circuit.state == circuit.HALF_OPEN:
+                if circuit.trial_in_progress:
+                    self.rejected += 1
+                    raise UpstreamHostFailing(f"{host} is failing, try again later")
+
+                circuit.trial_in_progress = True
+
+    def after_request(self, host, failed):
+        """Record the outcome of a request to a host.
+
+        :param host: The host the request was made to
+        :param failed: Whether the request failed, or None if we can't tell
+        """
+        now = time.monotonic()
+
+        with self._lock:
+            circuit = self._circuit(host)
+
+            if circuit.state == circuit.HALF_OPEN:
+                circuit.trial_in_progress = False
+
+                if failed is None:
+                    return
+
+                if failed:
+                    circuit.state = circuit.OPEN
+                    circuit.opened_at = now
+                else:
+                    circuit.state = circuit.CLOSED
+                    circuit.outcomes.clear()
+
+                return
+
+            if failed is None or circuit.state == circuit.OPEN:
+                return
+
+            circuit.outcomes.append((now, failed))
+            while circuit.outcomes[0][0] <= now - self._window:
+                circuit.outcomes.popleft()
+
+            if (
+                len(circuit.outcomes) >= self._min_requests
+                and circuit.failure_rate() >= self._failure_rate
+            ):
+                circuit.state = circuit.OPEN
+                circuit.opened_at = now
+
+    def state(self, host):
+        """Get the state of the circuit for a host."""
+        with self._lock:
+            circuit = self._circuits.get(host)
+            return circuit.state if circuit else _HostCircuit.CLOSED
+
+    @property
+    def stats(self):
+        """Get the hosts which are failing, and how many requests we refused."""
+        with self._lock:
+            return {
+                "rejected": self.rejected,
+                "hosts": {
+                    host: {
+                        "state": circuit.state,
+                        "failure_rate": round(circuit.failure_rate(), 2),
+                    }
+                    for host, circuit in self._circuits.items()
+                    if circuit.state != circuit.CLOSED
+                },
+            }
+
+    def _circuit(self, host):
+        circuit = self._circuits.get(host)
+
+        if circuit is None:
+            circuit = self._circuits[host] = _HostCircuit()
+
+            # Forget the least recently used hosts, but never open circuits
+            # or the one we just added
+            for old_host in list(self._circuits)[:-1]:
+                if len(self._circuits) <= self._max_hosts:
+                    break
+
+                if self._circuits[old_host].state == _HostCircuit.CLOSED:
+                    del self._circuits[old_host]
+        else:
+            self._circuits.move_to_end(host)
+
+        return circuit
+
+
+def breaker_from_settings(settings):
+    """Create a circuit breaker configured from the app settings.
+
+    :param settings: The application settings dict
+    :return: A `CircuitBreaker` object
+    """
+    return CircuitBreaker(
+        failure_rate=float(settings["circuit_breaker_failure_rate"]),
+        min_requests=int(settings["circuit_breaker_min_requests"]),
+        window=float(settings["circuit_breaker_window"]),
+        cool_down=float(settings["circuit_breaker_cool_down"]),
+    )
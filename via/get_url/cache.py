@@ -0,0 +1,301 @@
+"""A cache for URL details."""
+
+import time
+from collections import namedtuple
+from urllib.parse import urlsplit, urlunsplit
+
+from via.get_url.details import URLDetails
+from via.get_url.single_flight import SingleFlight
+
+DEFAULT_PORTS = {"http": ":80", "https": ":443"}
+
+
+def normalize_url(url):
+    """Get a canonical version of a URL suitable for use as a cache key.
+
+    This lower cases the scheme and host, removes default ports and drops the
+    fragment (which is never sent to the server). The path and query are left
+    exactly as they are, as servers are free to treat them case-sensitively.
+
+    :param url: URL to normalize
+    :return: The normalized URL, or the URL unchanged if it can't be parsed
+    """
+    try:
+        parts = urlsplit(url)
+    except ValueError:
+        return url
+
+    scheme = parts.scheme.lower()
+    netloc = parts.netloc.lower()
+
+    default_port = DEFAULT_PORTS.get(scheme)
+    if default_port and netloc.endswith(default_port):
+        netloc = netloc[: -len(default_port)]
+
+    path = parts.path
+    if not path and default_port:
+        path = "/"
+
+    return urlunsplit((scheme, netloc, path, parts.query, ""))
+
+
+def max_age_for_status(status_code):
+    """Get how long the results for a given HTTP status can be kept.
+
+    :param status_code: The status code returned by the upstream server
+    :return: A max age in seconds, or None if the result shouldn't be cached
+    """
+    if status_code == 404:
+        # 404 - A rare case we may want to handle differently, as unusually
+        # for a 4xx error, trying again can help if it becomes available
+        return 60
+
+    if status_code < 500:
+        # 2xx - OK
+        # 3xx - we follow it, so this shouldn't happen
+        # 4xx - no point in trying again quickly
+        return 60
+
+    # 5xx - Errors should not be cached
+    return None
+
+
+class CacheEntry(namedtuple("CacheEntry", ["details", "validators", "fresh_until"])):
+    """The details for a URL, and how to check whether they have changed.
+
+    :param details: 2-tuple of (mime type, status code)
+    :param validators: Conditional request headers to revalidate with, or None
+    :param fresh_until: The wall clock time the details can be used until
+    """
+
+    def is_fresh(self, grace=0):
+        """Get whether this entry can be used without revalidating it.
+
+        :param grace: Seconds after it goes stale to still count it as fresh
+        :return: True if the entry is fresh
+        """
+        return time.time() < self.fresh_until + grace
+
+
+class URLDetailsCacheBase:
+    # pylint: disable=too-few-public-methods,too-many-instance-attributes
+    """Store access and accounting shared between URL details caches.
+
+    Entries with an `ETag` or `Last-Modified` are kept for `revalidate_for`
+    seconds after they go stale, so they can be revalidated with a cheap
+    conditional request instead of starting again. All entries are kept for
+    `stale_while_revalidate` seconds after they go stale, so they can be
+    served while they are refreshed.
+
+    :param fetch: Callable to get details on a cache miss
+    :param store: The store to keep entries in (see `via.get_url.store`)
+    :param revalidate_for: Seconds to keep stale entries to revalidate
+    :param stale_while_revalidate: Seconds to serve stale entries for
+    """
+
+    coalesced = 0
+
+    def __init__(self, fetch, store, revalidate_for=0, stale_while_revalidate=0):
+        self._fetch = fetch
+        self._store = store
+        self._revalidate_for = revalidate_for
+        self._stale_while_revalidate = stale_while_revalidate
+
+        self.hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+        self.revalidated = 0
+
+    @property
+    def stats(self):
+        """Get the hit and miss counters for this cache and its store."""
+        return dict(
+            self._store.stats,
+            hits=self.hits,
+            stale_hits=self.stale_hits,
+            misses=self.misses,
+            coalesced=self.coalesced,
+            revalidated=self.revalidated,
+        )
+
+    def fresh_entries(self):
+        """Get the details of every URL which are fresh in the store.
+
+        This reads the whole store, so it's for tools rather than requests.
+
+        :return: An iterable of (normalized URL, `CacheEntry`) tuples
+        :rtype: collections.abc.Iterable
+        """
+        for key, value in self._store.items():
+            # Claims and other things can share the store with us
+            if isinstance(value, CacheEntry) and value.is_fresh():
+                yield key, value
+
+    def _get_cached(self, key, grace=0):
+        """Get the entry for a key, counting whether it was a hit.
+
+        :param key: The key to look up
+        :param grace: Seconds after an entry goes stale to count it as a hit
+        :return: A `CacheEntry` which may be stale, or None
+        """
+        entry = self._store.get(key)
+
+        if entry is not None and entry.is_fresh(grace):
+            self.hits += 1
+        else:
+            self.misses += 1
+
+        return entry
+
+    def _set_cached(self, key, details, stale_entry=None):
+        """Store the details returned by `fetch`.
+
+        :param key: The key to store against
+        :param details: The value returned by `fetch`
+        :param stale_entry: The stale entry `fetch` was asked to revalidate
+        :return: 2-tuple of (mime type, status code)
+        """
+        details = URLDetails(*details)
+        validators = details.validators
+
+        if details.status_code == 304 and stale_entry is not None:
+            # Not modified, so the details we had are still good
+            self.revalidated += 1
+            details = stale_entry.details
+            validators = validators or stale_entry.validators
+
+        mime_type, status_code = details[:2]
+
+        max_age = max_age_for_status(status_code)
+        if max_age:
+            self._store.set(
+                key,
+                CacheEntry((mime_type, status_code), validators, time.time() + max_age),
+                max_age
+                + max(
+                    self._revalidate_for if validators else 0,
+                    self._stale_while_revalidate,
+                ),
+            )
+
+        return mime_type, status_code
+
+
+class URLDetailsCache(URLDetailsCacheBase):
+    """A cache in front of a URL details lookup.
+
+    Entries are keyed by normalized URL and expire according to the status
+    code which was returned for them (see `max_age_for_status()`).
+
+    Concurrent misses for the same URL are coalesced so only one of them
+    calls `fetch`. Within a process the others wait on it directly. If the
+    store is shared between processes, they poll the store for the result
+    instead until the process doing the lookup is finished.
+
+    With a `refresher`, entries which are less than `stale_while_revalidate`
+    seconds stale are returned straight away, and refreshed in the
+    background.
+
+    :param fetch: Callable accepting `(url, headers)` to call on a cache miss
+        returning a `URLDetails` or 2-tuple of (mime type, status code). To
+        revalidate it's also passed `validators`, a dict of conditional
+        request headers
+    :param store: The store to keep entries in (see `via.get_url.store`)
+    :param claim_timeout: The longest we will wait for another process
+    :param revalidate_for: Seconds to keep stale entries to revalidate
+    :param stale_while_revalidate: Seconds to serve stale entries for
+    :param refresher: A `BackgroundRefresher` to refresh stale entries with
+    """
+
+    POLL_INTERVAL = 0.05
+
+    def __init__(  # pylint: disable=too-many-arguments
+        self,
+        fetch,
+        store,
+        claim_timeout=15,
+        revalidate_for=0,
+        stale_while_revalidate=0,
+        refresher=None,
+    ):
+        if refresher is None:
+            stale_while_revalidate = 0
+
+        super().__init__(fetch, store, revalidate_for, stale_while_revalidate)
+        self._claim_timeout = claim_timeout
+        self._refresher = refresher
+
+        self._single_flight = SingleFlight()
+
+    def get_url_details(self, url, headers):
+        """Get the content type and status code for a given URL.
+
+        :param url: URL to retrieve
+        :param headers: The original headers the request was made with
+        :return: 2-tuple of (mime type, status code)
+        """
+        key = normalize_url(url)
+
+        entry = self._get_cached(key, grace=self._stale_while_revalidate)
+        if entry is not None and entry.is_fresh():
+            return entry.details
+
+        if entry is not None and entry.is_fresh(self._stale_while_revalidate):
+            self.stale_hits += 1
+
+            # Copy the headers, as the request they come from will be gone
+            headers = dict(headers)
+            self._refresher.refresh(
+                key,
+                lambda: self._single_flight.call(
+                    key, lambda: self._fetch_once_per_store(key, url, headers, entry)
+                ),
+            )
+            return entry.details
+
+        return self._single_flight.call(
+            key, lambda: self._fetch_once_per_store(key, url, headers, entry)
+        )
+
+    @property
+    def coalesced(self):
+        """Get the number of lookups which waited on another."""
+        return self._single_flight.coalesced
+
+    def _fetch_once_per_store(self, key, url, headers, stale_entry):
+        claimed = self._store.claim(key, self._claim_timeout)
+
+        if not claimed:
+            entry = self._wait_for_other_process(key)
+            if entry is not None:
+                return entry.details
+
+            # The other process failed or timed out, so try ourselves
+
+        try:
+            if stale_entry is not None and stale_entry.validators:
+                details = self._fetch(url, headers, validators=stale_entry.validators)
+            else:
+                stale_entry = None
+                details = self._fetch(url, headers)
+
+            return self._set_cached(key, details, stale_entry)
+
+        finally:
+            if claimed:
+                self._store.release(key)
+
+    def _wait_for_other_process(self, key):
+        deadline = time.monotonic() + self._claim_timeout
+
+        while time.monotonic() < deadline:
+            time.sleep(self.POLL_INTERVAL)
+
+            entry = self._store.get(key)
+            if entry is not None and entry.is_fresh():
+                return entry
+
+            if not self._store.is_claimed(key):
+                return None
+
+        return None
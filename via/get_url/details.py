@@ -1,9 +1,10 @@
 """Retrieve details about a resource at a URL."""
-import cgi
+import logging
 import re
+import time
+from collections import namedtuple
 from functools import wraps
 
-import requests
 from requests import RequestException
 
 from via.exceptions import (
@@ -11,14 +12,27 @@ from via.exceptions import (
     REQUESTS_UPSTREAM_SERVICE,
     BadURL,
     UnhandledException,
-    UpstreamServiceError,
+    upstream_error_class,
 )
 from via.get_url.headers import clean_headers
+from via.get_url.probe import ProbeStrategy
+from via.get_url.session import release
+from via.get_url.sniff import header_mime_type, is_generic, sniff_mime_type
+
+LOG = logging.getLogger(__name__)
 
 GOOGLE_DRIVE_REGEX = re.compile(
     r"^https://drive.google.com/uc\?id=(.*)&export=download$", re.IGNORECASE
 )
 
+#: The details of a URL, and the conditional request headers (if any) which
+#: can be used to check whether they have changed
+URLDetails = namedtuple("URLDetails", ["mime_type", "status_code", "validators"])
+URLDetails.__new__.__defaults__ = (None,)
+
+# Response headers to the request headers which check whether they've changed
+VALIDATOR_HEADERS = (("ETag", "If-None-Match"), ("Last-Modified", "If-Modified-Since"))
+
 
 def _handle_errors(inner):
     """Translate errors into our application errors."""
@@ -32,7 +46,7 @@ def _handle_errors(inner):
             raise BadURL(err.args[0]) from None
 
         except REQUESTS_UPSTREAM_SERVICE as err:
-            raise UpstreamServiceError(err.args[0]) from None
+            raise upstream_error_class(err)(err.args[0]) from None
 
         except RequestException as err:
             raise UnhandledException(err.args[0]) from None
@@ -41,12 +55,29 @@ def _handle_errors(inner):
 
 
 @_handle_errors
-def get_url_details(url, headers):
+def get_url_details(  # pylint: disable=too-many-arguments
+    session,
+    url,
+    headers,
+    probe_strategy=None,
+    sniff=False,
+    timings=None,
+    validators=None,
+):
     """Get the content type and status code for a given URL.
 
+    :param session: The `requests.Session` to make the request with
     :param url: URL to retrieve
     :param headers: The original headers the request was made with
-    :return: 2-tuple of (mime type, status code)
+    :param probe_strategy: The `ProbeStrategy` to open the URL with. By
+        default we make a streaming `GET` request
+    :param sniff: Look at the start of the content to work out the type
+        when the `Content-Type` is missing or too generic to tell
+    :param timings: A `PhaseTimings` to record where the time went. Each
+        probe's phases are also logged at debug level
+    :param validators: Conditional request headers from a previous call. If
+        the content hasn't changed the status code will be 304
+    :return: A `URLDetails` object
 
     :raise BadURL: When the URL is malformed
     :raise UpstreamServiceError: If we server gives us errors
@@ -54,19 +85,45 @@ def get_url_details(url, headers):
     """
 
     if GOOGLE_DRIVE_REGEX.match(url):
-        return "application/pdf", 200
-
-    with requests.get(
-        url,
-        stream=True,
-        allow_redirects=True,
-        headers=clean_headers(headers),
-        timeout=10,
-    ) as rsp:
-        content_type = rsp.headers.get("Content-Type")
-        if content_type:
-            mime_type, _ = cgi.parse_header(content_type)
-        else:
-            mime_type = None
-
-        return mime_type, rsp.status_code
+        return URLDetails("application/pdf", 200)
+
+    if probe_strategy is None:
+        probe_strategy = ProbeStrategy()
+
+    headers = clean_headers(headers)
+    if validators:
+        headers = dict(headers, **validators)
+
+    rsp = probe_strategy.open(session, url, headers=headers)
+    try:
+        mime_type = header_mime_type(rsp)
+        body_start = time.monotonic()
+
+        if sniff and is_generic(mime_type):
+            mime_type = sniff_mime_type(rsp) or mime_type
+
+        if timings is not None:
+            phases = timings.record(rsp, body_seconds=time.monotonic() - body_start)
+            LOG.debug(
+                "Probed %s (redirects %.3fs, response %.3fs, body %.3fs)",
+                url,
+                phases["redirects"],
+                phases["response"],
+                phases["body"],
+            )
+
+        return URLDetails(mime_type, rsp.status_code, _validators(rsp))
+
+    finally:
+        # Keep the connection open for next time if we can
+        release(rsp)
+
+
+def _validators(response):
+    validators = {
+        request_header: response.headers[response_header]
+        for response_header, request_header in VALIDATOR_HEADERS
+        if response.headers.get(response_header)
+    }
+
+    return validators or None
@@ -0,0 +1,181 @@
+"""An in-process cache of DNS lookups for upstream requests.
+
+Our Docker image has no caching resolver (like `nscd`), so without this
+every new connection to an upstream server pays for a DNS round trip.
+"""
+
+import socket
+import time
+from collections import OrderedDict
+from functools import partial
+
+from pyramid.settings import asbool
+from urllib3.connection import HTTPConnection, HTTPSConnection
+from urllib3.exceptions import ConnectTimeoutError, NewConnectionError
+from urllib3.util.connection import allowed_gai_family
+
+from via.get_url.pools import (
+    CountingHTTPAdapter,
+    CountingHTTPConnectionPool,
+    CountingHTTPSConnectionPool,
+)
+from via.get_url.store import MemoryStore
+
+# pylint: disable=too-few-public-methods,too-many-ancestors
+
+
+class DNSCache:
+    """Resolve host names, remembering the answers for a while.
+
+    Failed lookups are remembered too (for `negative_ttl` seconds), so a
+    host which doesn't exist doesn't cost a round trip every time.
+
+    :param ttl: Seconds to remember addresses for
+    :param negative_ttl: Seconds to remember failed lookups for
+    :param max_size: The number of hosts to remember
+    :param timings: A `PhaseTimings` to record the time spent resolving in
+    """
+
+    def __init__(self, ttl=60, negative_ttl=10, max_size=1024, timings=None):
+        self._ttl = ttl
+        self._negative_ttl = negative_ttl
+        self._store = MemoryStore(max_size=max_size)
+        self._timings = timings
+
+        self.hits = 0
+        self.misses = 0
+
+    def resolve(self, host):
+        """Get the IP addresses to connect to for a host.
+
+        :param host: The host name to resolve
+        :return: A tuple of IP address strings, in the order to try them
+        :raise socket.gaierror: If the host can't be resolved
+        """
+        cached = self._store.get(host)
+
+        if cached is not None:
+            self.hits += 1
+        else:
+            self.misses += 1
+            cached = self._lookup(host)
+
+        addresses, error = cached
+        if error:
+            raise socket.gaierror(*error)
+
+        return addresses
+
+    @property
+    def stats(self):
+        """Get the hit and miss counters for this cache."""
+        return dict(self._store.stats, hits=self.hits, misses=self.misses)
+
+    def _lookup(self, host):
+        start = time.monotonic()
+
+        try:
+            # Ask for the same sort of addresses `urllib3` would
+            address_info = socket.getaddrinfo(
+                host, None, allowed_gai_family(), socket.SOCK_STREAM
+            )
+        except socket.gaierror as err:
+            cached, ttl = (None, err.args), self._negative_ttl
+        else:
+            # Keep every address (without repeats), like `urllib3` would try
+            # them all, as the first might be unreachable (e.g. IPv6)
+            addresses = tuple(OrderedDict.fromkeys(info[4][0] for info in address_info))
+            cached, ttl = (addresses, None), self._ttl
+
+        if self._timings is not None:
+            self._timings.add("dns", time.monotonic() - start)
+
+        self._store.set(host, cached, ttl)
+        return cached
+
+
+class _ResolvingConnectionMixin:
+    """Connect to the addresses from a `DNSCache` instead of the host name.
+
+    Each address is tried in turn, as `urllib3` does with the addresses it
+    resolves itself, until one connects. Everything else (the `Host` header,
+    SNI and certificate checks) still uses the host name.
+    """
+
+    def __init__(self, *args, resolver, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._resolver = resolver
+
+    def _new_conn(self):
+        try:
+            addresses = self._resolver.resolve(self.host)
+        except socket.gaierror as err:
+            raise NewConnectionError(
+                self, f"Failed to establish a new connection: {err}"
+            ) from None
+
+        host_name = self._dns_host
+        error = None
+
+        for address in addresses:
+            # `urllib3` connects to `_dns_host`, but also uses it as `host`
+            # for SNI and certificates, so only swap it in for the connect
+            self._dns_host = address
+            try:
+                return super()._new_conn()
+            except ConnectTimeoutError as err:
+                # This includes `NewConnectionError`, for refused connections
+                error = err
+            finally:
+                self._dns_host = host_name
+
+        raise error
+
+
+class _ResolvingHTTPConnection(_ResolvingConnectionMixin, HTTPConnection):
+    pass
+
+
+class _ResolvingHTTPSConnection(_ResolvingConnectionMixin, HTTPSConnection):
+    pass
+
+
+class _ResolvingHTTPConnectionPool(CountingHTTPConnectionPool):
+    ConnectionCls = _ResolvingHTTPConnection
+
+
+class _ResolvingHTTPSConnectionPool(CountingHTTPSConnectionPool):
+    ConnectionCls = _ResolvingHTTPSConnection
+
+
+class ResolvingHTTPAdapter(CountingHTTPAdapter):
+    """A `requests` adapter which resolves host names with a `DNSCache`.
+
+    :param resolver: The `DNSCache` to resolve host names with
+    :param kwargs: Any other arguments for `HTTPAdapter`
+    """
+
+    def __init__(self, resolver, **kwargs):
+        self.pool_classes = {
+            "http": partial(_ResolvingHTTPConnectionPool, resolver=resolver),
+            "https": partial(_ResolvingHTTPSConnectionPool, resolver=resolver),
+        }
+        super().__init__(**kwargs)
+
+
+def dns_cache_from_settings(settings, timings=None):
+    """Create a DNS cache if one is enabled in the app settings.
+
+    :param settings: The application settings dict
+    :param timings: A `PhaseTimings` to record the time spent resolving in
+    :return: A `DNSCache` object or None if it's not enabled
+    """
+    if not asbool(settings["url_dns_cache"]):
+        return None
+
+    return DNSCache(
+        ttl=int(settings["url_dns_cache_ttl"]),
+        negative_ttl=int(settings["url_dns_cache_negative_ttl"]),
+        max_size=int(settings["url_dns_cache_size"]),
+        timings=timings,
+    )
@@ -1,6 +1,6 @@
 """Methods for working with headers."""
 
-from collections import OrderedDict
+from types import MappingProxyType
 
 # A mix of headers we don't want to pass on for one reason or another
 BANNED_HEADERS = {
@@ -43,6 +43,45 @@ HEADER_DEFAULTS = {
 }
 
 
+# Sentinel rules for headers which are dropped, or passed on as they are
+_BANNED = object()
+_UNCHANGED = object()
+
+
+def _compile_rules():
+    """Combine the lists above into one table keyed by lower-cased name.
+
+    Each rule is either `_BANNED` or a 2-tuple of the name to send the header
+    with, and the value to send instead (or None to keep the original).
+    """
+    rules = {name.lower(): _BANNED for name in BANNED_HEADERS}
+
+    for name, mapped_name in HEADER_MAP.items():
+        rules[name.lower()] = (mapped_name, HEADER_DEFAULTS.get(mapped_name))
+
+    for name, default in HEADER_DEFAULTS.items():
+        rules.setdefault(name.lower(), (name, default))
+
+    return rules
+
+
+_RULES = _compile_rules()
+
+# The rules for header names exactly as we've seen them, so we only need to
+# lower case each name once. Bounded in case clients send us junk names
+_RULES_BY_NAME = {}
+_RULES_BY_NAME_SIZE = 1024
+
+
+def _rule_for(header_name):
+    rule = _RULES.get(header_name.lower(), _UNCHANGED)
+
+    if len(_RULES_BY_NAME) < _RULES_BY_NAME_SIZE:
+        _RULES_BY_NAME[header_name] = rule
+
+    return rule
+
+
 def clean_headers(headers):
     """Remove Cloudflare and other cruft from the headers.
 
@@ -55,24 +94,25 @@ def clean_headers(headers):
       * Remove things added by AWS and Cloudflare etc.
       * Fix some header names
 
-    This is intended to return a list of headers that can be passed on to the
-    upstream service.
+    Header names are matched case-insensitively. This is intended to return
+    a list of headers that can be passed on to the upstream service.
 
     :param headers: A mapping of header values
-    :return: An OrderedDict of cleaned headers
+    :return: A read-only mapping of cleaned headers, in the original order
     """
-    clean = OrderedDict()
+    clean = {}
 
     for header_name, value in headers.items():
-        if header_name in BANNED_HEADERS:
-            continue
+        rule = _RULES_BY_NAME.get(header_name) or _rule_for(header_name)
 
-        # Map to standard names for things
-        header_name = HEADER_MAP.get(header_name, header_name)
+        if rule is _BANNED:
+            continue
 
-        # Add in defaults for certain fields
-        value = HEADER_DEFAULTS.get(header_name, value)
+        if rule is not _UNCHANGED:
+            header_name, default = rule
+            if default is not None:
+                value = default
 
         clean[header_name] = value
 
-    return clean
+    return MappingProxyType(clean)
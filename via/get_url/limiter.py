@@ -0,0 +1,120 @@
+"""Limits on how many upstream probes we make at once."""
+
+import threading
+from contextlib import contextmanager
+from urllib.parse import urlsplit
+
+from via.exceptions import UpstreamTimeout
+
+
+class ProbeLimiter:
+    """Bound the number of probes in flight, overall and for each host.
+
+    This is only useful with workers which handle more than one request at
+    a time (e.g. `gthread` or `gevent`). When gevent has monkey-patched the
+    `threading` module the semaphores used here are cooperative.
+
+    :param max_concurrent: The most probes to have in flight in this process
+    :param max_per_host: The most probes to have in flight to any one host
+    :param wait_timeout: The longest to wait for a free slot before failing
+    """
+
+    def __init__(self, max_concurrent=100, max_per_host=10, wait_timeout=5):
+        self._max_per_host = max_per_host
+        self._wait_timeout = wait_timeout
+
+        self._slots = threading.BoundedSemaphore(max_concurrent)
+        self._host_slots = {}
+        self._lock = threading.Lock()
+
+        self.in_flight = 0
+        self.rejected = 0
+
+    def wrap(self, fetch):
+        """Wrap a URL details lookup function so it's limited by this.
+
+        :param fetch: Callable accepting `(url, headers, **kwargs)`
+        :return: A callable with the same signature as `fetch`
+        """
+
+        def limited_fetch(url, headers, **kwargs):
+            with self.slot(url):
+                return fetch(url, headers, **kwargs)
+
+        return limited_fetch
+
+    @contextmanager
+    def slot(self, url):
+        """Wait for a free slot to probe a given URL.
+
+        :param url: The URL which will be probed
+        :return: A context manager which holds the slot until it exits
+        :rtype: contextlib.AbstractContextManager
+        :raise UpstreamTimeout: If no slot became free in time
+        """
+        host = urlsplit(url).hostname
+        host_slots = self._check_out_host(host)
+
+        try:
+            with self._acquire(
+                host_slots, f"Too many requests in progress to {host}"
+            ), self._acquire(self._slots, "Too many requests in progress"):
+                self._count("in_flight", 1)
+                try:
+                    yield
+                finally:
+                    self._count("in_flight", -1)
+
+        finally:
+            self._check_in_host(host)
+
+    @property
+    def stats(self):
+        """Get the number of probes in flight and rejected."""
+        return {"in_flight": self.in_flight, "rejected": self.rejected}
+
+    def _check_out_host(self, host):
+        with self._lock:
+            host_slots, users = self._host_slots.get(
+                host, (threading.BoundedSemaphore(self._max_per_host), 0)
+            )
+            self._host_slots[host] = (host_slots, users + 1)
+
+        return host_slots
+
+    def _check_in_host(self, host):
+        # Forget about hosts nobody is using, so we don't grow forever
+        with self._lock:
+            host_slots, users = self._host_slots[host]
+            if users == 1:
+                del self._host_slots[host]
+            else:
+                self._host_slots[host] = (host_slots, users - 1)
+
+    @contextmanager
+    def _acquire(self, semaphore, message):
+        if not semaphore.acquire(timeout=self._wait_timeout):
+            self._count("rejected", 1)
+            raise UpstreamTimeout(message)
+
+        try:
+            yield
+        finally:
+            semaphore.release()
+
+    def _count(self, counter, change):
+        with self._lock:
+            setattr(self, counter, getattr(self, counter) + change)
+
+
+def limiter_from_settings(settings):
+    """Create a probe limiter configured from the app settings.
+
+    :param settings: The application settings dict
+    :return: A `ProbeLimiter` object
+    """
+    return ProbeLimiter(
+        max_concurrent=int(settings["probe_max_concurrent"]),
+        max_per_host=int(settings["probe_max_per_host"]),
+        wait_timeout=float(settings["probe_wait_timeout"]),
+    )
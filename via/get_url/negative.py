@@ -0,0 +1,127 @@
+"""Remember which URLs fail, so we can fail fast when asked again."""
+
+from via.exceptions import (
+    BadURL,
+    UpstreamConnectionRefused,
+    UpstreamHostFailing,
+    UpstreamHostNotFound,
+    UpstreamServiceError,
+    UpstreamTransientError,
+)
+from via.get_url.cache import normalize_url
+from via.get_url.store import MemoryStore
+
+
+class NegativeCache:
+    """A small, short lived cache of errors from looking up URLs.
+
+    Only the error classes in `max_ages` are cached, each for its own number
+    of seconds (0 to not cache it). Anything else, like `UnhandledException`,
+    is never cached. Responses are not errors, so 5xx responses aren't
+    cached here either. Nor is `UpstreamHostFailing`, as that's about how the
+    host is doing right now, not the URL, and the circuit breaker which
+    raises it needs to see the URL again to know when the host recovers.
+    `UpstreamTransientError` (like timeouts and dropped connections) isn't
+    cached either, as it may well not happen again next time.
+
+    :param max_ages: A dict of exception class to seconds to cache it for.
+        An error is cached for the first class in the dict it's an instance
+        of, so put subclasses before their parents
+    :param max_size: The most errors to remember
+    """
+
+    def __init__(self, max_ages, max_size=1024):
+        self._max_ages = max_ages
+        self._store = MemoryStore(max_size=max_size)
+
+        self.hits = 0
+
+    def wrap(self, fetch):
+        """Wrap a URL details lookup function so its errors are cached.
+
+        :param fetch: Callable accepting `(url, headers, **kwargs)`
+        :return: A callable with the same signature as `fetch`
+        """
+
+        def negatively_cached_fetch(url, headers, **kwargs):
+            key = normalize_url(url)
+            self._raise_if_cached(key)
+
+            try:
+                return fetch(url, headers, **kwargs)
+
+            except Exception as err:
+                self._remember(key, err)
+                raise
+
+        return negatively_cached_fetch
+
+    def wrap_async(self, fetch):
+        """Wrap an async URL details lookup function, like `wrap()`.
+
+        :param fetch: Coroutine function accepting `(url, headers, **kwargs)`
+        :return: A coroutine function with the same signature as `fetch`
+        """
+
+        async def negatively_cached_fetch(url, headers, **kwargs):
+            key = normalize_url(url)
+            self._raise_if_cached(key)
+
+            try:
+                return await fetch(url, headers, **kwargs)
+
+            except Exception as err:
+                self._remember(key, err)
+                raise
+
+        return negatively_cached_fetch
+
+    @property
+    def stats(self):
+        """Get the number of errors we've answered from the cache."""
+        return dict(self._store.stats, hits=self.hits)
+
+    def _raise_if_cached(self, key):
+        cached = self._store.get(key)
+        if cached is not None:
+            self.hits += 1
+            error_class, detail = cached
+            raise error_class(detail)
+
+    def _remember(self, key, error):
+        max_age = self._max_age_for(error)
+        if max_age:
+            self._store.set(key, (type(error), str(error)), max_age)
+
+    def _max_age_for(self, error):
+        if isinstance(error, (UpstreamHostFailing, UpstreamTransientError)):
+            return None
+
+        for error_class, max_age in self._max_ages.items():
+            if isinstance(error, error_class):
+                return max_age
+
+        return None
+
+
+def negative_cache_from_settings(settings):
+    """Create a negative cache configured from the app settings.
+
+    :param settings: The application settings dict
+    :return: A `NegativeCache` object
+    """
+    return NegativeCache(
+        max_ages={
+            BadURL: int(settings["url_negative_cache_bad_url_max_age"]),
+            UpstreamHostNotFound: int(
+                settings["url_negative_cache_host_not_found_max_age"]
+            ),
+            UpstreamConnectionRefused: int(
+                settings["url_negative_cache_connection_refused_max_age"]
+            ),
+            UpstreamServiceError: int(
+                settings["url_negative_cache_upstream_error_max_age"]
+            ),
+        },
+        max_size=int(settings["url_negative_cache_size"]),
+    )
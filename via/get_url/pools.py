@@ -0,0 +1,54 @@
+"""Connection pools which count the connections they really open.
+
+urllib3's `num_connections` counts connection objects, but a pool keeps
+re-using those objects after their socket has been closed (for example when
+a response is closed before its body was read). So it can't tell us whether
+connections are actually being kept alive between requests.
+"""
+
+from requests.adapters import HTTPAdapter
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+
+# pylint: disable=too-few-public-methods,too-many-ancestors
+
+
+class _CountingPoolMixin:
+    """Count the requests which have to open a new socket."""
+
+    num_connects = 0
+
+    # pylint: disable=arguments-differ
+    def _make_request(self, conn, method, url, *args, **kwargs):
+        if conn.sock is None:
+            self.num_connects += 1
+
+        return super()._make_request(conn, method, url, *args, **kwargs)
+
+
+class CountingHTTPConnectionPool(_CountingPoolMixin, HTTPConnectionPool):
+    """An `HTTPConnectionPool` which counts the sockets it opens."""
+
+
+class CountingHTTPSConnectionPool(_CountingPoolMixin, HTTPSConnectionPool):
+    """An `HTTPSConnectionPool` which counts the sockets it opens."""
+
+
+class CountingHTTPAdapter(HTTPAdapter):
+    """A `requests` adapter which uses counting connection pools."""
+
+    pool_classes = {
+        "http": CountingHTTPConnectionPool,
+        "https": CountingHTTPSConnectionPool,
+    }
+
+    def init_poolmanager(self, connections, maxsize, block=False, **pool_kwargs):
+        """Create the pool manager, using our own connection pools.
+
+        :param connections: The number of connection pools to cache
+        :param maxsize: The most connections to keep in each pool
+        :param block: Block when no free connections are available
+        :param pool_kwargs: Extra arguments for the pool manager
+        """
+        super().init_poolmanager(connections, maxsize, block, **pool_kwargs)
+
+        self.poolmanager.pool_classes_by_scheme = dict(self.pool_classes)
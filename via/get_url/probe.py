@@ -0,0 +1,178 @@
+"""Strategies for asking an upstream server what a URL contains."""
+
+import threading
+from collections import OrderedDict
+from urllib.parse import urlsplit
+
+from via.get_url.session import release
+from via.get_url.sniff import SNIFF_BYTES, header_mime_type, is_generic
+from via.get_url.timing import Deadline, Timeouts
+
+
+class ProbeStrategy:
+    """Open a URL with the least transfer the strategy allows.
+
+    The strategies are:
+
+     * `get` - A streaming `GET` which is closed once we have the headers
+     * `range` - A `GET` with a `Range` header for only as much of the
+       content as we need to sniff its type
+     * `head` - A `HEAD` request, falling back to `range` when it fails or
+       doesn't give us a useful content type. Hosts which don't support
+       `HEAD` (which reject it outright, or fail it where `GET` works) get
+       `range` from then on
+
+    Every request made to probe a URL shares one `Deadline`, so redirects
+    and falling back between methods can't take longer than `timeouts.total`.
+
+    With a `RedirectIndex` we go straight to where a URL is known to
+    redirect to, instead of following the same redirects every time.
+
+    :param method: The strategy to use
+    :param max_hosts: The number of hosts to remember the method for
+    :param timeouts: The `Timeouts` to apply when probing
+    :param redirects: A `RedirectIndex` to remember redirects in
+    """
+
+    GET = "get"
+    RANGE = "range"
+    HEAD = "head"
+
+    DEFAULT_TIMEOUTS = Timeouts(connect=10, read=10, total=None)
+
+    # Method Not Allowed and Not Implemented
+    HEAD_NOT_SUPPORTED = (405, 501)
+
+    def __init__(
+        self, method=GET, max_hosts=1024, timeouts=DEFAULT_TIMEOUTS, redirects=None
+    ):
+        if method not in (self.GET, self.RANGE, self.HEAD):
+            raise ValueError(f"Unknown probe method: '{method}'")
+
+        self._method = method
+        self._max_hosts = max_hosts
+        self._timeouts = timeouts
+        self._redirects = redirects
+
+        self._host_methods = OrderedDict()
+        self._lock = threading.Lock()
+
+    def open(self, session, url, headers, **kwargs):
+        """Make a request to a URL which can be used to inspect it.
+
+        The response should be used as a context manager to make sure it's
+        closed. Redirects are always followed.
+
+        :param session: The `requests.Session` to make the request with
+        :param url: URL to request
+        :param headers: Headers to send with the request
+        :param kwargs: Any other arguments to pass to `requests`
+        :return: A `requests.Response` object
+        """
+        deadline = Deadline(self._timeouts.total)
+        kwargs["hooks"] = {"response": deadline.check_response}
+
+        if self._redirects is None:
+            return self._open(session, url, headers, deadline, **kwargs)
+
+        resolved = self._redirects.resolve(url)
+        if resolved is not None:
+            response = self._open(session, resolved.url, headers, deadline, **kwargs)
+            if response.status_code < 400:
+                return response
+
+            # The destination has moved on, or only works if you come from
+            # the original URL (e.g. signed links)
+            release(response)
+            self._redirects.forget(url)
+
+        response = self._open(session, url, headers, deadline, **kwargs)
+        self._redirects.record(response)
+
+        return response
+
+    def method_for_host(self, host):
+        """Get the method we expect to work for a given host."""
+        with self._lock:
+            return self._host_methods.get(host, self._method)
+
+    def _open(self, session, url, headers, deadline, **kwargs):
+        method = self._method
+        host = urlsplit(url).hostname
+
+        if method == self.HEAD:
+            method = self.method_for_host(host)
+
+        if method == self.HEAD:
+            response = session.head(
+                url,
+                allow_redirects=True,
+                headers=headers,
+                timeout=deadline.request_timeout(self._timeouts),
+                **kwargs,
+            )
+            if response.status_code == 304 or (
+                response.status_code < 400
+                and not is_generic(header_mime_type(response))
+            ):
+                return response
+
+            # Generic types and errors are usually down to this URL, so we
+            # only try a ranged GET for it, unless HEAD itself is the problem
+            release(response)
+            head_status = response.status_code
+            if head_status in self.HEAD_NOT_SUPPORTED:
+                self._remember(host, self.RANGE)
+
+            response = self._get(session, url, headers, deadline, **kwargs)
+            if response.status_code < 400 <= head_status:
+                # HEAD fails where GET works, so the host mishandles HEAD
+                self._remember(host, self.RANGE)
+
+            return response
+
+        if method == self.RANGE:
+            return self._get(session, url, headers, deadline, **kwargs)
+
+        return self._get(session, url, headers, deadline, ranged=False, **kwargs)
+
+    def _get(
+        self, session, url, headers, deadline, ranged=True, **kwargs
+    ):  # pylint: disable=too-many-arguments
+        if ranged:
+            response = session.get(
+                url,
+                stream=True,
+                allow_redirects=True,
+                headers=dict(headers, Range=f"bytes=0-{SNIFF_BYTES - 1}"),
+                timeout=deadline.request_timeout(self._timeouts),
+                **kwargs,
+            )
+
+            if response.status_code == 206:
+                # We asked for part of the content and got it, which is the
+                # same as a 200 as far as anyone else is concerned
+                response.status_code = 200
+
+            if response.status_code != 416:
+                return response
+
+            # Range not satisfiable: probably an empty file, so ask normally
+            release(response)
+
+        return session.get(
+            url,
+            stream=True,
+            allow_redirects=True,
+            headers=headers,
+            timeout=deadline.request_timeout(self._timeouts),
+            **kwargs,
+        )
+
+    def _remember(self, host, method):
+        with self._lock:
+            self._host_methods[host] = method
+            self._host_methods.move_to_end(host)
+
+            while len(self._host_methods) > self._max_hosts:
+                self._host_methods.popitem(last=False)
@@ -0,0 +1,103 @@
+"""Remember where URLs redirect to, so we can skip the hops next time."""
+
+from collections import namedtuple
+
+from via.get_url.cache import normalize_url
+from via.get_url.sniff import header_mime_type
+
+PERMANENT_REDIRECTS = {301, 308}
+TEMPORARY_REDIRECTS = {302, 303, 307}
+
+#: Where a URL ended up after following redirects
+Resolved = namedtuple("Resolved", ["url", "status_code", "mime_type"])
+
+
+class RedirectIndex:
+    """An index of URLs to where they finally redirect to.
+
+    Each URL in a redirect chain is mapped to the final URL. Entries expire
+    after `permanent_max_age` for chains of permanent redirects (301, 308),
+    or `temporary_max_age` if any of the hops were temporary.
+
+    :param store: The store to keep entries in (see `via.get_url.store`)
+    :param permanent_max_age: Seconds to remember permanent redirects for
+    :param temporary_max_age: Seconds to remember temporary redirects for
+    """
+
+    KEY_PREFIX = "redirect:"
+
+    def __init__(self, store, permanent_max_age=86400, temporary_max_age=60):
+        self._store = store
+        self._permanent_max_age = permanent_max_age
+        self._temporary_max_age = temporary_max_age
+
+        self.hits = 0
+        self.misses = 0
+
+    def resolve(self, url):
+        """Get where a URL is known to redirect to.
+
+        :param url: The URL to look up
+        :return: A `Resolved` object, or None if we don't know
+        """
+        resolved = self._store.get(self._key(url))
+
+        if resolved is None:
+            self.misses += 1
+            return None
+
+        self.hits += 1
+        return Resolved(*resolved)
+
+    def record(self, response):
+        """Remember the redirect chain which led to a response.
+
+        :param response: The final `requests.Response` (or `httpx.Response`)
+            after redirects
+        """
+        if not response.history or response.status_code >= 400:
+            return
+
+        # `httpx` gives us URL objects, which we can't keep in every store
+        resolved = Resolved(
+            str(response.url), response.status_code, header_mime_type(response)
+        )
+
+        # Each URL in the chain only depends on the hops after it
+        max_age = self._permanent_max_age
+        for hop in reversed(response.history):
+            if hop.status_code in TEMPORARY_REDIRECTS:
+                max_age = min(max_age, self._temporary_max_age)
+            elif hop.status_code not in PERMANENT_REDIRECTS:
+                return
+
+            self._store.set(self._key(str(hop.url)), tuple(resolved), max_age)
+
+    def forget(self, url):
+        """Stop skipping to the known destination of a URL.
+
+        :param url: The URL to forget about
+        """
+        self._store.set(self._key(url), None, 0)
+
+    @property
+    def stats(self):
+        """Get the number of lookups which hit and missed."""
+        return {"hits": self.hits, "misses": self.misses}
+
+    def _key(self, url):
+        return self.KEY_PREFIX + normalize_url(url)
+
+
+def redirect_index_from_settings(settings, store):
+    """Create a redirect index configured from the app settings.
+
+    :param settings: The application settings dict
+    :param store: The store to keep entries in
+    :return: A `RedirectIndex` object
+    """
+    return RedirectIndex(
+        store,
+        permanent_max_age=int(settings["url_redirect_permanent_max_age"]),
+        temporary_max_age=int(settings["url_redirect_temporary_max_age"]),
+    )
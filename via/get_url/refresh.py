@@ -0,0 +1,81 @@
+"""Refresh cache entries in the background."""
+
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+
+class BackgroundRefresher:
+    """Run cache refreshes on a small, bounded pool of threads.
+
+    Each key is only refreshed once at a time, and once `max_pending`
+    refreshes are waiting any more are dropped. Dropping is safe: the entry
+    is still stale, so it will be refreshed by a later request.
+
+    :param max_workers: The number of refreshes to run at once
+    :param max_pending: The most refreshes to have running or queued
+    """
+
+    def __init__(self, max_workers=4, max_pending=100):
+        self._executor = ThreadPoolExecutor(
+            max_workers=max_workers, thread_name_prefix="refresh"
+        )
+        self._max_pending = max_pending
+
+        self._pending = set()
+        self._lock = threading.Lock()
+
+        self.queued = 0
+        self.dropped = 0
+        self.failed = 0
+
+    def refresh(self, key, func):
+        """Call a function in the background to refresh a key.
+
+        :param key: The key being refreshed
+        :param func: A callable which refreshes the key
+        :return: True if the refresh was queued, False otherwise
+        """
+        with self._lock:
+            if key in self._pending:
+                return False
+
+            if len(self._pending) >= self._max_pending:
+                self.dropped += 1
+                return False
+
+            self._pending.add(key)
+            self.queued += 1
+
+        self._executor.submit(self._run, key, func)
+        return True
+
+    def shutdown(self, wait=True):
+        """Stop accepting refreshes, and optionally wait for those queued.
+
+        :param wait: Wait for queued refreshes to finish
+        """
+        self._executor.shutdown(wait=wait)
+
+    @property
+    def stats(self):
+        """Get counters for the refreshes we've queued, dropped or failed."""
+        return {
+            "pending": len(self._pending),
+            "queued": self.queued,
+            "dropped": self.dropped,
+            "failed": self.failed,
+        }
+
+    def _run(self, key, func):
+        try:
+            func()
+
+        except Exception:  # pylint: disable=broad-except
+            # There's nobody to tell, and the stale entry will be fetched
+            # again by the next request once it expires
+            with self._lock:
+                self.failed += 1
+
+        finally:
+            with self._lock:
+                self._pending.discard(key)
@@ -0,0 +1,169 @@
+"""A long lived HTTP session for talking to upstream servers."""
+
+from http.cookiejar import DefaultCookiePolicy
+
+from pyramid.settings import asbool
+from requests import Session
+from urllib3.exceptions import ConnectTimeoutError, NewConnectionError, ReadTimeoutError
+from urllib3.util.retry import Retry
+
+from via.get_url.dns import ResolvingHTTPAdapter
+from via.get_url.pools import CountingHTTPAdapter
+
+# Only retry requests which are safe to send twice
+IDEMPOTENT_METHODS = frozenset(["GET", "HEAD", "OPTIONS"])
+
+# The most of a body we'll read to keep its connection open. A ranged
+# response is always less than this
+DRAIN_MAX_BYTES = 16 * 1024
+
+
+class NoTimeoutRetry(Retry):
+    """Retry failed requests, except for ones which timed out.
+
+    A re-used connection which the server has closed fails straight away, so
+    retrying it costs next to nothing. A server which is slow to answer has
+    already had the whole timeout, and trying again would give it the same
+    again: so a probe could take twice as long as `url_probe_deadline`.
+    """
+
+    # pylint: disable=too-many-arguments
+    def increment(
+        self,
+        method=None,
+        url=None,
+        response=None,
+        error=None,
+        _pool=None,
+        _stacktrace=None,
+    ):
+        """Return a new `Retry` object with incremented retry counters.
+
+        :param method: The HTTP method of the failed request
+        :param url: The URL of the failed request
+        :param response: The response received, if any
+        :param error: The error the request failed with, if any
+        :param _pool: The connection pool the request was made with
+        :param _stacktrace: The traceback of `error`
+        :return: A new `NoTimeoutRetry` object
+        :raise ConnectTimeoutError: If `error` is a connection timeout
+        :raise ReadTimeoutError: If `error` is a read timeout
+        """
+        # urllib3 raises `NewConnectionError` (a `ConnectTimeoutError`) for
+        # any failure to connect, which isn't necessarily a timeout
+        if isinstance(error, ReadTimeoutError) or (
+            isinstance(error, ConnectTimeoutError)
+            and not isinstance(error, NewConnectionError)
+        ):
+            raise error
+
+        return super().increment(
+            method, url, response, error, _pool=_pool, _stacktrace=_stacktrace
+        )
+
+
+def make_session(
+    pool_connections=10, pool_maxsize=10, pool_block=False, retries=1, resolver=None
+):
+    """Create a session which keeps connections alive between requests.
+
+    :param pool_connections: The number of hosts to keep connection pools for
+    :param pool_maxsize: The number of connections to keep open per host
+    :param pool_block: Wait for a free connection instead of opening more
+        than `pool_maxsize` connections to one host at a time
+    :param retries: The number of times to retry connection and read errors
+        (but not timeouts, see `NoTimeoutRetry`). Kept alive connections can
+        be closed by the server at any time, so this is worth having for when
+        we try to re-use one
+    :param resolver: A `DNSCache` to resolve host names with, or None to
+        look them up every time we connect
+    :return: A `requests.Session` object, which never stores cookies
+    """
+    adapter_kwargs = dict(
+        pool_connections=pool_connections,
+        pool_maxsize=pool_maxsize,
+        pool_block=pool_block,
+        max_retries=NoTimeoutRetry(
+            total=retries,
+            connect=retries,
+            read=retries,
+            # Redirects are handled by `requests`, and we want to see errors
+            redirect=None,
+            status=0,
+            method_whitelist=IDEMPOTENT_METHODS,
+            raise_on_status=False,
+        ),
+    )
+    if resolver is None:
+        adapter = CountingHTTPAdapter(**adapter_kwargs)
+    else:
+        adapter = ResolvingHTTPAdapter(resolver, **adapter_kwargs)
+
+    session = Session()
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+
+    # The session is shared by every user, so a cookie one upstream server
+    # sets for one user must never be sent on for the next
+    session.cookies.set_policy(DefaultCookiePolicy(allowed_domains=[]))
+
+    return session
+
+
+def release(response, max_bytes=DRAIN_MAX_BYTES):
+    """Close a streamed response, keeping its connection open if we can.
+
+    urllib3 throws away the connection of a response which is closed before
+    its body has been read. When what's left of the body is small (like a
+    ranged or `HEAD` response), we read it so the connection can be re-used.
+
+    :param response: The `requests.Response` to close
+    :param max_bytes: The most of the body to read to keep the connection
+    """
+    remaining = getattr(response.raw, "length_remaining", None)
+    if remaining is not None and remaining <= max_bytes:
+        response.raw.drain_conn()
+
+    response.close()
+
+
+def session_from_settings(settings, resolver=None):
+    """Create a session configured from the app settings.
+
+    :param settings: The application settings dict
+    :param resolver: A `DNSCache` to resolve host names with (optional)
+    :return: A `requests.Session` object
+    """
+    return make_session(
+        pool_connections=int(settings["http_pool_connections"]),
+        pool_maxsize=int(settings["http_pool_maxsize"]),
+        pool_block=asbool(settings["http_pool_block"]),
+        retries=int(settings["http_max_retries"]),
+        resolver=resolver,
+    )
+
+
+def pool_stats(session):
+    """Get statistics about connection re-use for each upstream host.
+
+    :param session: A session created by `make_session()`
+    :return: A dict of "scheme://host:port" to a dict of statistics, with
+        the number of connections opened and requests made
+    """
+    stats = {}
+
+    for adapter in set(session.adapters.values()):
+        pools = adapter.poolmanager.pools
+
+        for key in pools.keys():
+            pool = pools.get(key)
+            if pool is None:
+                # Evicted since we listed the keys
+                continue
+
+            stats[f"{key.key_scheme}://{key.key_host}:{key.key_port}"] = {
+                "connections": pool.num_connects,
+                "requests": pool.num_requests,
+            }
+
+    return stats
@@ -0,0 +1,73 @@
+"""De-duplication of concurrent calls for the same thing."""
+
+import threading
+
+# pylint: disable=too-few-public-methods
+
+
+class _Call:
+    """A call in progress which other threads can wait on."""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+    def wait(self):
+        """Wait for the call to finish and return or raise its outcome."""
+        self.done.wait()
+
+        if self.error:
+            raise self.error
+
+        return self.result
+
+
+class SingleFlight:
+    """Make sure only one thread at a time does the work for a given key.
+
+    The first caller for a key runs the function, and any callers which
+    arrive while it's still running wait for, and share, its result (or
+    exception).
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}
+
+        self.coalesced = 0
+
+    def call(self, key, func):
+        """Call `func` unless a call for `key` is already in progress.
+
+        :param key: The key to de-duplicate calls by
+        :param func: A callable accepting no arguments
+        :raise Exception: Whatever `func` raised in this or a concurrent caller
+        :return: The result of `func` from this or a concurrent caller
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+
+            if leader:
+                call = self._calls[key] = _Call()
+            else:
+                self.coalesced += 1
+
+        if not leader:
+            return call.wait()
+
+        try:
+            call.result = func()
+
+        except Exception as err:
+            call.error = err
+            raise
+
+        finally:
+            with self._lock:
+                del self._calls[key]
+
+            call.done.set()
+
+        return call.result
@@ -0,0 +1,74 @@
+"""Work out the type of content from its first few bytes."""
+
+import cgi
+
+from requests import RequestException
+
+# The most we will read from a response to work out what it is. The PDF
+# spec allows the header to appear anywhere in the first 1024 bytes
+SNIFF_BYTES = 1024
+
+# Content types which tell us nothing about what the content actually is
+GENERIC_MIME_TYPES = {
+    "application/octet-stream",
+    "application/binary",
+    "binary/octet-stream",
+    "application/download",
+    "application/force-download",
+    "application/x-download",
+    "application/unknown",
+}
+
+# Magic numbers we look for, and the type they indicate
+MAGIC_NUMBERS = ((b"%PDF-", "application/pdf"),)
+
+
+def header_mime_type(response):
+    """Get the mime type from the `Content-Type` header of a response.
+
+    :param response: A `requests` or `httpx` response object
+    :return: The mime type, or None if there is no `Content-Type`
+    """
+    content_type = response.headers.get("Content-Type")
+    if not content_type:
+        return None
+
+    mime_type, _ = cgi.parse_header(content_type)
+    return mime_type
+
+
+def is_generic(mime_type):
+    """Get whether a mime type is missing or tells us nothing useful."""
+    return mime_type is None or mime_type in GENERIC_MIME_TYPES
+
+
+def sniff_mime_type(response):
+    """Guess the mime type of a response from the start of its content.
+
+    Only the first `SNIFF_BYTES` are read from the response, so this is safe
+    to use with streaming responses.
+
+    :param response: A `requests.Response` object opened with `stream=True`
+    :return: The mime type, or None if we couldn't tell
+    """
+    try:
+        head = next(response.iter_content(SNIFF_BYTES), b"")
+    except RequestException:
+        # We've got the headers already, so don't fail just because the body
+        # is broken or slow
+        return None
+
+    return mime_type_from_bytes(head)
+
+
+def mime_type_from_bytes(head):
+    """Guess the mime type of content from its first `SNIFF_BYTES` bytes.
+
+    :param head: The start of the content
+    :return: The mime type, or None if we couldn't tell
+    """
+    for magic_number, mime_type in MAGIC_NUMBERS:
+        if magic_number in head[:SNIFF_BYTES]:
+            return mime_type
+
+    return None
@@ -0,0 +1,204 @@
+"""Storage backends for the URL details cache."""
+
+import os
+import threading
+import time
+from collections import OrderedDict
+
+from diskcache import Cache
+
+
+class MemoryStore:
+    """A size bounded, LRU store held in the memory of this process.
+
+    :param max_size: The maximum number of entries to keep
+    """
+
+    def __init__(self, max_size=1024):
+        self._max_size = max_size
+
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+        self.evictions = 0
+
+    def get(self, key):
+        """Get a value from the store.
+
+        :param key: The key to look up
+        :return: The stored value or None if missing or expired
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+
+            value, expires_at = entry
+            if expires_at <= time.monotonic():
+                del self._entries[key]
+                return None
+
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value, max_age):
+        """Store a value, evicting the least recently used if full.
+
+        :param key: The key to store against
+        :param value: The value to store
+        :param max_age: The number of seconds the value is valid for
+        """
+        with self._lock:
+            self._entries[key] = (value, time.monotonic() + max_age)
+            self._entries.move_to_end(key)
+
+            while len(self._entries) > self._max_size:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def items(self):
+        """Get every unexpired key and value in the store.
+
+        :return: A list of (key, value) tuples
+        """
+        with self._lock:
+            now = time.monotonic()
+
+            return [
+                (key, value)
+                for key, (value, expires_at) in self._entries.items()
+                if expires_at > now
+            ]
+
+    def claim(self, key, timeout):  # pylint: disable=unused-argument,no-self-use
+        """Claim the right to look up a key on behalf of other processes.
+
+        As this store isn't shared, we always get the claim.
+        """
+        return True
+
+    def is_claimed(self, key):  # pylint: disable=unused-argument,no-self-use
+        """Get whether another process is currently looking up a key."""
+        return False
+
+    def release(self, key):
+        """Release a claim made with `claim()`."""
+
+    @property
+    def stats(self):
+        """Get the size and eviction counters for this store."""
+        return {"evictions": self.evictions, "size": len(self._entries)}
+
+
+class DiskStore:
+    """A store shared between processes on the same host.
+
+    This is backed by a SQLite database (via `diskcache`) so writes are
+    atomic, and every worker pointed at the same directory shares entries.
+
+    :param directory: The directory to keep the database in
+    :param size_limit: The approximate maximum size of the store in bytes
+    """
+
+    def __init__(self, directory, size_limit=2 ** 26):
+        self._directory = directory
+        self._size_limit = size_limit
+
+        self._cache = None
+        self._pid = None
+
+    def get(self, key):
+        """Get a value from the store.
+
+        :param key: The key to look up
+        :return: The stored value or None if missing or expired
+        """
+        return self._get_cache().get(key, retry=True)
+
+    def set(self, key, value, max_age):
+        """Store a value, culling older items if we are over the size limit.
+
+        :param key: The key to store against
+        :param value: The value to store
+        :param max_age: The number of seconds the value is valid for
+        """
+        self._get_cache().set(key, value, expire=max_age, retry=True)
+
+    def items(self):
+        """Get every unexpired key and value in the store.
+
+        This reads the whole store, so it's for tools rather than requests.
+
+        :return: An iterable of (key, value) tuples
+        :rtype: collections.abc.Iterable
+        """
+        cache = self._get_cache()
+
+        for key in cache.iterkeys():
+            value = cache.get(key, retry=True)
+            if value is not None:
+                # It didn't expire or get evicted since we listed it
+                yield key, value
+
+    def claim(self, key, timeout):
+        """Claim the right to look up a key on behalf of other processes.
+
+        :param key: The key we want to look up
+        :param timeout: The maximum number of seconds to hold the claim for
+        :return: True if we got the claim, False if another process has it
+        """
+        return self._get_cache().add(
+            self._claim_key(key), os.getpid(), expire=timeout, retry=True
+        )
+
+    def is_claimed(self, key):
+        """Get whether another process is currently looking up a key."""
+        return self._claim_key(key) in self._get_cache()
+
+    def release(self, key):
+        """Release a claim made with `claim()`."""
+        self._get_cache().delete(self._claim_key(key), retry=True)
+
+    @property
+    def stats(self):
+        """Get the size of this store."""
+        return {"size": len(self._get_cache())}
+
+    @staticmethod
+    def _claim_key(key):
+        return f"claim:{key}"
+
+    def _get_cache(self):
+        # SQLite connections must not be shared across a fork, so if Gunicorn
+        # has forked us since we last looked, open our own connection
+        if self._pid != os.getpid():
+            self._cache = Cache(
+                self._directory,
+                size_limit=self._size_limit,
+                # Avoid turning every read into a write to update access times
+                eviction_policy="least-recently-stored",
+            )
+            self._pid = os.getpid()
+
+        return self._cache
+
+
+def store_from_settings(settings):
+    """Create a store for the URL details cache as configured.
+
+    :param settings: The application settings dict
+    :raise ValueError: If the backend is not recognised
+    :return: A store object
+    """
+    backend = settings["url_details_cache_backend"]
+
+    if backend == "memory":
+        return MemoryStore(max_size=int(settings["url_details_cache_size"]))
+
+    if backend == "disk":
+        return DiskStore(
+            directory=settings["url_details_cache_dir"],
+            size_limit=int(settings["url_details_cache_size_limit"]),
+        )
+
+    raise ValueError(f"Unknown URL details cache backend: '{backend}'")
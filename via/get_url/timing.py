@@ -0,0 +1,159 @@
+"""Time limits for probing URLs, and where the time goes."""
+
+import threading
+import time
+from collections import namedtuple
+
+from requests import Timeout
+
+# pylint: disable=too-few-public-methods
+
+#: Seconds to wait to connect, between bytes, and for the whole probe
+#: including any redirects (or None for no limit)
+Timeouts = namedtuple("Timeouts", ["connect", "read", "total"])
+
+
+class Deadline:
+    """A wall-clock budget for all the requests made to probe one URL.
+
+    This is only checked between requests: each request gets at most the
+    time remaining as its connect and read timeouts, and we stop following
+    redirects once it has run out. Requests which time out aren't retried
+    (see `NoTimeoutRetry`), so a retry can only add the time it took for a
+    request to fail straight away. `requests` has no limit on a whole
+    response, so a server which trickles out its headers (or the start of
+    the body we sniff) a byte at a time can keep a single request going past
+    the deadline.
+
+    :param seconds: The budget in seconds, or None for no limit
+    """
+
+    def __init__(self, seconds):
+        self._seconds = seconds
+        self._expires_at = None if seconds is None else time.monotonic() + seconds
+
+    def remaining(self):
+        """Get the number of seconds left, or None if there is no limit."""
+        if self._expires_at is None:
+            return None
+
+        return self._expires_at - time.monotonic()
+
+    def request_timeout(self, timeouts):
+        """Get the `requests` timeout to use for the next request.
+
+        :param timeouts: The `Timeouts` to apply
+        :return: A `(connect, read)` timeout tuple for `requests`
+        :raise Timeout: If there's no time left
+        """
+        remaining = self.remaining()
+        if remaining is None:
+            return timeouts.connect, timeouts.read
+
+        if remaining <= 0:
+            raise Timeout(f"Gave up after {self._seconds} seconds")
+
+        return min(timeouts.connect, remaining), min(timeouts.read, remaining)
+
+    def check_response(self, response, **_kwargs):
+        """Stop following redirects once we are out of time.
+
+        This is a `requests` response hook, which is called for every
+        response in a redirect chain.
+
+        :param response: The `requests.Response` we just received
+        :param _kwargs: The arguments the request was sent with
+        :raise Timeout: If there's no time left
+        """
+        remaining = self.remaining()
+        if remaining is not None and remaining <= 0:
+            response.close()
+            raise Timeout(
+                f"Gave up after {self._seconds} seconds at {response.url}",
+                response=response,
+            )
+
+
+class PhaseTimings:
+    """Keep track of which phase of probing URLs takes the time.
+
+    The phases are:
+
+     * `dns` - Looking up host names (only when the DNS cache is enabled).
+       This is part of `redirects` or `response` too, not in addition
+     * `redirects` - Getting the responses for any redirects
+     * `response` - Connecting and getting the headers for the final URL
+     * `body` - Reading the start of the content to sniff its type
+    """
+
+    PHASES = ("dns", "redirects", "response", "body")
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._probes = 0
+        self._totals = dict.fromkeys(self.PHASES, 0.0)
+        self._maximums = dict.fromkeys(self.PHASES, 0.0)
+
+    def record(self, response, body_seconds=0.0):
+        """Record the time spent in each phase of a probe.
+
+        :param response: The final `requests.Response` of the probe
+        :param body_seconds: The time spent reading the content
+        :return: A dict of the seconds spent in each phase
+        """
+        phases = {
+            "redirects": sum(rsp.elapsed.total_seconds() for rsp in response.history),
+            "response": response.elapsed.total_seconds(),
+            "body": body_seconds,
+        }
+
+        with self._lock:
+            self._probes += 1
+            for phase, seconds in phases.items():
+                self._add(phase, seconds)
+
+        return phases
+
+    def add(self, phase, seconds):
+        """Record time spent in a phase outside of `record()`.
+
+        :param phase: The name of the phase from `PHASES`
+        :param seconds: The time spent
+        """
+        with self._lock:
+            self._add(phase, seconds)
+
+    def _add(self, phase, seconds):
+        self._totals[phase] += seconds
+        self._maximums[phase] = max(self._maximums[phase], seconds)
+
+    @property
+    def stats(self):
+        """Get the mean and maximum seconds spent in each phase."""
+        with self._lock:
+            return {
+                "probes": self._probes,
+                "mean_seconds": {
+                    phase: round(total / max(self._probes, 1), 3)
+                    for phase, total in self._totals.items()
+                },
+                "max_seconds": {
+                    phase: round(seconds, 3)
+                    for phase, seconds in self._maximums.items()
+                },
+            }
+
+
+def timeouts_from_settings(settings):
+    """Get the timeouts for probing URLs from the app settings.
+
+    :param settings: The application settings dict
+    :return: A `Timeouts` object
+    """
+    total = settings["url_probe_deadline"]
+
+    return Timeouts(
+        connect=float(settings["url_connect_timeout"]),
+        read=float(settings["url_read_timeout"]),
+        total=float(total) if total else None,
+    )
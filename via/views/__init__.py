@@ -1,5 +1,6 @@
 """The views for the Pyramid app."""
 from via.resources import URLResource
+from via.views.predicates import ExplicitAcceptPredicate
 
 
 def add_routes(config):
@@ -7,10 +8,13 @@ def add_routes(config):
     config.add_route("get_status", "/_status")
     config.add_route("view_pdf", "/pdf", factory=URLResource)
     config.add_route("route_by_content", "/route", factory=URLResource)
+    config.add_route("route_batch", "/route/batch")
     config.add_route("debug_headers", "/debug/headers")
+    config.add_route("debug_upstream", "/debug/upstream")
 
 
 def includeme(config):
     """Pyramid config."""
     add_routes(config)
+    config.add_view_predicate("explicit_accept", ExplicitAcceptPredicate)
     config.scan(__name__)
@@ -7,6 +7,7 @@ from pyramid import view
 from pyramid.response import Response
 
 from via.get_url import clean_headers
+from via.get_url.session import pool_stats
 
 
 @view.view_config(route_name="debug_headers")
@@ -16,7 +17,7 @@ def debug_headers(_context, request):
     if request.GET.get("raw"):
         headers = OrderedDict(request.headers)
     else:
-        headers = clean_headers(request.headers)
+        headers = dict(clean_headers(request.headers))
 
     return Response(
         body=f"""
@@ -41,3 +42,22 @@ def debug_headers(_context, request):
         """,
         status=200,
     )
+
+
+@view.view_config(route_name="debug_upstream", renderer="json")
+def debug_upstream(_context, request):
+    """Show how well we are re-using work and connections upstream."""
+
+    registry = request.registry
+
+    return {
+        "url_details_cache": registry.url_details_cache.stats,
+        "url_details_refresher": registry.url_details_refresher.stats,
+        "http_pools": pool_stats(registry.http_session),
+        "dns_cache": registry.dns_cache.stats if registry.dns_cache else None,
+        "probe_limiter": registry.probe_limiter.stats,
+        "circuit_breaker": registry.circuit_breaker.stats,
+        "negative_cache": registry.negative_cache.stats,
+        "probe_timings": registry.probe_timings.stats,
+        "redirect_index": registry.redirect_index.stats,
+    }
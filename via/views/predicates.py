@@ -0,0 +1,38 @@
+"""View predicates for the Pyramid app."""
+
+
+class ExplicitAcceptPredicate:
+    """Match requests which ask for a media type by name.
+
+    Pyramid's own `accept` predicate also matches `Accept: */*` (which curl
+    and many other clients send by default) and requests with no `Accept`
+    header at all. This only matches when the media type is in the `Accept`
+    header, with a quality at least as high as any other type there. So it
+    can pick an alternative view, leaving the usual one as the default.
+
+    :param value: The media type to match, like "application/x-ndjson"
+    :param _config: The Pyramid configurator
+    """
+
+    def __init__(self, value, _config):
+        self.value = value.lower()
+
+    def text(self):
+        """Describe this predicate (for Pyramid)."""
+        return f"explicit_accept = {self.value}"
+
+    phash = text
+
+    def __call__(self, _context, request):
+        """Get whether the request explicitly accepts our media type."""
+        # `parsed` is only there when the header is there and valid
+        parsed = getattr(request.accept, "parsed", None)
+        if not parsed:
+            return False
+
+        qualities = {
+            media_range.lower(): quality for media_range, quality, *_ in parsed
+        }
+        quality = qualities.get(self.value, 0)
+
+        return quality > 0 and quality == max(qualities.values())
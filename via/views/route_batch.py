@@ -0,0 +1,198 @@
+"""View for routing many URLs in one request."""
+
+import json
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from functools import partial
+from itertools import chain, islice
+
+from pyramid import view
+from pyramid.httpexceptions import HTTPBadRequest, HTTPExpectationFailed
+from pyramid.response import Response
+from webob.multidict import MultiDict
+
+from via.exceptions import BadURL, UpstreamTimeout
+from via.get_url.timing import Deadline
+from via.views.route_by_content import route_for_content
+
+
+@view.view_config(route_name="route_batch", request_method="POST", renderer="json")
+def route_batch(_context, request):
+    """Get where `/route` would send each of a list of URLs.
+
+    The body is a JSON object like `{"urls": ["http://example.com", ...]}`.
+    Any query parameters are passed on for every URL, as with `/route`.
+
+    The URLs are looked up concurrently (with at most
+    `route_batch_max_workers` at once) and the results are returned in the
+    same order. A URL which fails gets an "error" instead of a "target".
+    Any URL we haven't finished looking up after `route_batch_deadline`
+    seconds gets an `UpstreamTimeout` error.
+    """
+    urls, route, max_workers, seconds = _batch(request)
+    if not urls:
+        return {"results": []}
+
+    executor = ThreadPoolExecutor(max_workers=min(max_workers, len(urls)))
+    try:
+        futures = [executor.submit(route, url) for url in urls]
+        wait(futures, timeout=seconds)
+
+        return {
+            "results": [
+                _result(future, url, seconds) for future, url in zip(futures, urls)
+            ]
+        }
+    finally:
+        _shutdown(executor)
+
+
+@view.view_config(
+    route_name="route_batch",
+    request_method="POST",
+    explicit_accept="application/x-ndjson",
+)
+def route_batch_stream(_context, request):
+    """Stream where `/route` would send each of a list of URLs.
+
+    This is `route_batch()` for clients which ask for `application/x-ndjson`
+    (`*/*` still gets JSON).
+    Each result is written as one line of JSON as soon as it's ready, so
+    they come in the order they finish, not the order they were given in.
+    Each has an "index" of the URL it's for in the list we were sent.
+    """
+    urls, route, max_workers, seconds = _batch(request)
+
+    response = Response(
+        app_iter=_stream(urls, route, max_workers, seconds),
+        content_type="application/x-ndjson",
+        charset=None,
+    )
+    # Stop NGINX holding on to lines until it has a buffer full
+    response.headers["X-Accel-Buffering"] = "no"
+
+    return response
+
+
+def _batch(request):
+    urls = _urls(request)
+    max_urls = int(request.registry.settings["route_batch_max_urls"])
+    if len(urls) > max_urls:
+        raise HTTPBadRequest(f"Too many URLs: the most allowed is {max_urls}")
+
+    # The original headers are read by other threads, so take a copy
+    headers = dict(request.headers)
+    max_workers = int(request.registry.settings["route_batch_max_workers"])
+    seconds = request.registry.settings["route_batch_deadline"]
+
+    return (
+        urls,
+        partial(_route, request, headers=headers),
+        max_workers,
+        float(seconds) if seconds else None,
+    )
+
+
+def _stream(urls, route, max_workers, seconds):
+    # Only `max_workers` lookups are submitted at a time, so the memory used
+    # doesn't grow with the size of the batch
+    deadline = Deadline(seconds)
+    indexed_urls = enumerate(urls)
+    pending = {}
+
+    # If the client goes away, the generator is closed and we stop
+    # submitting lookups
+    executor = ThreadPoolExecutor(max_workers=max_workers)
+    try:
+        while True:
+            remaining = deadline.remaining()
+            if remaining is not None and remaining <= 0:
+                break
+
+            for index, url in islice(indexed_urls, max_workers - len(pending)):
+                pending[executor.submit(route, url)] = index, url
+
+            if not pending:
+                return
+
+            done, _ = wait(pending, timeout=remaining, return_when=FIRST_COMPLETED)
+            for future in done:
+                index, _url = pending.pop(future)
+                yield _line(dict(future.result(), index=index))
+    finally:
+        _shutdown(executor)
+
+    for future, (index, url) in chain(
+        pending.items(), ((None, indexed_url) for indexed_url in indexed_urls)
+    ):
+        yield _line(dict(_result(future, url, seconds), index=index))
+
+
+def _result(future, url, seconds):
+    if future is not None:
+        if future.done():
+            return future.result()
+
+        # Don't start lookups we have already given up on
+        future.cancel()
+
+    return _error(url, UpstreamTimeout(f"Gave up after {seconds} seconds"))
+
+
+def _shutdown(executor):
+    # Lookups which are still running when we run out of time carry on in
+    # the background (and still fill the cache), but we don't wait for them
+    executor.shutdown(wait=False)
+
+
+def _line(result):
+    return json.dumps(result).encode("utf-8") + b"\n"
+
+
+def _urls(request):
+    try:
+        urls = request.json_body["urls"]
+    except (ValueError, TypeError, KeyError) as err:
+        raise HTTPBadRequest(
+            'Expected a JSON object like {"urls": ["http://example.com"]}'
+        ) from err
+
+    if not isinstance(urls, list) or not all(isinstance(url, str) for url in urls):
+        raise HTTPBadRequest("Expected 'urls' to be a list of strings")
+
+    return urls
+
+
+def _route(request, url, headers):
+    if not url:
+        return _error(url, BadURL("The URL is blank"))
+
+    try:
+        mime_type, status_code = request.registry.url_details_cache.get_url_details(
+            url, headers
+        )
+    except Exception as err:  # pylint: disable=broad-except
+        return _error(url, err)
+
+    params = MultiDict(request.params)
+    params["url"] = url
+    target, cache_headers = route_for_content(request, params, mime_type, status_code)
+
+    return {
+        "url": url,
+        "mime_type": mime_type,
+        "status_code": status_code,
+        "target": target,
+        "headers": cache_headers,
+    }
+
+
+def _error(url, err):
+    # This mirrors what `via.views.exceptions` would render for `/route`
+    return {
+        "url": url,
+        "error": {
+            "class": err.__class__.__name__,
+            "details": str(err),
+            "status_code": getattr(err, "status_int", HTTPExpectationFailed.code),
+        },
+    }
@@ -1,65 +1,126 @@
 """View for redirecting based on content type."""
 
-from urllib.parse import parse_qsl, urlencode, urlparse
+from collections import OrderedDict
+from functools import lru_cache
+from types import MappingProxyType
+from urllib.parse import parse_qsl, urlencode, urlparse, urlunparse
 
 from pyramid import httpexceptions as exc
 from pyramid import view
-from webob.multidict import MultiDict
 
-from via.get_url import get_url_details
+from via.get_url.cache import max_age_for_status
 
 
 @view.view_config(route_name="route_by_content")
 def route_by_content(context, request):
     """Routes the request according to the Content-Type header."""
-    mime_type, status_code = get_url_details(context.url(), request.headers)
+    mime_type, status_code = request.registry.url_details_cache.get_url_details(
+        context.url(), request.headers
+    )
 
-    # Can PDF mime types get extra info on the end like "encoding=?"
-    if mime_type in ("application/x-pdf", "application/pdf"):
-        # Unless we have some very baroque error messages they shouldn't
-        # really be returning PDFs
+    return redirect_by_content(request, mime_type, status_code)
 
-        redirect_url = request.route_url("view_pdf", _query=request.params)
 
-        return exc.HTTPFound(redirect_url, headers=_caching_headers(max_age=300))
+def redirect_by_content(request, mime_type, status_code):
+    """Get the redirect for a URL with the given details.
 
-    via_url = _get_legacy_via_url(request)
-    headers = _cache_headers_for_http(status_code)
+    :param request: The request with the 'url' parameter being routed
+    :param mime_type: The mime type of the content at the URL
+    :param status_code: The status code returned for the URL
+    :return: An `HTTPFound` response with caching headers
+    """
+    location, headers = route_for_content(
+        request, request.params, mime_type, status_code
+    )
 
-    return exc.HTTPFound(via_url, headers=headers)
+    return exc.HTTPFound(location, headers=headers)
 
 
-def _cache_headers_for_http(status_code):
-    if status_code == 404:
-        # 404 - A rare case we may want to handle differently, as unusually
-        # for a 4xx error, trying again can help if it becomes available
-        return _caching_headers(max_age=60)
+def route_for_content(request, params, mime_type, status_code):
+    """Get where to send a URL with the given details, and for how long.
 
-    if status_code < 500:
-        # 2xx - OK
-        # 3xx - we follow it, so this shouldn't happen
-        # 4xx - no point in trying again quickly
-        return _caching_headers(max_age=60)
+    :param request: The current request
+    :param params: The query parameters to route, including 'url'
+    :param mime_type: The mime type of the content at the URL
+    :param status_code: The status code returned for the URL
+    :return: A 2-tuple of (target URL, dict of caching headers)
+    """
+    # Can PDF mime types get extra info on the end like "encoding=?"
+    if mime_type in ("application/x-pdf", "application/pdf"):
+        # Unless we have some very baroque error messages they shouldn't
+        # really be returning PDFs
 
-    # 5xx - Errors should not be cached
-    return {"Cache-Control": "no-cache"}
+        redirect_url = request.route_url("view_pdf", _query=params)
 
+        return redirect_url, _caching_headers(max_age=300)
 
-def _get_legacy_via_url(request):
-    # Get the query we were called with and remove the url
-    query = MultiDict(request.params)
-    raw_url = urlparse(query.pop("url"))
+    via_url = _get_legacy_via_url(request, params)
+    headers = _cache_headers_for_http(status_code)
 
-    # Create a legacy via URL by concatenating the urls
-    via_url = request.registry.settings["legacy_via_url"]
-    bare_url = raw_url._replace(query=None).geturl()
-    via_url = urlparse(f"{via_url}/{bare_url}")
+    return via_url, headers
 
-    # Add the merged query parameters
-    query.update(parse_qsl(raw_url.query))
-    via_url = via_url._replace(query=urlencode(query))
 
-    return via_url.geturl()
+def _cache_headers_for_http(status_code):
+    max_age = max_age_for_status(status_code)
+
+    if max_age is None:
+        # 5xx - Errors should not be cached
+        return {"Cache-Control": "no-cache"}
+
+    return _caching_headers(max_age=max_age)
+
+
+def _get_legacy_via_url(request, params):
+    # This runs for every non-PDF `/route`, so it works in a single pass,
+    # with the parsing of popular URLs cached
+    # (see `bin/benchmark.py legacy_via_url`)
+    url = None
+    query = []
+    for key, value in params.items():
+        if key == "url" and url is None:
+            url = value
+        else:
+            query.append((key, value))
+
+    bare_url, url_query, fragment = _parse_url(url)
+
+    # Parameters from the URL's own query replace any we were called with
+    if url_query:
+        query = [item for item in query if item[0] not in url_query]
+        query.extend(url_query.items())
+
+    via_url = f"{request.registry.settings['legacy_via_url']}/{bare_url}"
+    if query:
+        via_url += "?" + urlencode(query)
+    if fragment:
+        via_url += "#" + fragment
+
+    return via_url
+
+
+@lru_cache(maxsize=1024)
+def _parse_url(url):
+    """Split a URL into the parts `_get_legacy_via_url()` needs.
+
+    :param url: The URL being routed
+    :return: A 3-tuple of (URL without query or fragment, read-only mapping
+        of its query parameters, fragment)
+    """
+    raw_url = urlparse(url)
+
+    bare_url = urlunparse(raw_url[:4] + ("", ""))
+    if bare_url.endswith(";") and ";" not in bare_url.rsplit("/", 1)[-1][:-1]:
+        # Match `urlparse()`, which drops empty ";params" on the last segment
+        bare_url = bare_url[:-1]
+
+    url_query = OrderedDict()
+    for key, value in parse_qsl(raw_url.query):
+        # The last value wins, in the position it was last set
+        url_query.pop(key, None)
+        url_query[key] = value
+
+    # This is cached and shared, so don't let anyone change it
+    return bare_url, MappingProxyType(url_query), raw_url.fragment
 
 
 def _caching_headers(max_age, stale_while_revalidate=86400):
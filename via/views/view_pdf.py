@@ -1,14 +1,20 @@
 """View presenting the PDF viewer."""
 import json
+import re
+from collections import OrderedDict
+from threading import Lock
 
+from jinja2.utils import htmlsafe_json_dumps
 from markupsafe import Markup
 from pyramid import view
+from pyramid.renderers import render
+from pyramid.response import Response
+from pyramid_jinja2 import IJinja2Environment
 
 from via.configuration import Configuration
 
 
 @view.view_config(
-    renderer="via:templates/pdf_viewer.html.jinja2",
     route_name="view_pdf",
     # We have to keep the leash short here for caching so we can pick up new
     # immutable assets when they are deployed
@@ -22,15 +28,136 @@ def view_pdf(context, request):
 
     _, h_config = Configuration.extract_from_params(request.params)
 
-    return {
-        "pdf_url": _string_literal(pdf_url),
-        "client_embed_url": _string_literal(
-            request.registry.settings["client_embed_url"]
+    return Response(
+        PDFViewerShell.for_request(request).fill(
+            pdf_url=_string_literal(pdf_url), hypothesis_config=h_config
         ),
-        "static_url": request.static_url,
-        "hypothesis_config": h_config,
+        content_type="text/html",
+        charset="UTF-8",
+    )
+
+
+class PDFViewerShell:
+    """The PDF viewer page, pre-rendered around the values for each request.
+
+    The template extends the large page from PDF.js, but only the PDF URL and
+    the client config change from one request to the next. So we render it
+    once with a marker in each of their places, split it at the markers, and
+    join the pieces back together around the real values for each request.
+    This gives exactly what rendering the template would.
+
+    :param html: The page rendered with `MARKERS` for the values
+    :param dumps: The function the template's `tojson` filter uses
+    """
+
+    TEMPLATE = "via:templates/pdf_viewer.html.jinja2"
+
+    MARKERS = {
+        "pdf_url": "__VIA_PDF_URL__",
+        "hypothesis_config": "__VIA_HYPOTHESIS_CONFIG__",
     }
 
+    # The pages also depend on the host in static URLs, which comes from the
+    # request. Keep a few in case we are reached by more than one name
+    MAX_SHELLS = 16
+
+    _shells = OrderedDict()
+    _lock = Lock()
+
+    def __init__(self, html, dumps):
+        self._dumps = dumps
+
+        # The config goes through `tojson`, so we look for its marker as JSON
+        slots = {
+            self.MARKERS["pdf_url"]: "pdf_url",
+            dumps(self.MARKERS["hypothesis_config"]): "hypothesis_config",
+        }
+
+        pattern = "|".join(re.escape(marker) for marker in slots)
+        parts = re.split(f"({pattern})", html)
+
+        self._slots = [slots[marker] for marker in parts[1::2]]
+        if sorted(self._slots) != sorted(slots.values()):
+            raise ValueError(
+                f"Expected each value once in {self.TEMPLATE}, found: {self._slots}"
+            )
+
+        self._pieces = [part.encode("utf-8") for part in parts[::2]]
+
+    def fill(self, pdf_url, hypothesis_config):
+        """Get the page for a request.
+
+        :param pdf_url: The PDF URL, already escaped as a JSON string literal
+        :param hypothesis_config: The config for the client
+        :return: The page as UTF-8 encoded bytes
+        """
+        values = {
+            "pdf_url": str(pdf_url).encode("utf-8"),
+            "hypothesis_config": self._dumps(hypothesis_config).encode("utf-8"),
+        }
+
+        body = [self._pieces[0]]
+        for slot, piece in zip(self._slots, self._pieces[1:]):
+            body.append(values[slot])
+            body.append(piece)
+
+        return b"".join(body)
+
+    @classmethod
+    def for_request(cls, request):
+        """Get the shell for a request, rendering it if we need to.
+
+        A shell is rendered once for each static URL prefix (which includes
+        the cache buster salt) and embed URL, so once per deploy and host.
+
+        :param request: The request to get the shell for
+        :return: A `PDFViewerShell` instance
+        """
+        client_embed_url = request.registry.settings["client_embed_url"]
+        key = (request.static_url("via:static/"), client_embed_url)
+
+        with cls._lock:
+            shell = cls._shells.get(key)
+            if shell:
+                cls._shells.move_to_end(key)
+                return shell
+
+        # We might render this twice if we race, but it's the same either way
+        shell = cls._render(request, client_embed_url)
+
+        with cls._lock:
+            cls._shells[key] = shell
+            if len(cls._shells) > cls.MAX_SHELLS:
+                cls._shells.popitem(last=False)
+
+        return shell
+
+    @classmethod
+    def _render(cls, request, client_embed_url):
+        html = render(
+            cls.TEMPLATE,
+            {
+                "pdf_url": Markup(cls.MARKERS["pdf_url"]),
+                "client_embed_url": _string_literal(client_embed_url),
+                "static_url": request.static_url,
+                "hypothesis_config": cls.MARKERS["hypothesis_config"],
+            },
+            request=request,
+        )
+
+        # Use the same JSON options as the template's `tojson` filter
+        policies = request.registry.getUtility(
+            IJinja2Environment, name=".jinja2"
+        ).policies
+        options = policies["json.dumps_kwargs"]
+
+        return cls(
+            html,
+            lambda value: htmlsafe_json_dumps(
+                value, dumper=policies["json.dumps_function"], **options
+            ),
+        )
+
 
 def _string_literal(string):
     """Return a JSON escaped, but otherwise un-modified string."""